@@ -54,6 +54,8 @@ class ScheduledTaskResult(models.Model):
         ],
         default="pending"
     )
+    # 执行汇总（汇总任务写入）：{'total': n, 'passed': n, 'failed': n, 'duration': 秒}
+    summary = models.JSONField(default=dict, blank=True)
 
     def __str__(self):
         return f"Result for {self.schedule.name} at {self.start_time}"
@@ -48,17 +48,29 @@ class ScheduledTaskResultSerializer(serializers.ModelSerializer):
     success_rate = serializers.SerializerMethodField()
     test_cases_result = serializers.SerializerMethodField()
 
+    # test_cases_result 中每条UI执行记录返回的字段
+    execution_fields = (
+        'id', 'testcase__name', 'status', 'duration', 'executed_at', 'executed_by__username',
+        'steps_log', 'screenshot', 'artifacts', 'segments', 'browser_info'
+    )
+
     class Meta:
         model = ScheduledTaskResult
         fields = ['id', 'schedule', 'schedule_name', 'start_time', 'end_time', 'duration', 'executor', 'error',
-                  'trigger', 'created_at', 'total', 'passed', 'failed', 'success_rate', 'status', 'test_cases_result']
+                  'trigger', 'created_at', 'total', 'passed', 'failed', 'success_rate', 'status', 'summary',
+                  'test_cases_result']
 
     def get_total(self, obj):
+        # 汇总任务已写入执行汇总时直接使用，否则（执行中或历史记录）统计UI执行记录
+        if 'total' in (obj.summary or {}):
+            return obj.summary['total']
         # 通过外键关系获取该调度任务结果相关的所有UI执行记录
         executions = UiExecution.objects.filter(scheduled_task_result=obj)
         return executions.count()
 
     def get_passed(self, obj):
+        if 'passed' in (obj.summary or {}):
+            return obj.summary['passed']
         # 通过外键关系获取该调度任务结果相关的通过的UI执行记录
         passed_executions = UiExecution.objects.filter(
             scheduled_task_result=obj,
@@ -67,6 +79,8 @@ class ScheduledTaskResultSerializer(serializers.ModelSerializer):
         return passed_executions.count()
 
     def get_failed(self, obj):
+        if 'failed' in (obj.summary or {}):
+            return obj.summary['failed']
         # 通过外键关系获取该调度任务结果相关的失败的UI执行记录
         failed_executions = UiExecution.objects.filter(
             scheduled_task_result=obj,
@@ -94,10 +108,16 @@ class ScheduledTaskResultSerializer(serializers.ModelSerializer):
 
         # 通过外键关系获取该调度任务结果相关的所有UI执行记录
         executions = UiExecution.objects.filter(scheduled_task_result=obj).values(
-            'id', 'testcase__name', 'status', 'duration', 'executed_at', 'executed_by__username',
-            'steps_log', 'screenshot', 'browser_info'
+            *self.execution_fields
         ).order_by('-executed_at')
         # Convert executed_at to China timezone
         for execution in executions:
             execution['executed_at'] = localtime(execution['executed_at']).strftime('%Y-%m-%d %H:%M:%S')
         return list(executions)
+
+
+class ScheduledTaskResultListSerializer(ScheduledTaskResultSerializer):
+    """任务结果列表：UI执行记录不返回执行日志（详情接口和UI执行记录详情接口返回）"""
+    execution_fields = tuple(
+        field for field in ScheduledTaskResultSerializer.execution_fields if field != 'steps_log'
+    )
@@ -4,21 +4,105 @@ import django
 django.setup()
 
 from common.handle_ui_test.ui_runner import run_ui_case_tool
-import asyncio
+from common.handle_ui_test.browser_pool import run_in_browser_pool
+from common.handle_ui_test.login_state import run_with_login_state, LoginCaseFailed
+from common.handle_ui_test.execution_log import offload_execution_log
+from common.handle_ui_test.run_plan import build_ui_run_plan
 import logging
 import time
-from celery import shared_task
+from celery import shared_task, chord, group
 from django.utils import timezone
 from ui_case.models import UiTestCase, UiExecution
 from ScheduledTasks.models import ScheduledTaskResult, ScheduledTask
 from django.conf import settings
 from celery.utils.log import get_task_logger
+from asgiref.sync import sync_to_async
+import asyncio
 import tempfile
+import shutil
 import json
 
 log = get_task_logger('worker')
 
 
+async def run_ui_cases_concurrently(plan, scheduled_task_result, temp_dir, concurrency=None):
+    """
+    在同一个事件循环中并发执行执行计划（run_plan.UiRunPlan）中的UI用例，每个用例使用独立的浏览器上下文
+    concurrency: 最大并发用例数，默认取 settings.UI_BATCH_CONCURRENCY
+    用例定义、元素、全局变量、数据库配置和请求拦截规则均取自执行计划，执行过程中只写入执行结果；
+    登录状态取自登录状态缓存，缓存失效时同一登录用例只执行一次，依赖它的用例等待并共用存储状态；
+    每个用例执行完成后立即保存 UiExecution，返回 {'passed': n, 'failed': n}
+    """
+    semaphore = asyncio.Semaphore(concurrency or settings.UI_BATCH_CONCURRENCY)
+    counts = {'passed': 0, 'failed': 0}
+
+    async def run_one(test_case):
+        execution = None
+        async with semaphore:
+            log.info(f"开始执行测试用例: {test_case.name}")
+            try:
+                execution = await sync_to_async(UiExecution.objects.create)(
+                    testcase_id=test_case.id,
+                    status='running',
+                    executed_by_id=test_case.created_by_id,
+                    scheduled_task_result=scheduled_task_result,
+                    browser_info=settings.UI_TEST_BROWSER_TYPE if settings.UI_TEST_BROWSER_TYPE else 'chromium',
+                )
+                case_json = test_case.case_json()
+
+                def run_case(storage_state_path=None):
+                    return run_ui_case_tool(
+                        case_json=case_json,
+                        browser_type=settings.UI_TEST_BROWSER_TYPE,
+                        storage_state_path=storage_state_path,
+                        plan=plan
+                    )
+
+                try:
+                    if test_case.login_case:
+                        # 使用登录用例的存储状态（缓存失效或执行失败时自动重新登录）
+                        case_status, logs, screenshot, execution_log = await run_with_login_state(
+                            test_case.login_case, run_case, temp_dir=temp_dir, plan=plan
+                        )
+                    else:
+                        # 真正运行
+                        case_status, logs, screenshot, execution_log = await run_case()
+                    execution.status = case_status
+                    # 日志较大时写入对象存储，steps_log 只保留引用和预览
+                    execution.steps_log = await sync_to_async(offload_execution_log, thread_sensitive=False)(
+                        execution_log, prefix=f'{execution.id}/'
+                    )
+                    execution.screenshot = screenshot
+                    execution.artifacts = logs.get('artifacts') or {}
+                    execution.segments = logs.get('segments') or []
+                except LoginCaseFailed as e:
+                    # 登录用例执行失败，当前用例也标记为失败
+                    log.error(f"登录用例执行失败，状态: {e.status}")
+                    execution.status = 'failed'
+                    execution.steps_log = str(e)
+                execution.duration = round(time.time() - execution.executed_at.timestamp(), 3)
+                # 每个用例完成后立即落库，前端可实时看到批量执行进度
+                await sync_to_async(execution.save)()
+                log.info(f"用例 {test_case.name} 完成，状态: {execution.status}")
+
+            except Exception as e:  # 捕获单条用例执行异常
+                log.error(f"用例 {test_case.name} 执行异常: {str(e)}", exc_info=True)
+                if execution is None:
+                    execution = UiExecution(
+                        testcase_id=test_case.id,
+                        executed_by_id=test_case.created_by_id,
+                        scheduled_task_result=scheduled_task_result,
+                    )
+                execution.status = 'failed'
+                execution.steps_log = str(e)
+                await sync_to_async(execution.save)()
+
+        counts['passed' if execution.status == 'passed' else 'failed'] += 1
+
+    await asyncio.gather(*(run_one(test_case) for test_case in plan.cases))
+    return counts
+
+
 @shared_task
 def execute_batch_ui_tests(task_id, result_id=None):
     """批量执行所有启用的UI测试用例"""
@@ -27,7 +111,9 @@ def execute_batch_ui_tests(task_id, result_id=None):
     # 1. 取任务 & 用例
     try:
         scheduled_task = ScheduledTask.objects.get(id=task_id)
-        test_cases = UiTestCase.objects.filter(enable=True, module__project=scheduled_task.project)
+        test_cases = UiTestCase.objects.filter(
+            enable=True, module__project=scheduled_task.project
+        ).only('id', 'login_case_id')  # 这里只用于分块，用例定义由各分块的执行计划加载
         if not test_cases.exists():
             log.info("没有启用的UI测试用例可执行")
             # 如果有result_id，更新状态为completed
@@ -74,125 +160,103 @@ def execute_batch_ui_tests(task_id, result_id=None):
         log.error(f"获取或创建调度任务结果失败: {str(e)}")
         return f"获取或创建调度任务结果失败: {str(e)}"
 
-    # 3. 创建临时目录用于存储上下文文件
-    temp_dir = tempfile.mkdtemp(prefix=f"ui_test_storage_{task_id}_")
-    log.info(f"创建临时目录: {temp_dir}")
+    # 3. 按登录用例分块，分发到各个 worker 并行执行，全部完成后由 finalize_ui_batch 汇总；
+    #    分块任务异常（反序列化失败、worker 崩溃等）导致汇总任务无法执行时，由 fail_ui_batch 把任务结果标记为失败
+    chunks = split_ui_case_chunks(test_cases)
+    log.info(f"UI用例分块执行: 用例数 {len(test_cases)}, 分块数 {len(chunks)}")
+    chord(
+        group(run_ui_case_chunk.s(task_id, scheduled_task_result.id, case_ids) for case_ids in chunks)
+    )(finalize_ui_batch.s(scheduled_task_result.id).on_error(fail_ui_batch.s(scheduled_task_result.id)))
+    return f"已分发 {len(chunks)} 个UI用例分块"
 
-    # 4. 存储登录用例ID到文件路径的映射
-    login_case_storage_map = {}
 
-    # 5. 逐条用例执行
+def split_ui_case_chunks(test_cases, chunk_size=None) -> list:
+    """
+    按关联的登录用例分块，返回 [[case_id, ...], ...]
+    依赖同一登录用例的用例放在同一块中（每块只执行一次登录）；
+    每块最多 chunk_size 个用例（默认 settings.UI_BATCH_CHUNK_SIZE），超出时拆分为多块
+    """
+    chunk_size = chunk_size or settings.UI_BATCH_CHUNK_SIZE
+    groups = {}
     for test_case in test_cases:
-        log.info(f"开始执行测试用例: {test_case.name}")
-        try:
-            execution = UiExecution.objects.create(
-                testcase=test_case,
-                status='running',
-                executed_by=test_case.created_by,
-                scheduled_task_result=scheduled_task_result,
-                browser_info=settings.UI_TEST_BROWSER_TYPE if settings.UI_TEST_BROWSER_TYPE else 'chromium',
-            )
-
-            case_json = {
-                'pre_apis': test_case.pre_apis,
-                'steps': test_case.steps,
-                'post_steps': test_case.post_steps
-            }
-
-            # 确定是否使用存储状态
-            storage_state_path = None
-            if test_case.login_case:
-                login_case_id = test_case.login_case.id
-
-                # 检查是否已有该登录用例的存储状态
-                if login_case_id not in login_case_storage_map:
-                    # 执行登录用例并保存存储状态
-                    log.info(f"执行登录用例获取存储状态: {test_case.login_case.name}")
-
-                    login_case_json = {
-                        'pre_apis': test_case.login_case.pre_apis,
-                        'steps': test_case.login_case.steps,
-                        'post_steps': test_case.login_case.post_steps
-                    }
-
-                    # 创建临时文件用于存储登录状态
-                    login_storage_file = tempfile.NamedTemporaryFile(
-                        mode='w', suffix='.json', dir=temp_dir, delete=False
-                    )
-                    login_storage_path = login_storage_file.name
-                    login_storage_file.close()
-
-                    # 执行登录用例并保存存储状态
-                    case_status, logs, screenshot, execution_log = asyncio.run(
-                        run_ui_case_tool(
-                            case_json=login_case_json,
-                            browser_type=settings.UI_TEST_BROWSER_TYPE,
-                            storage_state_path=login_storage_path,
-                            save_storage_state=True
-                        )
-                    )
+        groups.setdefault(test_case.login_case_id, []).append(test_case.id)
+    chunks = []
+    for case_ids in groups.values():
+        for i in range(0, len(case_ids), chunk_size):
+            chunks.append(case_ids[i:i + chunk_size])
+    return chunks
 
-                    if case_status == 'passed':
-                        login_case_storage_map[login_case_id] = login_storage_path
-                        log.info(f"登录用例执行成功，存储状态已保存到: {login_storage_path}")
-                    else:
-                        log.error(f"登录用例执行失败，状态: {case_status}")
-                        # 登录用例执行失败，当前用例也标记为失败
-                        execution.status = 'failed'
-                        execution.steps_log = f"依赖的登录用例执行失败: {case_status}"
-                        execution.duration = round(time.time() - execution.executed_at.timestamp(), 3)
-                        execution.save()
-                        continue
-
-                # 使用登录用例的存储状态
-                storage_state_path = login_case_storage_map[login_case_id]
-                log.info(f"使用登录用例的存储状态: {storage_state_path}")
-
-            # 真正运行
-            case_status, logs, screenshot, execution_log = asyncio.run(
-                run_ui_case_tool(
-                    case_json=case_json,
-                    browser_type=settings.UI_TEST_BROWSER_TYPE,
-                    storage_state_path=storage_state_path
-                )
-            )
-            execution.status = case_status
-            execution.steps_log = execution_log
-            execution.screenshot = screenshot
-            execution.duration = round(time.time() - execution.executed_at.timestamp(), 3)
-            execution.save()
-            log.info(f"用例 {test_case.name} 完成，状态: {case_status}")
-
-        except Exception as e:  # 捕获单条用例执行异常
-            log.error(f"用例 {test_case.name} 执行异常: {str(e)}", exc_info=True)
-            execution = UiExecution.objects.create(
-                testcase=test_case,
-                status='failed',
-                executed_by=test_case.created_by,
-                scheduled_task_result=scheduled_task_result,
-                steps_log=str(e),
-            )
-            execution.save()
 
-    # 6. 清理临时目录
+@shared_task
+def run_ui_case_chunk(task_id, result_id, case_ids):
+    """执行一个UI用例分块，返回 {'passed': n, 'failed': n}（异常时整块计为失败，保证汇总任务正常执行）"""
+    start_time = time.time()
+    log.info(f"UI用例分块开始执行: task_id【{task_id}】, 用例: {case_ids}")
+    temp_dir = tempfile.mkdtemp(prefix=f"ui_test_storage_{task_id}_")
     try:
-        import shutil
-        shutil.rmtree(temp_dir)
-        log.info(f"已清理临时目录: {temp_dir}")
+        scheduled_task_result = ScheduledTaskResult.objects.get(id=result_id)
+        # 执行前一次性加载整块用例的定义（用例、登录用例、元素、全局变量、数据库配置、请求拦截配置），
+        # 查询次数与用例和步骤数量无关
+        plan = build_ui_run_plan(case_ids)
+        log.info(f"UI用例执行计划: 用例 {len(plan.cases)}, 元素 {len(plan.elements)}, "
+                 f"数据库配置 {len(plan.environment.db_configs)}")
+        # 同一事件循环中并发执行，每个用例使用独立的浏览器上下文
+        counts = run_in_browser_pool(run_ui_cases_concurrently(plan, scheduled_task_result, temp_dir))
     except Exception as e:
-        log.error(f"清理临时目录失败: {str(e)}")
+        log.error(f"UI用例分块执行异常: {str(e)}", exc_info=True)
+        counts = {'passed': 0, 'failed': len(case_ids)}
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    log.info(f"UI用例分块执行完成: {counts}, 耗时: {time.time() - start_time:.2f}秒")
+    return counts
+
 
-    # 7. 更新顶层结果
+@shared_task
+def finalize_ui_batch(chunk_results, result_id):
+    """汇总所有分块的执行结果，更新顶层任务结果"""
+    summary = {
+        'passed': sum(result.get('passed', 0) for result in chunk_results),
+        'failed': sum(result.get('failed', 0) for result in chunk_results),
+    }
+    summary['total'] = summary['passed'] + summary['failed']
     try:
+        scheduled_task_result = ScheduledTaskResult.objects.get(id=result_id)
         scheduled_task_result.status = 'completed'
         scheduled_task_result.end_time = timezone.now()
+        # 总耗时为从任务开始到最后一个分块完成的墙钟时间
         scheduled_task_result.duration = round(
             (scheduled_task_result.end_time - scheduled_task_result.start_time).total_seconds(), 3
         )
+        summary['duration'] = scheduled_task_result.duration
+        scheduled_task_result.summary = summary
         scheduled_task_result.save()
     except Exception as e:
         log.error(f"更新任务结果失败: {str(e)}")
-        scheduled_task_result.status = 'error'
-        scheduled_task_result.save()
+        ScheduledTaskResult.objects.filter(id=result_id).update(
+            status='failed', end_time=timezone.now(), summary=summary
+        )
+
+    log.info(f"UI测试用例执行完成...execute_batch_ui_tasks END, 汇总: {summary}")
+    return summary
 
-    log.info("UI测试用例执行完成...execute_batch_ui_tasks END")
+
+@shared_task
+def fail_ui_batch(request, exc, traceback, result_id):
+    """
+    分块任务或汇总任务失败时的回调（chord 的 on_error）：汇总任务不会再执行，
+    按已落库的用例执行记录统计结果，并把仍在执行中的任务结果标记为失败
+    """
+    log.error(f"UI用例分块执行失败，任务结果 {result_id} 标记为失败: {exc}")
+    executions = UiExecution.objects.filter(scheduled_task_result_id=result_id)
+    passed = executions.filter(status='passed').count()
+    total = executions.count()
+    summary = {'passed': passed, 'failed': total - passed, 'total': total, 'error': str(exc)}
+    now = timezone.now()
+    result = ScheduledTaskResult.objects.filter(id=result_id, status__in=('pending', 'running')).first()
+    if result is None:
+        return summary
+    summary['duration'] = round((now - result.start_time).total_seconds(), 3)
+    ScheduledTaskResult.objects.filter(id=result.id).update(
+        status='failed', end_time=now, duration=summary['duration'], summary=summary
+    )
+    return summary
@@ -1,3 +1,26 @@
-from django.test import TestCase
+from types import SimpleNamespace
+from django.test import SimpleTestCase, override_settings
+from ScheduledTasks.tasks.schedule_ui_tasks import split_ui_case_chunks
 
-# Create your tests here.
+
+def make_cases(*login_case_ids):
+    return [SimpleNamespace(id=idx, login_case_id=login_case_id) for idx, login_case_id in enumerate(login_case_ids, 1)]
+
+
+class SplitUiCaseChunksTests(SimpleTestCase):
+
+    def test_groups_by_login_case(self):
+        cases = make_cases(None, 10, None, 20, 10)
+        self.assertEqual(split_ui_case_chunks(cases, chunk_size=10), [[1, 3], [2, 5], [4]])
+
+    def test_splits_large_groups(self):
+        cases = make_cases(None, 10, None, 10, 10, None)
+        self.assertEqual(split_ui_case_chunks(cases, chunk_size=2), [[1, 3], [6], [2, 4], [5]])
+
+    @override_settings(UI_BATCH_CHUNK_SIZE=3)
+    def test_default_chunk_size(self):
+        cases = make_cases(*[10] * 7)
+        self.assertEqual(split_ui_case_chunks(cases), [[1, 2, 3], [4, 5, 6], [7]])
+
+    def test_empty(self):
+        self.assertEqual(split_ui_case_chunks([], chunk_size=2), [])
@@ -4,7 +4,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_celery_beat.models import PeriodicTask, CrontabSchedule
 from .models import ScheduledTask, ScheduledTaskResult
-from .serializers import ScheduledTaskSerializer, ScheduledTaskResultSerializer
+from .serializers import ScheduledTaskSerializer, ScheduledTaskResultSerializer, ScheduledTaskResultListSerializer
 import logging
 import json
 from django.utils import timezone
@@ -150,3 +150,8 @@ class ScheduledTaskResultViewSet(viewsets.ModelViewSet):
         if schedule_id:
             return self.queryset.filter(schedule_id=schedule_id)
         return self.queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ScheduledTaskResultListSerializer
+        return ScheduledTaskResultSerializer
@@ -204,6 +204,8 @@ class TestExecution(models.Model):
         on_delete=models.SET_NULL,
         null=True
     )
+    # 执行进度（每批结果落库时更新）：{'total', 'finished', 'passed', 'failed', 'case_id', 'status', ...}
+    progress = models.JSONField(default=dict, blank=True)
 
 
 class CaseExecution(models.Model):
@@ -219,6 +219,13 @@ class CaseExecutionSerializer(serializers.ModelSerializer):
         ]
 
 
+class CaseExecutionListSerializer(CaseExecutionSerializer):
+    """执行记录列表：不返回响应数据（详情接口返回）"""
+
+    class Meta(CaseExecutionSerializer.Meta):
+        fields = [field for field in CaseExecutionSerializer.Meta.fields if field != 'response_data']
+
+
 class CaseExecutionDetailSerializer(serializers.ModelSerializer):
     # 增加测试用例详细信息
     case_id = serializers.IntegerField(source='case.id', read_only=True)
@@ -245,6 +252,13 @@ class CaseExecutionDetailSerializer(serializers.ModelSerializer):
         ]
 
 
+class CaseExecutionBriefSerializer(CaseExecutionDetailSerializer):
+    """套件执行记录列表中的用例结果：不返回响应数据"""
+
+    class Meta(CaseExecutionDetailSerializer.Meta):
+        fields = [field for field in CaseExecutionDetailSerializer.Meta.fields if field != 'response_data']
+
+
 class TestExecutionSerializer(serializers.ModelSerializer):
     cases = CaseExecutionDetailSerializer(
         'cases',
@@ -265,7 +279,7 @@ class TestExecutionSerializer(serializers.ModelSerializer):
         model = TestExecution
         fields = [
             'id', 'suite', 'status', 'started_at',
-            'ended_at', 'duration', 'executed_by',
+            'ended_at', 'duration', 'executed_by', 'progress',
             'cases', 'pass_rate', 'total_cases', 'passed_cases'
         ]
 
@@ -285,6 +299,11 @@ class TestExecutionSerializer(serializers.ModelSerializer):
         """获取通过用例数"""
         return obj.cases.filter(status='passed').count()
 
+
+class TestExecutionListSerializer(TestExecutionSerializer):
+    """套件执行记录列表：用例结果不返回响应数据（用例执行详情接口返回）"""
+    cases = CaseExecutionBriefSerializer(many=True, read_only=True)
+
 class ExecutionHistorySerializer(serializers.Serializer):
     # 通用字段
     id = serializers.IntegerField(source='s_id', allow_null=True)
@@ -1,3 +1,207 @@
-from django.test import TestCase
+import json
+import re
+import jsonpath
+from django.test import SimpleTestCase
+from common.handle_test.suite_scheduler import DependencyGraph, collect_placeholders
+from common.handle_test.template import compile_template, render_template, get_request_template, parse_arguments
+from common.handle_test.variable_pool import VariablePool
+from common.handle_test.response_wrapper import compile_jsonpath, wrap_response
 
-# Create your tests here.
+
+def run_graph(graph):
+    """按 ready() 的批次执行依赖图，返回每一批的节点"""
+    batches = []
+    while not graph.finished:
+        batch = graph.ready()
+        if not batch:
+            raise AssertionError(f"依赖图无法继续执行，已完成批次: {batches}")
+        batches.append(batch)
+        for idx in batch:
+            graph.mark_done(idx)
+    return batches
+
+
+def legacy_parse(variable_pool, raw_str):
+    """原 parse_placeholder 的实现（先替换函数调用，再替换变量），作为模板渲染结果的对照"""
+    def func_replacement(match):
+        arg_str = match.group(2).strip()
+        args = parse_arguments(arg_str) if arg_str else []
+        return str(variable_pool.execute_function(match.group(1), *args))
+
+    def var_replacement(match):
+        value = variable_pool.get_value(match.group(1))
+        return str(value) if value is not None else match.group(0)
+
+    result = re.sub(r'\${__(\w+)\((.*?)\)}', func_replacement, raw_str)
+    return re.sub(r'\${([\w\.]+)}', var_replacement, result)
+
+
+class DependencyGraphTests(SimpleTestCase):
+
+    def test_independent_cases_run_together(self):
+        graph = DependencyGraph([(set(), set()), ({'a'}, set()), (set(), {'b'})])
+        self.assertEqual(run_graph(graph), [[0, 1, 2]])
+
+    def test_read_after_write(self):
+        graph = DependencyGraph([(set(), {'token'}), ({'token'}, set()), (set(), set())])
+        self.assertEqual(run_graph(graph), [[0, 2], [1]])
+
+    def test_write_after_write(self):
+        graph = DependencyGraph([(set(), {'token'}), (set(), {'token'})])
+        self.assertEqual(run_graph(graph), [[0], [1]])
+
+    def test_write_after_read(self):
+        # 第二次写入必须等待读取第一次写入结果的用例完成
+        graph = DependencyGraph([(set(), {'a'}), ({'a'}, set()), ({'a'}, set()), (set(), {'a'}), ({'a'}, set())])
+        self.assertEqual(run_graph(graph), [[0], [1, 2], [3], [4]])
+
+    def test_ready_does_not_return_started_nodes(self):
+        graph = DependencyGraph([(set(), {'a'}), ({'a'}, set())])
+        self.assertEqual(graph.ready(), [0])
+        self.assertEqual(graph.ready(), [])
+        graph.mark_done(0)
+        self.assertEqual(graph.ready(), [1])
+        self.assertFalse(graph.finished)
+        graph.mark_done(1)
+        self.assertTrue(graph.finished)
+
+    def test_collect_placeholders_scopes(self):
+        names = collect_placeholders(
+            '/api/${suite.token}/${global.host}',
+            {'X-Case': '${case.id}', 'X-User': '${user_id}', 'X-Other': '${foo.bar}'},
+            None,
+        )
+        self.assertEqual(names, {'token', 'user_id', 'foo.bar'})
+
+
+class TemplateTests(SimpleTestCase):
+
+    def setUp(self):
+        self.vp = VariablePool()
+        self.vp.set_function_code(
+            'def add(a, b):\n'
+            '    return a + b\n'
+            'def echo(value):\n'
+            '    return value\n'
+            'def ref():\n'
+            '    return "${token}"\n'
+        )
+        self.vp.update_global({'host': 'example.com', 'token': 'global-token'})
+        self.vp.update_suite({'token': 'suite-token', 'page': 2})
+        self.vp.update_case_params({'user': 'tom'})
+
+    def test_render_matches_legacy_parse(self):
+        samples = [
+            '',
+            'no placeholder',
+            '${token}',
+            'https://${global.host}/api?page=${suite.page}&user=${case.user}',
+            '${missing} and ${suite.missing}',
+            '${__add(1, 2)}',
+            'sum=${__add(1, 2)}, user=${user}',
+            '${__echo(abc)}',
+            '${__echo("${user}")}',
+            '${__ref()}',
+            '{"token": "${token}", "n": ${__add(3, 4)}}',
+        ]
+        for raw in samples:
+            with self.subTest(raw=raw):
+                self.assertEqual(render_template(compile_template(raw), self.vp), legacy_parse(self.vp, raw))
+
+    def test_failed_function_keeps_placeholder(self):
+        raw = 'value=${__undefined(1)} ${user}'
+        self.assertEqual(render_template(compile_template(raw), self.vp), 'value=${__undefined(1)} tom')
+
+    def test_request_template_matches_legacy_prepare(self):
+        case_data = {
+            'method': 'POST',
+            'url': 'https://${global.host}/api/users/${user}',
+            'headers': {'Authorization': 'Bearer ${token}', 'X-${user}': '${__add(1, 2)}'},
+            'body': json.dumps({'page': '${suite.page}', 'items': [{'name': '${user}', 'n': '${__add(2, 3)}'}]}),
+            'body_type': 'raw',
+        }
+        expected = {
+            'method': 'POST',
+            'url': legacy_parse(self.vp, case_data['url']),
+            'headers': json.loads(legacy_parse(self.vp, json.dumps(case_data['headers']))),
+            'json': json.loads(legacy_parse(self.vp, case_data['body'])),
+        }
+        self.assertEqual(get_request_template(case_data).render(self.vp), expected)
+
+    def test_request_template_get_and_form(self):
+        get_case = {'method': 'GET', 'url': '/users', 'headers': {}, 'params': {'page': '${suite.page}'}}
+        self.assertEqual(get_request_template(get_case).render(self.vp)['params'], {'page': '2'})
+        form_case = {'method': 'POST', 'url': '/login', 'body_type': 'form', 'data': {'user': '${user}'}}
+        self.assertEqual(get_request_template(form_case).render(self.vp)['data'], {'user': 'tom'})
+
+    def test_request_template_cache(self):
+        case_data = {'method': 'GET', 'url': '/users/${user}'}
+        template = get_request_template(case_data, cache_key=('tests', 1))
+        self.assertIs(get_request_template(case_data, cache_key=('tests', 1)), template)
+        self.assertIsNot(get_request_template(case_data), template)
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.status_code = 200
+        self.headers = {}
+        self.content = json.dumps(data).encode('utf-8')
+        self.text = self.content.decode('utf-8')
+
+
+class JsonPathTests(SimpleTestCase):
+    data = {
+        'code': 0,
+        'data': {
+            'user': {'id': 1, 'name': 'tom', 'tags': ['a', 'b']},
+            'list': [{'id': 1, 'name': 'x'}, {'id': 2, 'name': 'y'}],
+            'token': 't-1',
+            'zero': 0,
+            'empty': '',
+        },
+        'items': [],
+    }
+    simple_exprs = [
+        '$.code',
+        '$.data.user.id',
+        '$.data.user',
+        '$.data.user.tags[1]',
+        '$.data.list[0].name',
+        '$.data.list[5]',
+        "$['data']['token']",
+        "$['data'].list[1].id",
+        '$.data.missing',
+        '$.data.token.missing',
+        '$.data.zero',
+        '$.data.empty',
+        '$.items',
+        '$.items[0]',
+    ]
+    complex_exprs = [
+        '$..id',
+        '$.data.list[*].id',
+        '$.data.list[?(@.id==2)].name',
+        '$.data.user.*',
+    ]
+
+    def test_simple_paths_use_fast_path(self):
+        for expr in self.simple_exprs:
+            with self.subTest(expr=expr):
+                self.assertIsNotNone(compile_jsonpath(expr).keys)
+        for expr in self.complex_exprs:
+            with self.subTest(expr=expr):
+                self.assertIsNone(compile_jsonpath(expr).keys)
+
+    def test_find_matches_jsonpath_lib(self):
+        for obj in (self.data, {}, []):
+            for expr in self.simple_exprs + self.complex_exprs:
+                with self.subTest(obj=obj, expr=expr):
+                    self.assertEqual(compile_jsonpath(expr).find(obj), jsonpath.jsonpath(obj, expr))
+
+    def test_prefetch_matches_jsonpath_lib(self):
+        response = wrap_response(FakeResponse(self.data))
+        exprs = self.simple_exprs + self.complex_exprs
+        response.prefetch_jsonpaths(exprs)
+        for expr in exprs:
+            with self.subTest(expr=expr):
+                self.assertEqual(response.jsonpath(expr), jsonpath.jsonpath(self.data, expr))
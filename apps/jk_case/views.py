@@ -1,9 +1,9 @@
 from common.utils import APIResponse
-from rest_framework import viewsets, permissions, status
+from rest_framework import viewsets, permissions, status, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import TestSuite, TestExecution, InterFace, TestCase, Module, CaseExecution
-from .serializers import (TestSuiteSerializer, TestExecutionSerializer,
+from .serializers import (TestSuiteSerializer, TestExecutionSerializer, TestExecutionListSerializer, CaseExecutionListSerializer,
                           InterFaceSerializer, TestCaseSerializer, ModuleSerializer, AllModuleSerializer,
                           InterFaceIdNameSerializer, SimpleTestCaseSerializer, CaseExecutionSerializer, ExecutionHistorySerializer)
 from .filter_set import TestCaseFilter, SuiteFilter
@@ -12,10 +12,12 @@ from common.error_codes import ErrorCode
 from common.handle_test.tasks import async_execute_suite
 from common.handle_test.runcase import execute_case
 from common.handle_test.run_interface import execute_interface
+from common.handle_test.payload_storage import load_response_body
+from common.handle_test.assertions import ASSERTION_MODES
 from common.exceptions import BusinessException
 import logging
 
-from django.db.models import Count, F, Q, Value, CharField
+from django.db.models import Count, F, Q, Value, CharField, Prefetch
 
 log = logging.getLogger('django')
 
@@ -203,15 +205,19 @@ class TestCaseViewSet(viewsets.ModelViewSet):
     def execute(self, request, pk=None):
         """
         request example:
-            {"env_url": "http://127.0.0.1:8000"}
+            {"env_url": "http://127.0.0.1:8000", "assertion_mode": "all"}
+        assertion_mode: 断言执行模式，fail_fast 遇到失败即停止，all 执行全部断言
         """
         case = self.get_object()
         env_url = request.data.get('env_url')
+        assertion_mode = request.data.get('assertion_mode')
+        if assertion_mode and assertion_mode not in ASSERTION_MODES:
+            raise BusinessException(ErrorCode.INVALID_PARAMS)
 
         if not case.enabled:
             raise BusinessException(ErrorCode.TESTCASE_DISABLED)
 
-        execute_case(case_obj=case, execute_env=env_url, executed_by=request.user)
+        execute_case(case_obj=case, execute_env=env_url, executed_by=request.user, assertion_mode=assertion_mode)
 
         return APIResponse({'code': 0, 'message': '执行完成'})
 
@@ -224,9 +230,12 @@ class TestCaseViewSet(viewsets.ModelViewSet):
         """
         case_instance = self.get_object()
 
-        queryset = CaseExecution.objects.filter(case=case_instance).order_by('-created_at')[:10]
+        # 历史列表不返回响应数据，查看响应时调用用例执行详情接口
+        queryset = CaseExecution.objects.filter(case=case_instance).select_related(
+            'case', 'executed_by'
+        ).defer('response_data').order_by('-created_at')[:10]
 
-        serializer = CaseExecutionSerializer(queryset, many=True)
+        serializer = CaseExecutionListSerializer(queryset, many=True)
 
         return APIResponse(data=serializer.data)
 
@@ -249,10 +258,24 @@ class TestSuiteViewSet(viewsets.ModelViewSet):
     def execute(self, request, pk=None):
         """
         Example:
-            {"env_url": "http://127.0.0.1:8000"}
+            {"env_url": "http://127.0.0.1:8000", "parallel": false, "concurrency": 5, "assertion_mode": "all"}
+        parallel: 并行模式，无变量依赖的用例并发执行；concurrency: 并行模式下的最大并发数
+        assertion_mode: 断言执行模式，fail_fast 遇到失败即停止，all 执行全部断言
         """
         suite = self.get_object()
         env_url = request.data.get('env_url')
+        # 参数在提交任务前校验，避免创建执行记录后任务才因参数错误失败
+        concurrency = request.data.get('concurrency')
+        try:
+            # "false"/"0" 等字符串按布尔值解析
+            parallel = serializers.BooleanField().run_validation(request.data.get('parallel', False))
+            concurrency = None if concurrency in (None, '') else serializers.IntegerField(
+                min_value=1).run_validation(concurrency)
+        except serializers.ValidationError:
+            raise BusinessException(ErrorCode.INVALID_PARAMS)
+        assertion_mode = request.data.get('assertion_mode')
+        if assertion_mode and assertion_mode not in ASSERTION_MODES:
+            raise BusinessException(ErrorCode.INVALID_PARAMS)
         # if not suite.enabled:
         #     raise BusinessException(ErrorCode.TESTSUITE_DISABLED)
         # if not env_url:
@@ -270,7 +293,7 @@ class TestSuiteViewSet(viewsets.ModelViewSet):
         )
         try:
             # 触发异步任务
-            async_execute_suite.delay(execution.id, request.user.id, env_url)
+            async_execute_suite.delay(execution.id, request.user.id, env_url, parallel, concurrency, assertion_mode)
             return Response(
                 {'execution_id': execution.id, 'status': '任务已提交'},
                 status=status.HTTP_202_ACCEPTED
@@ -297,14 +320,43 @@ class TestExecutionViewSet(viewsets.ModelViewSet):
         suite = self.request.query_params.get('suite')
         if suite:
             query_set = TestExecution.objects.filter(suite__id=suite).order_by('-id')[:10]
+        if self.action == 'list':
+            # 列表接口的用例结果不返回响应数据
+            query_set = query_set.prefetch_related(Prefetch(
+                'cases',
+                queryset=CaseExecution.objects.select_related('case__interface', 'executed_by').defer('response_data')
+            ))
         return query_set
 
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return TestExecutionListSerializer
+        return TestExecutionSerializer
+
 
 class CaseExecutionViewSet(viewsets.ModelViewSet):
     queryset = CaseExecution.objects.all()
     serializer_class = CaseExecutionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_queryset(self):
+        if self.action == 'list':
+            # 列表接口不返回响应数据
+            return CaseExecution.objects.select_related('case', 'executed_by').defer('response_data')
+        return CaseExecution.objects.all()
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return CaseExecutionListSerializer
+        return CaseExecutionSerializer
+
+    def retrieve(self, request, *args, **kwargs):
+        """详情接口：响应体存储在对象存储中时，按需读取完整内容（列表接口只返回预览）"""
+        instance = self.get_object()
+        data = self.get_serializer(instance).data
+        data['response_data'] = load_response_body(instance.response_data)
+        return APIResponse(data)
+
 
 class ExecutionHistoryViewSet(viewsets.ModelViewSet):
     serializer_class = ExecutionHistorySerializer
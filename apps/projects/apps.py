@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ProjectsConfig(AppConfig):
     name = 'projects'
     verbose_name = '项目名称'
+
+    def ready(self):
+        # 注册信号
+        from projects import signals  # noqa: F401
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from projects.models import PythonCode
+from common.handle_test.function_cache import clear_function_namespace_cache
+
+
+@receiver([post_save, post_delete], sender=PythonCode)
+def invalidate_function_namespace(sender, **kwargs):
+    """PythonCode 变更后清空函数命名空间缓存"""
+    clear_function_namespace_cache()
@@ -9,6 +9,7 @@ from projects.projectsSerialize import (ProjectsSerialize, ProjectsFilter, Globa
                                         GlobalVariableFilter, ProjectEnvsSerialize, PythonCodeSerialize, DBConfigSerialize)
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
+from common.handle_test.execute_sql import engine_registry
 import logging
 from django.utils import timezone
 from datetime import timedelta
@@ -341,3 +342,8 @@ class DBConfigView(viewsets.ModelViewSet):
         logger.info(
             f"用户 {self.request.user} 将数据库配置 {old_name} 修改为 {instance.name}"
         )
+
+    @action(detail=False, methods=['get'], url_path='pool-stats')
+    def pool_stats(self, request):
+        """当前 web 进程（单用例执行、接口调试）的 SQL 连接池统计；worker 进程的统计定期输出到日志"""
+        return APIResponse(engine_registry.stats())
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class UiCaseConfig(AppConfig):
     name = 'ui_case'
     verbose_name = 'UI用例'
+
+    def ready(self):
+        # 注册信号
+        from ui_case import signals  # noqa: F401
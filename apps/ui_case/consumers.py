@@ -1,14 +1,60 @@
+import asyncio
+import logging
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from common.redis_client import get_async_redis
+from ui_case.live import awatch_run, aunwatch_run, frame_to_event, RUN_FRAMES_CHANNEL
+
+log = logging.getLogger('django')
+
 
 class RunConsumer(AsyncJsonWebsocketConsumer):
+    """
+    UI 执行实时事件
+    画面帧通过 Redis pub/sub 单独转发：连接参数 ?frames=binary 时以二进制消息发送
+    （4 字节头部长度 + JSON 头部 + 图片字节），否则转换为原有的 JSON 帧事件；其它事件仍走 channel layer
+    """
+
     async def connect(self):
         self.run_id = self.scope["url_route"]["kwargs"]["run_id"]
         self.group = f"run_{self.run_id}"
+        query = parse_qs(self.scope.get("query_string", b"").decode())
+        self.binary_frames = query.get("frames", [""])[0] == "binary"
         await self.channel_layer.group_add(self.group, self.channel_name)
         await self.accept()
+        self.frame_task = asyncio.create_task(self.forward_frames())
+        # 记录订阅者，执行端没有订阅者时不截图推流
+        await awatch_run(self.run_id)
+        self.watching = True
 
     async def disconnect(self, code):
         await self.channel_layer.group_discard(self.group, self.channel_name)
+        if getattr(self, 'frame_task', None):
+            self.frame_task.cancel()
+        if getattr(self, 'watching', False):
+            await aunwatch_run(self.run_id)
+
+    async def forward_frames(self):
+        """订阅本次执行的画面帧并转发给前端"""
+        pubsub = get_async_redis().pubsub()
+        try:
+            await pubsub.subscribe(RUN_FRAMES_CHANNEL.format(run_id=self.run_id))
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                if self.binary_frames:
+                    await self.send(bytes_data=message["data"])
+                else:
+                    await self.send_json(frame_to_event(message["data"]))
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            log.warning(f"转发画面帧失败: {e}")
+        finally:
+            try:
+                await pubsub.close()
+            except Exception:
+                pass
 
     async def run_event(self, event):
         await self.send_json(event["data"])
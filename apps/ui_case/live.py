@@ -1,6 +1,23 @@
 import asyncio
+import base64
+import json
+import logging
+import struct
+import time
+import redis
 from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from asgiref.sync import async_to_sync, sync_to_async
+from common.redis_client import get_redis, get_async_redis
+
+log = logging.getLogger('django')
+
+# 每个 run 当前的 WebSocket 订阅数（RunConsumer 连接/断开时增减），执行端据此决定是否截图推流
+RUN_WATCHERS_KEY = 'ui:run_watchers:{run_id}'
+# 订阅计数的过期时间，避免进程异常退出时计数残留
+RUN_WATCHERS_TTL = 6 * 3600
+# 画面帧不经过 channel layer，通过独立的 pub/sub 频道以二进制发布
+RUN_FRAMES_CHANNEL = 'ui:run_frames:{run_id}'
+_FRAME_HEADER = struct.Struct('>I')
 
 
 async def aemit_run_event(run_id: str, data: dict):
@@ -27,3 +44,67 @@ def emit_run_event(run_id: str, data: dict):
             f"run_{run_id}",
             {"type": "run_event", "data": data}
         )
+
+
+def _incr_watchers(run_id: str, amount: int) -> int:
+    key = RUN_WATCHERS_KEY.format(run_id=run_id)
+    client = get_redis()
+    count = client.incrby(key, amount)
+    if count <= 0:
+        client.delete(key)
+    else:
+        client.expire(key, RUN_WATCHERS_TTL)
+    return count
+
+
+async def awatch_run(run_id: str):
+    """记录一个订阅者（RunConsumer.connect 调用）"""
+    try:
+        await sync_to_async(_incr_watchers, thread_sensitive=False)(run_id, 1)
+    except redis.RedisError as e:
+        log.warning(f"更新订阅计数失败: {e}")
+
+
+async def aunwatch_run(run_id: str):
+    """移除一个订阅者（RunConsumer.disconnect 调用）"""
+    try:
+        await sync_to_async(_incr_watchers, thread_sensitive=False)(run_id, -1)
+    except redis.RedisError as e:
+        log.warning(f"更新订阅计数失败: {e}")
+
+
+async def arun_watcher_count(run_id: str) -> int:
+    """当前订阅者数量；读取失败时按有人订阅处理，保证推流不中断"""
+    try:
+        count = await sync_to_async(get_redis().get, thread_sensitive=False)(RUN_WATCHERS_KEY.format(run_id=run_id))
+    except redis.RedisError as e:
+        log.warning(f"读取订阅计数失败: {e}")
+        return 1
+    return int(count or 0)
+
+
+def pack_frame(header: dict, image: bytes) -> bytes:
+    """二进制帧：4 字节头部长度（大端） + JSON 头部 + 图片字节"""
+    header_bytes = json.dumps(header, separators=(',', ':')).encode()
+    return _FRAME_HEADER.pack(len(header_bytes)) + header_bytes + image
+
+
+def unpack_frame(data: bytes):
+    """解析二进制帧，返回 (header, image)"""
+    size = _FRAME_HEADER.unpack_from(data)[0]
+    start = _FRAME_HEADER.size
+    return json.loads(data[start:start + size]), data[start + size:]
+
+
+def frame_to_event(data: bytes) -> dict:
+    """二进制帧转换为原有的 JSON 帧事件（img_b64 data URL），兼容未开启二进制传输的前端"""
+    header, image = unpack_frame(data)
+    event = {k: v for k, v in header.items() if k != 'format'}
+    event['img_b64'] = f"data:image/{header.get('format', 'jpeg')};base64," + base64.b64encode(image).decode()
+    return event
+
+
+async def aemit_run_frame(run_id: str, image: bytes, fmt: str = 'jpeg'):
+    """发布一帧画面（纯异步）"""
+    header = {'type': 'frame', 'ts': int(time.time() * 1000), 'format': fmt}
+    await get_async_redis().publish(RUN_FRAMES_CHANNEL.format(run_id=run_id), pack_frame(header, image))
@@ -88,6 +88,10 @@ class UiExecution(models.Model):
     )
     steps_log = models.JSONField(default={})
     screenshot = models.FileField(upload_to='screenshots/', null=True, blank=True)
+    # 失败现场文件在对象存储中的路径：{'trace': ..., 'har': ...}
+    artifacts = models.JSONField(default=dict, blank=True)
+    # 检查点分段执行记录：[{'attempt', 'resumed_from', 'start_step', 'end_step', 'status', ...}]
+    segments = models.JSONField(default=list, blank=True)
     duration = models.FloatField(default=0)
     browser_info = models.CharField(max_length=128, blank=True, null=True)
 
@@ -118,3 +122,37 @@ class UiTestFile(models.Model):
         db_table = 'qy_ui_test_file'
         verbose_name_plural = verbose_name = 'UI测试文件'
         ordering = ['-uploaded_at']
+
+
+class UiInterceptionProfile(models.Model):
+    """
+    UI 执行的请求拦截配置（每个项目一份），执行时通过 BrowserContext.route 生效：
+      blocked_resource_types: 屏蔽的资源类型，如 ["media", "font"]
+      blocked_url_patterns: 屏蔽的 URL（glob），如 ["*google-analytics.com*", "*.mp4"]
+      cache_static: 静态资源（脚本、样式、字体、图片）缓存到 worker 本地磁盘
+      stubs: 固定返回的接口 [{"url": "*/api/config*", "method": "GET", "status": 200,
+                              "headers": {...}, "body": "..."}]
+    """
+    project = models.OneToOneField(Projects, on_delete=models.CASCADE, related_name='ui_interception_profile')
+    enabled = models.BooleanField(default=True)
+    blocked_resource_types = models.JSONField(default=list, blank=True)
+    blocked_url_patterns = models.JSONField(default=list, blank=True)
+    cache_static = models.BooleanField(default=False)
+    stubs = models.JSONField(default=list, blank=True)
+    created_by = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='created_interception_profiles')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    updated_by = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='updated_interception_profiles', null=True, blank=True)
+
+    class Meta:
+        db_table = 'qy_ui_interception_profile'
+        verbose_name_plural = verbose_name = 'UI请求拦截配置'
+
+    def to_rules(self) -> dict:
+        """执行引擎使用的拦截规则"""
+        return {
+            'blocked_resource_types': self.blocked_resource_types or [],
+            'blocked_url_patterns': self.blocked_url_patterns or [],
+            'cache_static': self.cache_static,
+            'stubs': self.stubs or [],
+        }
@@ -1,7 +1,11 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
 from rest_framework import serializers
-from ui_case.models import (UiElement, UiTestCase, UiExecution, UiTestModule, UiTestFile)
+from ui_case.models import (UiElement, UiTestCase, UiExecution, UiTestModule, UiTestFile,
+                            UiInterceptionProfile)
 from common.exceptions import BusinessException
 from common.error_codes import ErrorCode
+from common.handle_ui_test.screenshot_uploader import thumbnail_name
 
 
 class SimpleUiElementSerializer(serializers.ModelSerializer):
@@ -169,9 +173,37 @@ class UiExecutionSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         representation = super().to_representation(instance)
         representation['testcase_name'] = instance.testcase.name
+        # 开启缩略图时返回缩略图地址，供列表页展示
+        if settings.UI_SCREENSHOT_THUMBNAIL and instance.screenshot:
+            representation['screenshot_thumbnail'] = default_storage.url(thumbnail_name(instance.screenshot.name))
         return representation
 
 
+class UiExecutionListSerializer(UiExecutionSerializer):
+    """执行记录列表：不返回执行日志（详情接口返回）"""
+
+    class Meta:
+        model = UiExecution
+        exclude = ['steps_log']
+
+
+class UiInterceptionProfileSerializer(serializers.ModelSerializer):
+    created_by = serializers.CharField(source='created_by.username', read_only=True)
+    updated_by = serializers.CharField(source='updated_by.username', read_only=True)
+    created_at = serializers.DateTimeField(format='%Y-%m-%d %H:%M:%S', read_only=True)
+    updated_at = serializers.DateTimeField(format='%Y-%m-%d %H:%M:%S', read_only=True)
+
+    class Meta:
+        model = UiInterceptionProfile
+        fields = '__all__'
+
+    def validate_stubs(self, value):
+        # 每个固定返回的接口都需要配置 url
+        if not isinstance(value, list) or any(not isinstance(stub, dict) or not stub.get('url') for stub in value):
+            raise serializers.ValidationError("每个固定返回的接口都需要配置 url")
+        return value
+
+
 class UiTestFileSerializer(serializers.ModelSerializer):
     uploaded_by = serializers.CharField(source='uploaded_by.username', read_only=True)
     uploaded_at = serializers.DateTimeField(format='%Y-%m-%d %H:%M:%S', read_only=True)
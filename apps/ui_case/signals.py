@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from ui_case.models import UiElement
+from common.handle_ui_test.element_cache import invalidate_element_cache
+
+
+@receiver([post_save, post_delete], sender=UiElement)
+def invalidate_element_locators(sender, **kwargs):
+    """UiElement 变更后使各 worker 进程的元素定位器缓存失效"""
+    invalidate_element_cache()
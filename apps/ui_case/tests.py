@@ -1,3 +1,164 @@
-from django.test import TestCase
+import asyncio
+from types import SimpleNamespace
+import httpx
+from django.test import SimpleTestCase
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError, Error as PlaywrightError
+from common.handle_ui_test.ui_runner import UIExecutionEngine, is_environment_error
+from common.handle_ui_test.login_state import login_state_expired
 
-# Create your tests here.
+
+def run_graph(graph):
+    """按 ready() 的批次执行依赖图，返回每一批的节点"""
+    batches = []
+    while not graph.finished:
+        batch = graph.ready()
+        if not batch:
+            raise AssertionError(f"依赖图无法继续执行，已完成批次: {batches}")
+        batches.append(batch)
+        for idx in batch:
+            graph.mark_done(idx)
+    return batches
+
+
+class PreApiGraphTests(SimpleTestCase):
+
+    def setUp(self):
+        self.engine = UIExecutionEngine(run_id='tests')
+
+    def test_stages_follow_extracted_variables(self):
+        pre_apis = [
+            {'name': 'login', 'request': {'url': '/login'}, 'extracts': [{'varName': 'token'}]},
+            {'name': 'profile', 'request': {'url': '/profile', 'headers': {'Authorization': '${token}'}},
+             'extracts': ['user_id']},
+            {'name': 'orders', 'request': {'url': '/orders?token=${token}'}},
+            {'name': 'config', 'request': {'url': '/config'}},
+            {'name': 'detail', 'request': {'url': '/users/${user_id}'}},
+        ]
+        graph = self.engine.build_pre_api_graph(pre_apis)
+        self.assertEqual(run_graph(graph), [[0, 3], [1, 2], [4]])
+
+    def test_sql_without_extracts_keeps_order(self):
+        # 未配置 extracts 的 SQL 会把查询结果的所有列写入上下文，读取变量的步骤都要等它完成
+        pre_apis = [
+            {'name': 'login', 'request': {'url': '/login'}, 'extracts': ['token']},
+            {'type': 'sql', 'sql': 'select token from user limit 1'},
+            {'name': 'orders', 'request': {'url': '/orders?token=${token}'}},
+            {'name': 'config', 'request': {'url': '/config'}},
+        ]
+        graph = self.engine.build_pre_api_graph(pre_apis)
+        self.assertEqual(run_graph(graph), [[0, 3], [1], [2]])
+
+    def test_sql_reads_placeholders_from_sql(self):
+        pre_apis = [
+            {'name': 'login', 'request': {'url': '/login'}, 'extracts': ['token']},
+            {'type': 'sql', 'sql': "select id from orders where token = '${token}'", 'extracts': ['order_id']},
+            {'name': 'order', 'request': {'url': '/orders/${order_id}'}},
+        ]
+        graph = self.engine.build_pre_api_graph(pre_apis)
+        self.assertEqual(run_graph(graph), [[0], [1], [2]])
+
+
+class EnvironmentErrorTests(SimpleTestCase):
+
+    def test_environment_errors(self):
+        errors = [
+            PlaywrightTimeoutError('Timeout 30000ms exceeded.'),
+            asyncio.TimeoutError(),
+            httpx.ConnectError('connection refused'),
+            PlaywrightError('net::ERR_CONNECTION_REFUSED at https://example.com/'),
+            PlaywrightError('Target page, context or browser has been closed'),
+            PlaywrightError('Navigation failed because page crashed!'),
+        ]
+        for error in errors:
+            with self.subTest(error=repr(error)):
+                self.assertTrue(is_environment_error(error))
+
+    def test_other_errors(self):
+        errors = [
+            AssertionError('expected 1 got 2'),
+            ValueError('Element ID 1 not found'),
+            PlaywrightError('strict mode violation: locator resolved to 2 elements'),
+        ]
+        for error in errors:
+            with self.subTest(error=repr(error)):
+                self.assertFalse(is_environment_error(error))
+
+
+class ResumeSkipReasonTests(SimpleTestCase):
+    steps = [
+        {'action': 'goto', 'url': '/'},
+        {'action': 'click', 'element_id': 1},
+        {'action': 'fill', 'element_id': 2, 'value': 'a'},
+        {'action': 'click', 'element_id': 3},
+        {'action': 'wait_element', 'element_id': 4},
+    ]
+
+    def setUp(self):
+        self.engine = UIExecutionEngine(run_id='tests')
+
+    def fail_at(self, step, retryable=True, error_type='TimeoutError'):
+        self.engine.failure = {'step': step, 'url': '', 'error_type': error_type, 'message': '', 'retryable': retryable}
+
+    def test_without_checkpoint(self):
+        self.fail_at(5)
+        self.assertIsNotNone(self.engine.resume_skip_reason(self.steps))
+
+    def test_environment_error_resumes(self):
+        self.engine.last_checkpoint = {'step_index': 2}
+        self.fail_at(5)
+        self.assertIsNone(self.engine.resume_skip_reason(self.steps))
+
+    def test_non_environment_error(self):
+        self.engine.last_checkpoint = {'step_index': 2}
+        self.fail_at(5, retryable=False, error_type='AssertionError')
+        self.assertIn('AssertionError', self.engine.resume_skip_reason(self.steps))
+
+    def test_sql_step_after_checkpoint(self):
+        steps = [dict(step) for step in self.steps]
+        steps[3] = {'action': 'sql', 'sql': 'update orders set status = 1'}
+        self.engine.last_checkpoint = {'step_index': 2}
+        self.fail_at(5)
+        self.assertIsNotNone(self.engine.resume_skip_reason(steps))
+
+    def test_sql_step_before_checkpoint(self):
+        steps = [dict(step) for step in self.steps]
+        steps[1] = {'action': 'sql', 'sql': 'update orders set status = 1'}
+        self.engine.last_checkpoint = {'step_index': 2}
+        self.fail_at(5)
+        self.assertIsNone(self.engine.resume_skip_reason(steps))
+
+
+class LoginStateExpiredTests(SimpleTestCase):
+    login_case = SimpleNamespace(steps=[
+        {'action': 'goto', 'url': 'https://example.com/login/'},
+        {'action': 'fill', 'element_id': 1, 'value': 'tom'},
+    ])
+
+    def result(self, failure=None, pre_apis_result=None):
+        logs = {'pre_apis_result': pre_apis_result or [], 'failure': failure}
+        return 'failed', logs, ''
+
+    def test_pre_api_auth_failure(self):
+        result = self.result(pre_apis_result=[{'status_code': 200}, {'status_code': 401}])
+        self.assertTrue(login_state_expired(self.login_case, result))
+
+    def test_no_failure(self):
+        self.assertFalse(login_state_expired(self.login_case, self.result()))
+        self.assertFalse(login_state_expired(self.login_case, ('failed', None, '')))
+
+    def test_first_step_failure(self):
+        result = self.result(failure={'step': 1, 'url': 'https://example.com/home'})
+        self.assertTrue(login_state_expired(self.login_case, result))
+
+    def test_redirected_to_login_page(self):
+        result = self.result(failure={'step': 3, 'url': 'https://example.com/login?next=/orders'})
+        self.assertTrue(login_state_expired(self.login_case, result))
+
+    def test_failure_on_other_page(self):
+        result = self.result(failure={'step': 3, 'url': 'https://example.com/orders'})
+        self.assertFalse(login_state_expired(self.login_case, result))
+
+    def test_login_url_with_variable(self):
+        login_case = SimpleNamespace(steps=[{'action': 'goto', 'url': '${base_url}/login'}])
+        result = self.result(failure={'step': 3, 'url': 'https://example.com/login'})
+        self.assertFalse(login_state_expired(login_case, result))
@@ -1,11 +1,18 @@
 import django.conf
 from rest_framework import viewsets, permissions, status
 from common.utils import APIResponse
-from ui_case.models import UiTestCase, UiExecution, UiElement, UiTestModule, UiTestFile
-from ui_case.serializers import (UiTestCaseSerializer, UiExecutionSerializer,
+from ui_case.models import UiTestCase, UiExecution, UiElement, UiTestModule, UiTestFile, UiInterceptionProfile
+from ui_case.serializers import (UiTestCaseSerializer, UiExecutionSerializer, UiExecutionListSerializer,
                                  UiElementSerializer, UiTestModuleSerializer,
-                                 SimpleUiElementSerializer, UiTestFileSerializer)
+                                 SimpleUiElementSerializer, UiTestFileSerializer,
+                                 UiInterceptionProfileSerializer)
 from common.handle_ui_test.ui_tasks import run_ui_test_case
+from common.handle_ui_test.execution_log import load_execution_log
+from rest_framework.response import Response
+from django.core.files.storage import default_storage
+from django.http import FileResponse
+from django.shortcuts import get_object_or_404
+import os
 from rest_framework.decorators import action
 from django.db.models import Q
 import logging
@@ -144,7 +151,8 @@ class UiTestCaseViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'], url_path='run')
     def run_test_case(self, request, pk=None):
         """
-        接口参数：{"browser_info": "chromium"}
+        接口参数：{"browser_info": "chromium", "capture": true}
+        capture: 失败时采集 trace/HAR，不传时使用系统默认配置
         """
         run_id = str(uuid.uuid4())
         log.info(f'生成的Run ID: {run_id}')
@@ -152,12 +160,13 @@ class UiTestCaseViewSet(viewsets.ModelViewSet):
             browser_info = request.data.get('browser_type', django.conf.settings.UI_TEST_BROWSER_TYPE)
             # browser_info = django.conf.settings.UI_TEST_BROWSER_TYPE if not browser_info else browser_info
             headless = request.data.get('headless', True)
+            capture = request.data.get('capture')
             testcase = self.get_object()
             execution = UiExecution.objects.create(
                 testcase=testcase, status='running', steps_log='', screenshot='',
                 duration=0, browser_info=browser_info, executed_by=request.user
             )
-            run_ui_test_case.delay(execution.id, browser_info, headless, run_id)
+            run_ui_test_case.delay(execution.id, browser_info, headless, run_id, capture=capture)
             return APIResponse({
                 "message": "测试任务已开始",
                 "run_id": run_id
@@ -177,6 +186,7 @@ class UiTestCaseViewSet(viewsets.ModelViewSet):
         # try:
         browser_info = request.data.get('browser_type', 'chromium')
         headless = request.data.get('headless', True)
+        capture = request.data.get('capture')
         case_ids = request.data.get('case_ids', [])
         log.info(f'接收到的用例ID列表：{case_ids} | 浏览器信息：{browser_info} | 是否无头模式：{headless}')
         if not browser_info:
@@ -189,7 +199,7 @@ class UiTestCaseViewSet(viewsets.ModelViewSet):
                 testcase=testcase, status='running', steps_log='', screenshot='',
                 duration=0, browser_info=browser_info, executed_by=request.user
             )
-            run_ui_test_case.delay(execution.id, browser_info, is_headless=headless)
+            run_ui_test_case.delay(execution.id, browser_info, is_headless=headless, capture=capture)
             print('提交任务的用例：', testcase.name)
         return APIResponse("测试任务已开始", status=status.HTTP_202_ACCEPTED)
         # except Exception as e:
@@ -221,12 +231,33 @@ class UiExecutionViewSet(viewsets.ModelViewSet):
         if project_id:
             self.queryset = self.queryset.filter(testcase__module_id__project_id=project_id)  # Filter by project_id
 
+        if self.action == 'list':
+            # 列表接口不返回执行日志
+            self.queryset = self.queryset.defer('steps_log')
+
         return self.queryset
 
-    # def retrieve(self, request, *args, **kwargs):
-    #     instance = self.get_object()
-    #     serializer = self.get_serializer(instance)
-    #     return Response(serializer.data)
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return UiExecutionListSerializer
+        return UiExecutionSerializer
+
+    def retrieve(self, request, *args, **kwargs):
+        """详情接口：执行日志存储在对象存储中时，按需读取完整内容"""
+        instance = self.get_object()
+        data = self.get_serializer(instance).data
+        data['steps_log'] = load_execution_log(instance.steps_log)
+        return Response(data)
+
+    @action(detail=True, methods=['get'], url_path=r'artifacts/(?P<kind>trace|har)')
+    def download_artifact(self, request, pk=None, kind=None):
+        """下载失败现场文件（trace 可在 trace.playwright.dev 中打开），从对象存储按需读取"""
+        # 定时任务产生的执行记录同样可以下载，不经过 get_queryset 的过滤
+        execution = get_object_or_404(UiExecution, pk=pk)
+        name = (execution.artifacts or {}).get(kind)
+        if not name or not default_storage.exists(name):
+            raise BusinessException(ErrorCode.DATA_NOT_EXISTS)
+        return FileResponse(default_storage.open(name, 'rb'), as_attachment=True, filename=os.path.basename(name))
 
 
 class UiTestFileViewSet(viewsets.ModelViewSet):
@@ -238,3 +269,19 @@ class UiTestFileViewSet(viewsets.ModelViewSet):
         serializer.save(uploaded_by=self.request.user)
 
 
+class UiInterceptionProfileViewSet(viewsets.ModelViewSet):
+    queryset = UiInterceptionProfile.objects.all()
+    serializer_class = UiInterceptionProfileSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        project_id = self.request.query_params.get('project_id')
+        if project_id:
+            return self.queryset.filter(project_id=project_id)
+        return self.queryset
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user, updated_by=self.request.user)
+
+    def perform_update(self, serializer):
+        serializer.save(updated_by=self.request.user)
@@ -1,6 +1,10 @@
 import json
 
-import jsonpath
+from common.handle_test.response_wrapper import wrap_response
+
+
+# 断言函数接收 ResponseWrapper（传入原始响应对象时自动包装），
+# 同一响应的多个断言、变量提取共用一次 JSON 解析结果
 
 
 def status_code(response, expected):
@@ -10,7 +14,7 @@ def status_code(response, expected):
 
 def jsonpath_equal(response, expected):
     """断言响应体"""
-    actual_value = jsonpath.jsonpath(response.json(), expected['path'])
+    actual_value = wrap_response(response).jsonpath(expected['path'])
     if actual_value:
         actual_value = actual_value[0]
         assert actual_value == expected['expected'], f"Expected {expected['expected']}, but got {actual_value}"
@@ -20,7 +24,7 @@ def jsonpath_equal(response, expected):
 
 def jsonpath_not_equal(response, expected):
     """断言JSONPath不等于"""
-    actual_value = jsonpath.jsonpath(response.json(), expected['path'])
+    actual_value = wrap_response(response).jsonpath(expected['path'])
     if actual_value:
         actual_value = actual_value[0]
         assert actual_value != expected['expected'], f"Expected not {expected['expected']}, but got {actual_value}"
@@ -30,12 +34,12 @@ def jsonpath_not_equal(response, expected):
 
 def value_in_response(response,  expected):
     """断言响应体"""
-    assert expected['expected'] in response.text, f"Expected <{expected['expected']}> not in Response!"
+    assert expected['expected'] in wrap_response(response).text, f"Expected <{expected['expected']}> not in Response!"
 
 
 def value_not_in_response(response, expected):
     """断言响应体"""
-    assert expected['expected'] not in response.text, f"Expected <{expected['expected']}> in Response!"
+    assert expected['expected'] not in wrap_response(response).text, f"Expected <{expected['expected']}> in Response!"
 
 
 ASSERTION_MAPPING = {
@@ -47,6 +51,52 @@ ASSERTION_MAPPING = {
 }
 
 
+# 断言执行模式：fail_fast 遇到第一个失败的断言即停止；all 执行全部断言并逐条记录结果
+ASSERTION_MODES = ('fail_fast', 'all')
+_JSONPATH_ASSERTIONS = ('jsonpath_equal', 'jsonpath_not_equal')
+
+
+def evaluate_assertions(response, assertions, mode='fail_fast'):
+    """
+    执行用例的断言，返回 (断言结果列表, 是否全部通过)
+    all 模式下先按父路径分组批量计算所有 JSONPath 断言的取值，再逐条断言，
+    每条断言的结果都会被记录，一次执行即可看到全部失败项
+    """
+    response = wrap_response(response)
+    assertions = [assertion for assertion in (assertions or []) if assertion]
+    if mode == 'all':
+        try:
+            response.prefetch_jsonpaths(
+                assertion['path'] for assertion in assertions
+                if assertion['type'] in _JSONPATH_ASSERTIONS and assertion.get('path')
+            )
+        except ValueError:
+            # 响应体不是 JSON 时，由每条 JSONPath 断言各自记录失败原因
+            pass
+
+    assertion_result = []
+    all_passed = True
+    for assertion in assertions:
+        # assert_type参数接收：
+        # [{"type": "status_code", "expected": 200}, {'type': 'jsonpath_equal', 'path': '$.status', 'expected': 200}]
+        assert_type = assertion['type']
+        assert_value = assertion['expected']
+        result = {'type': assert_type}
+        if assertion.get('path'):
+            result['path'] = assertion['path']
+        try:
+            assert_func = ASSERTION_MAPPING[assert_type]
+            assert_func(response, assertion)
+            result.update({'status': 'success', 'expected': assert_value, 'actual': assert_value})
+        except Exception as e:
+            result.update({'status': 'failed', 'expected': assert_value, 'actual': str(e)})
+            all_passed = False
+        assertion_result.append(result)
+        if not all_passed and mode != 'all':
+            break
+    return assertion_result, all_passed
+
+
 def extract_variables(extract_rules, response):
     """使用JSONPath提取变量
     example:
@@ -55,10 +105,11 @@ def extract_variables(extract_rules, response):
             {"name": "token", "path": "$.data.token"}
         ]
     """
+    response = wrap_response(response)
     extracted = {}
     for rule in extract_rules:
         if rule:
-            values = jsonpath.jsonpath(response.json(), rule['path'])
+            values = response.jsonpath(rule['path'])
             if values:
                 extracted[rule['name']] = values[0]
             else:
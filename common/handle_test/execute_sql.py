@@ -1,8 +1,19 @@
+import asyncio
 import datetime
 import decimal
+import hashlib
+import threading
+import time
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from django.conf import settings
 from sqlalchemy import create_engine, text
 from sqlalchemy.pool import QueuePool
 
+log = logging.getLogger('django')
+
 
 def get_db_conn_url(db_env):
     return f"mysql+pymysql://{db_env['username']}:{db_env['password']}@{db_env['host']}:{db_env['port']}/{db_env['name']}"
@@ -14,15 +25,138 @@ def get_db_conn_url(db_env):
     # raise ValueError('暂不支持的数据库类型')
 
 
-def execute_sql_dynamic(db_env, sql, variables: dict = None):
+class _EngineEntry:
+    __slots__ = ('engine', 'label', 'created_at', 'last_used', 'uses')
+
+    def __init__(self, engine, label):
+        self.engine = engine
+        self.label = label
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
+        self.uses = 0
+
+
+class EngineRegistry:
+    """
+    进程内 SQLAlchemy Engine 注册表
+    按数据库连接配置（地址、端口、库名、用户名、密码）复用 Engine 及其连接池，
+    同一数据库的 SQL 步骤不再每次重新建立连接、握手认证：
+      - 最多保留 SQL_ENGINE_MAX_COUNT 个 Engine，超出时释放最久未使用的；
+      - 超过 SQL_ENGINE_IDLE_TIMEOUT 秒未使用的 Engine 自动释放；
+      - 开启 pool_pre_ping，取出连接前检测连接是否可用；
+      - 每隔 SQL_ENGINE_STATS_INTERVAL 秒在日志中输出一次各连接池的统计信息。
+    key 为完整连接配置的哈希，DBConfig 修改后所有进程都会使用新配置创建新的 Engine，不会复用旧连接；
+    旧配置的 Engine 不再被使用，由空闲淘汰释放
+    """
+
+    def __init__(self, max_engines=None, idle_timeout=None):
+        self.max_engines = max_engines
+        self.idle_timeout = idle_timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats_logged_at = time.monotonic()
+
+    @staticmethod
+    def _key(db_env):
+        config = '\0'.join(str(db_env[field]) for field in ('host', 'port', 'name', 'username', 'password'))
+        return hashlib.sha256(config.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _create_engine(db_env):
+        return create_engine(get_db_conn_url(db_env), poolclass=QueuePool,
+                             pool_size=settings.SQL_POOL_SIZE,
+                             max_overflow=settings.SQL_POOL_MAX_OVERFLOW,
+                             pool_timeout=settings.SQL_POOL_TIMEOUT,
+                             pool_recycle=settings.SQL_POOL_RECYCLE,
+                             pool_pre_ping=True,
+                             # 读写超时：异步执行超时后，后台线程中的查询也会在驱动层中断，不会长期占用连接
+                             connect_args={'read_timeout': settings.SQL_QUERY_TIMEOUT,
+                                           'write_timeout': settings.SQL_QUERY_TIMEOUT})
+
+    def get_engine(self, db_env):
+        """获取（或创建）连接配置对应的 Engine"""
+        key = self._key(db_env)
+        expired = []
+        with self._lock:
+            expired.extend(self._pop_idle())
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _EngineEntry(
+                    self._create_engine(db_env),
+                    f"{db_env['username']}@{db_env['host']}:{db_env['port']}/{db_env['name']}"
+                )
+                self._entries[key] = entry
+                log.info(f"创建数据库连接池: {entry.label}")
+                max_engines = self.max_engines or settings.SQL_ENGINE_MAX_COUNT
+                while len(self._entries) > max_engines:
+                    expired.append(self._entries.popitem(last=False)[1])
+            else:
+                self._entries.move_to_end(key)
+            entry.last_used = time.monotonic()
+            entry.uses += 1
+        # 释放连接池在锁外进行，避免关闭连接阻塞其它线程获取 Engine
+        for stale in expired:
+            self._dispose(stale)
+        self._maybe_log_stats()
+        return entry.engine
+
+    def _maybe_log_stats(self):
+        interval = settings.SQL_ENGINE_STATS_INTERVAL
+        now = time.monotonic()
+        if interval <= 0 or now - self._stats_logged_at < interval:
+            return
+        self._stats_logged_at = now
+        self.log_stats()
+
+    def log_stats(self):
+        """在日志中输出当前进程各连接池的统计信息"""
+        for item in self.stats():
+            log.info(f"数据库连接池统计: {item}")
+
+    def _pop_idle(self):
+        idle_timeout = settings.SQL_ENGINE_IDLE_TIMEOUT if self.idle_timeout is None else self.idle_timeout
+        now = time.monotonic()
+        idle_keys = [key for key, entry in self._entries.items() if now - entry.last_used > idle_timeout]
+        return [self._entries.pop(key) for key in idle_keys]
+
+    @staticmethod
+    def _dispose(entry):
+        try:
+            # 已借出的连接在归还时关闭，不影响正在执行的 SQL
+            entry.engine.dispose()
+            log.info(f"释放数据库连接池: {entry.label}")
+        except Exception as e:
+            log.warning(f"释放数据库连接池失败: {entry.label} - {e}")
+
+    def stats(self) -> list:
+        """当前进程各 Engine 的连接池统计信息"""
+        now = time.monotonic()
+        with self._lock:
+            entries = list(self._entries.values())
+        result = []
+        for entry in entries:
+            pool = entry.engine.pool
+            result.append({
+                'database': entry.label,
+                'created_at': datetime.datetime.fromtimestamp(entry.created_at).strftime('%Y-%m-%d %H:%M:%S'),
+                'idle_seconds': round(now - entry.last_used, 1),
+                'uses': entry.uses,
+                'pool_size': pool.size(),
+                'checked_in': pool.checkedin(),
+                'checked_out': pool.checkedout(),
+                'overflow': pool.overflow(),
+            })
+        return result
+
+
+engine_registry = EngineRegistry()
+
+
+def execute_sql_dynamic(db_env, sql, variables: dict = None, max_rows: int = None):
+    """执行 SQL，max_rows 限制 SELECT 返回的最大行数（为空时不限制）"""
     try:
-        url = get_db_conn_url(db_env)
-        # engine = create_engine(url)
-        engine = create_engine(url, poolclass=QueuePool,
-                               pool_size=5,
-                               max_overflow=10,
-                               pool_timeout=30,
-                               pool_recycle=3600)  # 1小时回收连接
+        # 同一数据库配置复用进程内的 Engine 连接池
+        engine = engine_registry.get_engine(db_env)
         if variables:
             sql = sql.format(**variables)
         with engine.connect() as conn:
@@ -39,7 +173,14 @@ def execute_sql_dynamic(db_env, sql, variables: dict = None):
                         return str(value)
                     return value
 
-                return [dict(zip(columns, [convert_value(v) for v in row])) for row in result]
+                if max_rows:
+                    rows = result.fetchmany(max_rows + 1)
+                    if len(rows) > max_rows:
+                        log.warning(f"SQL 查询结果超过 {max_rows} 行，只返回前 {max_rows} 行: {sql[:200]}")
+                        rows = rows[:max_rows]
+                else:
+                    rows = result
+                return [dict(zip(columns, [convert_value(v) for v in row])) for row in rows]
             else:
                 # 对于非SELECT操作，提交事务
                 conn.commit()  # 添加这一行
@@ -48,6 +189,36 @@ def execute_sql_dynamic(db_env, sql, variables: dict = None):
         return {'status': 'error', 'message': str(e)}
 
 
+_sql_executor = None
+_sql_executor_lock = threading.Lock()
+
+
+def _get_sql_executor() -> ThreadPoolExecutor:
+    global _sql_executor
+    with _sql_executor_lock:
+        if _sql_executor is None:
+            _sql_executor = ThreadPoolExecutor(max_workers=settings.SQL_ASYNC_WORKERS, thread_name_prefix='sql')
+        return _sql_executor
+
+
+async def execute_sql_async(db_env, sql, variables: dict = None, timeout: float = None, max_rows: int = None):
+    """
+    异步执行 SQL：在有界线程池中执行 execute_sql_dynamic，不阻塞事件循环
+    timeout 默认取 settings.SQL_QUERY_TIMEOUT，max_rows 默认取 settings.SQL_MAX_ROWS；
+    返回值与 execute_sql_dynamic 一致，超时返回 {'status': 'error', 'message': ...}
+    """
+    timeout = settings.SQL_QUERY_TIMEOUT if timeout is None else timeout
+    max_rows = settings.SQL_MAX_ROWS if max_rows is None else max_rows
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(
+        _get_sql_executor(), partial(execute_sql_dynamic, db_env, sql, variables, max_rows)
+    )
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        return {'status': 'error', 'message': f'SQL执行超时（{timeout}秒）'}
+
+
 if __name__ == '__main__':
     # 示例数据库环境配置
     class MockDBEnv:
@@ -0,0 +1,48 @@
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+
+log = logging.getLogger('django')
+
+# 每个 worker 进程内缓存的函数命名空间数量（按代码内容区分）
+FUNCTION_NAMESPACE_CACHE_SIZE = 8
+
+_namespace_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _code_key(code_str: str) -> str:
+    return hashlib.sha256(code_str.encode('utf-8')).hexdigest()
+
+
+def get_function_namespace(code_str: str) -> dict:
+    """
+    获取 PythonCode 代码执行后的命名空间
+    按代码内容哈希缓存：同一份代码在每个 worker 进程内只编译、执行一次，
+    代码内容变化后哈希随之变化，自然使用新的命名空间
+    """
+    code_str = code_str or ''
+    key = _code_key(code_str)
+    with _cache_lock:
+        namespace = _namespace_cache.get(key)
+        if namespace is not None:
+            _namespace_cache.move_to_end(key)
+            return namespace
+
+    # 编译失败不缓存，异常交给调用方处理
+    namespace = {}
+    exec(compile(code_str, '<PythonCode>', 'exec'), namespace)
+
+    with _cache_lock:
+        _namespace_cache[key] = namespace
+        while len(_namespace_cache) > FUNCTION_NAMESPACE_CACHE_SIZE:
+            _namespace_cache.popitem(last=False)
+    log.info(f'已编译 Python 函数代码并缓存命名空间: {key[:12]}')
+    return namespace
+
+
+def clear_function_namespace_cache():
+    """清空函数命名空间缓存（PythonCode 变更时调用）"""
+    with _cache_lock:
+        _namespace_cache.clear()
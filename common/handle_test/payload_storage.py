@@ -0,0 +1,100 @@
+import gzip
+import uuid
+import logging
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+try:
+    # 可选依赖：安装 zstandard 后使用 zstd 压缩，否则使用 gzip
+    import zstandard
+except ImportError:
+    zstandard = None
+
+log = logging.getLogger('django')
+
+# 响应体在对象存储中的路径前缀
+RESPONSE_BODY_DIR = 'case_responses'
+_FILE_EXTENSIONS = {'zstd': 'zst', 'gzip': 'gz'}
+
+
+def _compress(data: bytes):
+    """压缩数据，返回 (压缩后数据, 编码方式)"""
+    if settings.CASE_RESPONSE_COMPRESSION == 'zstd' and zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(data), 'zstd'
+    return gzip.compress(data, compresslevel=6), 'gzip'
+
+
+def _decompress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('读取 zstd 压缩的响应体需要安装 zstandard')
+        return zstandard.ZstdDecompressor().decompress(data)
+    if encoding == 'gzip':
+        return gzip.decompress(data)
+    return data
+
+
+def store_compressed(raw: bytes, directory: str, prefix='') -> dict:
+    """压缩后写入默认存储，返回引用 {'name': ..., 'encoding': ..., 'size': ..., 'stored_size': ...}（失败时抛出异常）"""
+    data, encoding = _compress(raw)
+    name = default_storage.save(
+        f"{directory}/{prefix}{uuid.uuid4().hex}.{_FILE_EXTENSIONS[encoding]}", ContentFile(data)
+    )
+    return {
+        'name': name,
+        'encoding': encoding,
+        'size': len(raw),
+        'stored_size': len(data),
+    }
+
+
+def load_compressed(ref: dict) -> bytes:
+    """按 store_compressed 返回的引用读取并解压数据"""
+    with default_storage.open(ref['name'], 'rb') as f:
+        return _decompress(f.read(), ref.get('encoding'))
+
+
+def offload_response_body(response_data: dict, prefix='') -> dict:
+    """
+    响应体存储策略：
+      - 响应体不超过 CASE_RESPONSE_INLINE_LIMIT 字节时原样保存在数据库中；
+      - 超过阈值时压缩后写入默认存储（MinIO），数据库中只保留引用和前 N 个字符的预览：
+        {'status_code': 200, 'headers': {...},
+         'body_ref': {'name': ..., 'encoding': 'zstd', 'size': ..., 'stored_size': ...},
+         'body_preview': '...'}
+    写入存储失败时保留原始数据，不影响执行结果落库
+    """
+    body = response_data.get('body') if isinstance(response_data, dict) else None
+    if not isinstance(body, str):
+        return response_data
+    raw = body.encode('utf-8')
+    if len(raw) <= settings.CASE_RESPONSE_INLINE_LIMIT:
+        return response_data
+
+    try:
+        ref = store_compressed(raw, RESPONSE_BODY_DIR, prefix)
+    except Exception as e:
+        log.warning(f"响应体写入对象存储失败，保留在数据库中: {e}")
+        return response_data
+
+    stored = {k: v for k, v in response_data.items() if k != 'body'}
+    stored['body_ref'] = ref
+    stored['body_preview'] = body[:settings.CASE_RESPONSE_PREVIEW_CHARS]
+    return stored
+
+
+def load_response_body(response_data: dict) -> dict:
+    """按 body_ref 读取完整响应体（仅详情接口使用），未外置存储时原样返回"""
+    ref = response_data.get('body_ref') if isinstance(response_data, dict) else None
+    if not ref:
+        return response_data
+
+    loaded = {k: v for k, v in response_data.items() if k not in ('body_ref', 'body_preview')}
+    try:
+        loaded['body'] = load_compressed(ref).decode('utf-8')
+    except Exception as e:
+        log.error(f"读取响应体失败: {ref.get('name')} - {e}")
+        loaded['body'] = response_data.get('body_preview', '')
+        loaded['body_error'] = f'读取完整响应体失败: {e}'
+    return loaded
@@ -1,54 +1,149 @@
-import json
-import requests
+import asyncio
+import os
+import threading
+import httpx
+from http.cookiejar import CookieJar
+from urllib.parse import urlsplit
 from common.handle_test.variable_pool import VariablePool
+from common.handle_test.template import get_request_template
 import logging
 
 log = logging.getLogger('django')
 
+try:
+    # 安装了 h2（pip install httpx[http2]）时启用 HTTP/2
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
-class RequestExecutor:
-    def __init__(self, variable_pool):
-        self.session = requests.Session()
+
+class NoStoreCookieJar(CookieJar):
+    """不保存响应 Set-Cookie 的 cookie jar：共享的 client 只用于复用连接，用例之间不共享 cookie"""
+
+    def extract_cookies(self, response, request):
+        pass
+
+
+def create_async_client() -> httpx.AsyncClient:
+    """
+    创建带连接池（keep-alive）的 AsyncClient，参数取自 settings.API_HTTP_*
+    client 不保存响应的 cookie，与原来每个用例使用独立 requests.Session 的行为一致
+    （需要 cookie 的用例通过请求头或变量传递）
+    """
+    from django.conf import settings
+    limits = httpx.Limits(
+        max_connections=settings.API_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.API_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.API_HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        limits=limits,
+        timeout=httpx.Timeout(settings.API_HTTP_TIMEOUT),
+        http2=HTTP2_AVAILABLE,
+        cookies=NoStoreCookieJar(),
+        # 与 requests 行为保持一致
+        follow_redirects=True,
+    )
+
+
+class AsyncRequestExecutor:
+    """
+    异步请求执行器，execute() 返回 (response, prepared)
+    同一次套件执行的所有用例共享一个 AsyncClient 连接池，并按 host 限制并发连接数；
+    同步调用方（单用例执行/接口调试）使用 execute_request()
+    用法：
+        async with AsyncRequestExecutor(vp) as executor:
+            response, prepared = await executor.execute(case_data)
+    """
+
+    def __init__(self, variable_pool, client: httpx.AsyncClient = None, per_host_limit: int = None):
         self.variable_pool = variable_pool
+        self.client = client
+        # 外部传入的 client 由调用方负责关闭
+        self._owns_client = client is None
+        self.per_host_limit = per_host_limit
+        self._host_semaphores = {}
+
+    async def __aenter__(self):
+        if self.client is None:
+            self.client = create_async_client()
+        if self.per_host_limit is None:
+            from django.conf import settings
+            self.per_host_limit = settings.API_HTTP_PER_HOST_LIMIT
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._owns_client and self.client is not None:
+            await self.client.aclose()
+            self.client = None
 
-    def prepare_request(self, case_data: dict):
-        """处理请求参数和变量替换"""
-        processed_data = {
-            'method': case_data['method'],
-            'url': self.variable_pool.parse_placeholder(case_data['url']),
-            'headers': json.loads(
-                self.variable_pool.parse_placeholder(
-                    json.dumps(case_data['headers'])
-                )
-            )
-        }
-        if case_data['method'] == 'GET':
-            processed_data['params'] = {
-                k: self.variable_pool.parse_placeholder(v)
-                for k, v in case_data['params'].items()
-            }
-        else:
-            if case_data['body_type'] == 'form':
-                processed_data['data'] = {
-                    k: self.variable_pool.parse_placeholder(v)
-                    for k, v in case_data['data'].items()
-                }
-            else:
-                processed_data['json'] = json.loads(
-                    self.variable_pool.parse_placeholder(case_data['body'])
-                )
-        return processed_data
-
-    def execute(self, case_data: dict):
-        prepared = self.prepare_request(case_data)
+    def prepare_request(self, case_data: dict, cache_key=None):
+        """处理请求参数和变量替换（请求模板按 cache_key 缓存，只编译一次）"""
+        return get_request_template(case_data, cache_key).render(self.variable_pool)
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_semaphores[host]
+
+    async def execute(self, case_data: dict, cache_key=None):
+        prepared = self.prepare_request(case_data, cache_key)
         log.info(f'Executing request with data: {prepared}', )
-        return self.session.request(**prepared), prepared
+        async with self._host_semaphore(prepared['url']):
+            response = await self.client.request(**prepared)
+        return response, prepared
+
+
+class _SyncClientLoop:
+    """
+    同步调用入口使用的后台事件循环线程和共享 AsyncClient（每个进程一个，首次调用时创建）
+    单次请求不再每次新建事件循环和连接池，同一 host 的连接在多次调用之间复用；
+    fork 出的子进程（如 celery prefork worker）中按 pid 重新创建
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self._client = None
+
+    def _start(self):
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, name='request-executor-loop', daemon=True).start()
+
+        async def _create_client():
+            return create_async_client()
+
+        self._client = asyncio.run_coroutine_threadsafe(_create_client(), loop).result()
+        self._loop = loop
+        self._pid = os.getpid()
+
+    def run(self, coro_factory):
+        """在后台事件循环中执行 coro_factory(client) 并等待结果"""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._start()
+            loop, client = self._loop, self._client
+        return asyncio.run_coroutine_threadsafe(coro_factory(client), loop).result()
+
+
+_sync_client_loop = _SyncClientLoop()
+
+
+def execute_request(variable_pool, case_data: dict):
+    """同步调用入口：单次请求（单用例执行/接口调试）使用进程内共享的 AsyncClient 执行"""
+    async def _execute(client):
+        async with AsyncRequestExecutor(variable_pool, client=client) as executor:
+            return await executor.execute(case_data)
+
+    return _sync_client_loop.run(_execute)
 
 
 if __name__ == '__main__':
     # Example usage
     vp = VariablePool()
-    executor = RequestExecutor(vp)
 
     case_data1 = {
         'method': 'POST',
@@ -58,5 +153,5 @@ if __name__ == '__main__':
     }
 
     vp.update_extracted({'id': 333, 'page': 1, 'per_page': '1220', 'token': '123'})
-    response = executor.execute(case_data1)
+    response, prepared = execute_request(vp, case_data1)
     print(response.status_code, response.text)
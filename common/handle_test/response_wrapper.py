@@ -0,0 +1,162 @@
+import json
+import re
+from functools import lru_cache
+
+import jsonpath
+
+try:
+    # 可选依赖：安装 orjson 后使用 orjson 解析响应体，否则使用标准库 json
+    import orjson
+except ImportError:
+    orjson = None
+
+# 简单路径：$.data.user.id / $.data.list[0] / $['data']['token']，其它写法交给 jsonpath 库处理
+_SIMPLE_SEGMENT = r"\.[A-Za-z0-9_-]+|\[[0-9]+\]|\['[A-Za-z0-9_-]+'\]"
+_SIMPLE_PATH_PATTERN = re.compile(rf"^\$(?:{_SIMPLE_SEGMENT})+$")
+_SEGMENT_PATTERN = re.compile(r"\.([A-Za-z0-9_-]+)|\[([0-9]+)\]|\['([A-Za-z0-9_-]+)'\]")
+
+# 每个 worker 进程缓存的 JSONPath 表达式数量
+JSONPATH_CACHE_SIZE = 2048
+
+_MISSING = object()
+
+
+def loads(data):
+    """解析 JSON（bytes/str），优先使用 orjson"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class CompiledJsonPath:
+    """
+    预编译的 JSONPath 表达式
+    简单路径直接按 key/下标逐层取值，其它表达式（通配符、过滤、切片等）交给 jsonpath 库；
+    两种方式的返回值与 jsonpath.jsonpath 一致：命中时返回列表，未命中返回 False
+    """
+    __slots__ = ('expr', 'keys')
+
+    def __init__(self, expr: str):
+        self.expr = expr
+        self.keys = None
+        if _SIMPLE_PATH_PATTERN.match(expr):
+            self.keys = tuple(
+                next(group for group in match.groups() if group is not None)
+                for match in _SEGMENT_PATTERN.finditer(expr)
+            )
+
+    def find(self, obj):
+        if self.keys is None:
+            return jsonpath.jsonpath(obj, self.expr)
+        # 与 jsonpath 库一致：空对象不做匹配
+        if not obj:
+            return False
+        node = resolve_keys(obj, self.keys)
+        return False if node is _MISSING else [node]
+
+
+def resolve_keys(node, keys):
+    """按 key/下标逐层取值，未命中返回 _MISSING"""
+    for key in keys:
+        if isinstance(node, dict) and key in node:
+            node = node[key]
+        elif isinstance(node, list) and key.isdigit() and int(key) < len(node):
+            node = node[int(key)]
+        else:
+            return _MISSING
+    return node
+
+
+@lru_cache(maxsize=JSONPATH_CACHE_SIZE)
+def compile_jsonpath(expr: str) -> CompiledJsonPath:
+    return CompiledJsonPath(expr)
+
+
+class ResponseWrapper:
+    """
+    响应适配器：包装 requests/httpx 的响应对象
+    响应体在第一次调用 json() 时解析，之后所有断言、变量提取共用同一份解析结果；
+    解析失败同样只尝试一次，后续调用直接抛出相同的异常
+    """
+    __slots__ = ('response', '_json', '_error', '_text', '_paths')
+
+    def __init__(self, response):
+        self.response = response
+        self._json = _MISSING
+        self._error = None
+        self._text = None
+        self._paths = {}
+
+    @property
+    def status_code(self):
+        return self.response.status_code
+
+    @property
+    def headers(self):
+        return self.response.headers
+
+    @property
+    def content(self):
+        return self.response.content
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self.response.text
+        return self._text
+
+    def json(self):
+        if self._json is _MISSING:
+            if self._error is not None:
+                raise self._error
+            try:
+                try:
+                    self._json = loads(self.response.content)
+                except ValueError:
+                    # 非 UTF-8 编码的响应体按响应声明的编码解码后再解析
+                    self._json = json.loads(self.text)
+            except ValueError as e:
+                self._error = e
+                raise
+        return self._json
+
+    def jsonpath(self, expr: str):
+        """按 JSONPath 取值，返回值与 jsonpath.jsonpath 一致（同一表达式只计算一次）"""
+        if expr not in self._paths:
+            self._paths[expr] = compile_jsonpath(expr).find(self.json())
+        return self._paths[expr]
+
+    def prefetch_jsonpaths(self, exprs):
+        """
+        批量计算多个 JSONPath：简单路径按父路径分组，共同的父节点只定位一次，
+        再依次取各自的子节点；其它表达式逐条计算。结果缓存后由 jsonpath() 直接返回
+        """
+        obj = self.json()
+        groups = {}
+        for expr in exprs:
+            if expr in self._paths:
+                continue
+            compiled = compile_jsonpath(expr)
+            if compiled.keys is None or not obj:
+                self._paths[expr] = compiled.find(obj)
+            else:
+                groups.setdefault(compiled.keys[:-1], []).append(compiled)
+
+        for parent_keys, members in groups.items():
+            parent = resolve_keys(obj, parent_keys)
+            for compiled in members:
+                node = _MISSING if parent is _MISSING else resolve_keys(parent, compiled.keys[-1:])
+                self._paths[compiled.expr] = False if node is _MISSING else [node]
+
+    def __getattr__(self, name):
+        # 其它属性（url、elapsed 等）透传给原始响应对象
+        if name == 'response':
+            raise AttributeError(name)
+        return getattr(self.response, name)
+
+
+def wrap_response(response) -> ResponseWrapper:
+    """包装响应对象，已包装的直接返回"""
+    if isinstance(response, ResponseWrapper):
+        return response
+    return ResponseWrapper(response)
@@ -0,0 +1,105 @@
+import time
+import asyncio
+import logging
+import threading
+from django.conf import settings
+from jk_case.models import CaseExecution, TestExecution
+from common.handle_test.payload_storage import offload_response_body
+
+log = logging.getLogger('celery.task')
+
+
+class CaseResultSink:
+    """
+    套件执行结果缓冲区
+    用例结果先缓存在内存中，达到批次大小或超过刷新间隔时通过 bulk_create 批量落库；
+    每次落库后把轻量的进度（不含请求/响应数据）写入执行记录的 progress 字段，前端轮询执行记录即可获取进度，
+    传入 publish 回调时同时推送进度事件；这些都是阻塞调用，与落库一起在 flush 中执行，不在事件循环中调用；
+    执行较慢的用例不会让已完成的结果一直留在缓冲区中：执行期间由 flush_periodically() 按刷新间隔定时落库；
+    套件最终的汇总结果也直接取自缓冲区的计数，无需再次查询数据库
+    """
+
+    def __init__(self, execution, user, total=0, batch_size=None, flush_interval=None, publish=None):
+        self.execution = execution
+        self.user = user
+        self.total = total
+        self.batch_size = batch_size or settings.API_RESULT_BATCH_SIZE
+        self.flush_interval = settings.API_RESULT_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.publish = publish
+        self.finished = 0
+        self.passed = 0
+        self.failed = 0
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        # add() 在事件循环中调用，flush() 在线程中调用
+        self._lock = threading.Lock()
+
+    def add(self, case_execution: CaseExecution) -> bool:
+        """缓存一条用例结果，返回是否需要刷新到数据库"""
+        with self._lock:
+            self._buffer.append(case_execution)
+            self.finished += 1
+            if case_execution.status == 'passed':
+                self.passed += 1
+            else:
+                self.failed += 1
+        return len(self._buffer) >= self.batch_size or self.flush_due()
+
+    def flush_due(self) -> bool:
+        """缓冲区中有结果且距离上次落库已超过刷新间隔"""
+        return bool(self._buffer) and time.monotonic() - self._last_flush >= self.flush_interval
+
+    async def flush_periodically(self, flush):
+        """
+        按刷新间隔定时落库（执行期间作为后台任务运行，执行结束时取消）
+        flush 为异步的落库函数，例如 sync_to_async(sink.flush)
+        """
+        interval = max(self.flush_interval, 0.5)
+        while True:
+            await asyncio.sleep(interval)
+            if self.flush_due():
+                await flush()
+
+    def flush(self):
+        """把缓冲区中的结果批量写入数据库（同步方法，异步上下文中需 sync_to_async 调用）"""
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+        if not batch:
+            return
+        for case_execution in batch:
+            # 超过阈值的响应体压缩后写入对象存储，行内只保留引用
+            case_execution.response_data = offload_response_body(
+                case_execution.response_data, prefix=f'{self.execution.id}/'
+            )
+        CaseExecution.objects.bulk_create(batch, batch_size=self.batch_size)
+        log.info(f"批量保存用例执行结果: {len(batch)} 条, 进度: {self.finished}/{self.total}")
+        self._publish(batch[-1])
+
+    @property
+    def all_passed(self) -> bool:
+        return self.passed == self.total
+
+    def summary(self) -> dict:
+        return {
+            'execution_id': self.execution.id,
+            'total': self.total,
+            'finished': self.finished,
+            'passed': self.passed,
+            'failed': self.failed,
+        }
+
+    def _publish(self, case_execution):
+        event = self.summary()
+        event.update({
+            'case_id': case_execution.case_id,
+            'status': case_execution.status,
+            'duration': case_execution.duration,
+        })
+        try:
+            TestExecution.objects.filter(id=self.execution.id).update(progress=event)
+            if self.publish:
+                self.publish(event)
+        except Exception as e:
+            # 进度推送失败不影响用例执行
+            log.warning(f"推送执行进度失败: {e}")
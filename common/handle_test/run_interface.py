@@ -7,7 +7,7 @@ import django
 django.setup()
 
 from common.handle_test.variable_pool import VariablePool
-from common.handle_test.request_executor import RequestExecutor
+from common.handle_test.request_executor import execute_request
 import logging
 from projects.models import GlobalVariable, PythonCode
 
@@ -40,9 +40,7 @@ def execute_interface(payload):
         if python_codes:
             vp.set_function_code(python_codes[0].python_code)
 
-        executor = RequestExecutor(vp)
-
-        response, actual_reqeust_data = executor.execute(payload)
+        response, actual_reqeust_data = execute_request(vp, payload)
 
         # 记录请求数据（变量替换后）
         request_result['request_data'] = actual_reqeust_data
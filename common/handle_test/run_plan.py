@@ -0,0 +1,56 @@
+from types import MappingProxyType
+from projects.models import ProjectEnvs, GlobalVariable, PythonCode
+
+# SQL 步骤 / 前置SQL 中指定数据库环境的字段名（与执行引擎一致）
+DB_ENV_KEYS = ('dbEnv', 'db_env', 'db', 'dbEnvId')
+# 数据库配置字段（与 UIExecutionEngine.get_db_info 的返回值一致）
+DB_CONFIG_FIELDS = (
+    'db_config__name',
+    'db_config__host',
+    'db_config__port',
+    'db_config__username',
+    'db_config__password',
+)
+
+
+def referenced_db_env_ids(*step_lists) -> set:
+    """步骤中直接指定的数据库环境 id（整数或数字字符串，使用变量的环境 id 执行时才能确定）"""
+    ids = set()
+    for steps in step_lists:
+        for step in steps or []:
+            if not isinstance(step, dict):
+                continue
+            for key in DB_ENV_KEYS:
+                value = step.get(key)
+                if value is not None and str(value).isdigit():
+                    ids.add(int(value))
+                    break
+    return ids
+
+
+class RunEnvironment:
+    """
+    一次执行共用的只读环境：全局变量、Python 函数代码、数据库配置
+    在执行开始前由 load_run_environment() 一次性加载，执行过程中不再查询数据库
+    """
+    __slots__ = ('global_vars', 'python_code', 'db_configs')
+
+    def __init__(self, global_vars: dict, python_code: str, db_configs: dict):
+        object.__setattr__(self, 'global_vars', MappingProxyType(dict(global_vars)))
+        object.__setattr__(self, 'python_code', python_code or '')
+        # 环境 id -> {'db_config__name': ..., ...}
+        object.__setattr__(self, 'db_configs', MappingProxyType(dict(db_configs)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} 为只读对象")
+
+
+def load_run_environment(db_env_ids=()) -> RunEnvironment:
+    """加载执行环境（全局变量、Python 代码各一次查询，指定了数据库环境时再查询一次）"""
+    global_vars = dict(GlobalVariable.objects.values_list('name', 'value'))
+    python_code = PythonCode.objects.values_list('python_code', flat=True).first()
+    db_configs = {}
+    if db_env_ids:
+        rows = ProjectEnvs.objects.filter(id__in=set(db_env_ids)).values('id', *DB_CONFIG_FIELDS)
+        db_configs = {row.pop('id'): row for row in rows}
+    return RunEnvironment(global_vars, python_code, db_configs)
@@ -1,6 +1,7 @@
 from common.handle_test.variable_pool import VariablePool
-from common.handle_test.assertions import ASSERTION_MAPPING, extract_variables
-from common.handle_test.request_executor import RequestExecutor
+from common.handle_test.assertions import evaluate_assertions, extract_variables
+from common.handle_test.response_wrapper import wrap_response
+from common.handle_test.request_executor import execute_request
 
 import os
 import sys
@@ -11,7 +12,9 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'qy_backend.settings')
 import django
 django.setup()
 
+from django.conf import settings
 from jk_case.models import CaseExecution
+from common.handle_test.payload_storage import offload_response_body
 from projects.models import GlobalVariable, PythonCode
 import logging
 import time
@@ -19,8 +22,11 @@ import time
 log = logging.getLogger('django')
 
 
-def execute_case(case_obj, execute_env, executed_by):
-    """异步执行单个测试用例任务"""
+def execute_case(case_obj, execute_env, executed_by, assertion_mode=None):
+    """
+    异步执行单个测试用例任务
+    assertion_mode: 断言执行模式 fail_fast | all，默认取 settings.API_ASSERTION_MODE
+    """
     log.info('🚀 开始执行测试用例')
     # 初始化变量池
     vp = VariablePool()
@@ -61,11 +67,12 @@ def execute_case(case_obj, execute_env, executed_by):
 
         # 执行请求
         start_time = time.time()
-        executor = RequestExecutor(vp)
 
         try:
             log.info('🚀 before 执行测试用例')
-            response, actual_reqeust_data = executor.execute(case_data)
+            response, actual_reqeust_data = execute_request(vp, case_data)
+            # 响应体只解析一次，变量提取和所有断言共用
+            response = wrap_response(response)
             log.info('🚀 after 执行测试用例')
             # 记录请求数据（变量替换后）
             case_execution.request_data = actual_reqeust_data
@@ -88,32 +95,10 @@ def execute_case(case_obj, execute_env, executed_by):
                 # 'body': response.json() if response.text else {}
                 'body': response.text
             }
-            # 执行断言
-            assertion_result = []
-            all_passed = True
-            for assertion in case.assertions:
-                if not assertion:
-                    continue
-                assert_type = assertion['type']
-                assert_value = assertion['expected']
-                try:
-                    assert_func = ASSERTION_MAPPING[assert_type]
-                    assert_func(response, assertion)
-                    assertion_result.append({
-                        'type': assert_type,
-                        'status': 'success',
-                        'expected': assert_value,
-                        'actual': assert_value
-                    })
-                except Exception as e:
-                    assertion_result.append({
-                        'type': assert_type,
-                        'status': 'failed',
-                        'expected': assert_value,
-                        'actual': str(e)
-                    })
-                    all_passed = False
-                    break
+            # 执行断言（assertion_mode=all 时执行全部断言，不在第一个失败处停止）
+            assertion_result, all_passed = evaluate_assertions(
+                response, case.assertions, assertion_mode or settings.API_ASSERTION_MODE
+            )
 
             case_execution.assertions_result = assertion_result
             case_execution.status = 'passed' if all_passed else 'failed'
@@ -124,7 +109,8 @@ def execute_case(case_obj, execute_env, executed_by):
             case_execution.response_data = {'error': str(e)}
             case_execution.duration = round(time.time() - start_time, 3)
 
-        # 保存最终结果
+        # 保存最终结果（超过阈值的响应体写入对象存储）
+        case_execution.response_data = offload_response_body(case_execution.response_data, prefix=f'case_{case.id}/')
         case_execution.save()
 
     except Exception as e:
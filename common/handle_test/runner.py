@@ -1,4 +1,4 @@
-from request_executor import RequestExecutor
+from common.handle_test.request_executor import execute_request
 from common.handle_test.variable_pool import VariablePool
 from common.handle_test.assertions import ASSERTION_MAPPING
 from apps.jk_case.models import TestSuite
@@ -10,7 +10,6 @@ class TestRunner:
     def __init__(self, suite_id):
         self.suite = TestSuite.objects.get(id=suite_id)
         self.variable_pool = VariablePool()
-        self.executor = RequestExecutor(self.variable_pool)
         self.results = []
 
     def _extract_variables(self, extract_rules, response):
@@ -41,7 +40,7 @@ class TestRunner:
 
         try:
             # 执行请求
-            response = self.executor.execute(case.request_data)
+            response, _ = execute_request(self.variable_pool, case.request_data)
             result['response'] = {
                 'status_code': response.status_code,
                 'headers': dict(response.headers),
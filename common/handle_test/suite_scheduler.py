@@ -0,0 +1,99 @@
+import json
+import re
+
+# 变量占位符：${token} / ${suite.token}，函数参数中的 ${xxx} 同样会被匹配
+VAR_PLACEHOLDER_PATTERN = re.compile(r'\$\{([\w\.]+)\}')
+# 只有套件作用域（或未带作用域前缀）的变量可能来自前序用例的变量提取
+_SUITE_SCOPES = ('suite',)
+_OTHER_SCOPES = ('global', 'case')
+
+
+def collect_placeholders(*values) -> set:
+    """收集任意结构（str/dict/list）中引用的套件变量名"""
+    names = set()
+    for value in values:
+        if value is None:
+            continue
+        text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+        for name in VAR_PLACEHOLDER_PATTERN.findall(text):
+            if '.' in name:
+                scope, name = name.split('.', 1)
+                if scope in _OTHER_SCOPES:
+                    continue
+                if scope not in _SUITE_SCOPES:
+                    # 非作用域前缀，按完整变量名处理
+                    name = f'{scope}.{name}'
+            names.add(name)
+    return names
+
+
+def collect_outputs(variable_extract) -> set:
+    """收集用例变量提取规则产出的变量名"""
+    return {rule['name'] for rule in (variable_extract or []) if rule and rule.get('name')}
+
+
+class DependencyGraph:
+    """
+    基于变量读写关系的用例依赖图
+    nodes: [(reads, writes), ...]，按原有执行顺序排列
+    依赖规则（保证与顺序执行结果一致）：
+      - 读后写：读取变量的用例依赖最近一次写入该变量的用例
+      - 写后写：写入变量的用例依赖上一次写入该变量的用例
+      - 写后读：写入变量的用例依赖上一次写入之后所有读取过该变量的用例
+    """
+
+    def __init__(self, nodes):
+        self.size = len(nodes)
+        self.dependencies = {idx: set() for idx in range(self.size)}
+        self.dependents = {idx: set() for idx in range(self.size)}
+        self._started = set()
+        self._done = set()
+
+        last_writer = {}
+        readers = {}
+        for idx, (reads, writes) in enumerate(nodes):
+            for name in reads:
+                if name in last_writer:
+                    self._add_edge(last_writer[name], idx)
+            for name in writes:
+                if name in last_writer:
+                    self._add_edge(last_writer[name], idx)
+                for reader in readers.get(name, ()):
+                    self._add_edge(reader, idx)
+            for name in reads:
+                readers.setdefault(name, set()).add(idx)
+            for name in writes:
+                last_writer[name] = idx
+                readers[name] = set()
+
+    @classmethod
+    def from_cases(cls, cases, env_url=''):
+        """根据 TestCase 列表构建依赖图（需提前 select_related('interface')）"""
+        nodes = []
+        for case in cases:
+            reads = collect_placeholders(
+                env_url + case.interface.path, case.headers, case.params, case.data, case.body
+            )
+            nodes.append((reads, collect_outputs(case.variable_extract)))
+        return cls(nodes)
+
+    def _add_edge(self, before, after):
+        if before != after:
+            self.dependencies[after].add(before)
+            self.dependents[before].add(after)
+
+    @property
+    def finished(self):
+        return len(self._done) == self.size
+
+    def ready(self) -> list:
+        """返回依赖已全部完成、且尚未开始的节点（按原有顺序），并标记为已开始"""
+        nodes = [
+            idx for idx in range(self.size)
+            if idx not in self._started and self.dependencies[idx] <= self._done
+        ]
+        self._started.update(nodes)
+        return nodes
+
+    def mark_done(self, idx):
+        self._done.add(idx)
@@ -1,8 +1,9 @@
 from celery import shared_task
 from django.utils import timezone
 from common.handle_test.variable_pool import VariablePool
-from common.handle_test.assertions import ASSERTION_MAPPING, extract_variables
-from common.handle_test.request_executor import RequestExecutor
+from common.handle_test.assertions import evaluate_assertions, extract_variables
+from common.handle_test.response_wrapper import wrap_response
+from common.handle_test.request_executor import AsyncRequestExecutor
 
 import os
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'qy_backend.settings')
@@ -10,7 +11,12 @@ import django
 django.setup()
 
 from jk_case.models import TestExecution, SuiteCaseRelation, CaseExecution
-from projects.models import GlobalVariable, PythonCode
+from common.handle_test.run_plan import load_run_environment
+from common.handle_test.suite_scheduler import DependencyGraph
+from common.handle_test.result_sink import CaseResultSink
+from asgiref.sync import sync_to_async
+from django.conf import settings
+import asyncio
 import time
 # 异步任务中显式接收 User object
 from django.contrib.auth import get_user_model
@@ -19,23 +25,148 @@ import logging
 log = logging.getLogger('celery.task')
 
 
+async def _execute_suite_case(executor, sink, case, env_url, assertion_mode='fail_fast'):
+    """执行套件中的单个用例，结果写入 sink 缓冲区，返回用例是否通过"""
+    log.info(f"正在执行用例: {case.name} (ID: {case.id})")
+    vp = executor.variable_pool
+    # 执行结果先保存在内存中，由 sink 批量落库
+    case_execution = CaseExecution(
+        execution=sink.execution,
+        case=case,
+        status='running',
+        executed_by=sink.user
+    )
+
+    # 发送请求并记录结果
+    start_time = time.time()
+    try:
+        # 自定义请求接口需要的数据格式
+        case_data = {
+            'method': case.interface.method,
+            'url': env_url + case.interface.path,
+            'headers': case.headers or {},
+            'body': case.body,
+            'params': case.params,
+            'data': case.data,
+            'body_type': case.body_type
+        }
+
+        # 请求模板按用例/接口的 updated_at 缓存，用例未修改时不再重复编译
+        template_key = (case.id, case.updated_at, case.interface.updated_at, env_url)
+        response, actual_reqeust_data = await executor.execute(case_data, template_key)
+        # 响应体只解析一次，变量提取和所有断言共用
+        response = wrap_response(response)
+
+        # 记录请求数据（变量替换后）
+        case_execution.request_data = actual_reqeust_data
+
+        # 变量提取
+        extracted = extract_variables(
+            case.variable_extract,
+            response
+        )
+        vp.suite_vars.update(extracted)
+        case_execution.extracted_vars = extracted
+
+        # 记录执行时间
+        duration = round(time.time() - start_time, 3)
+        case_execution.duration = duration
+
+        # 记录响应数据
+        case_execution.response_data = {
+            'status_code': response.status_code,
+            'headers': dict(response.headers),
+            'body': response.text
+        }
+
+        # 执行断言（assertion_mode=all 时执行全部断言，不在第一个失败处停止）
+        assertion_result, all_passed = evaluate_assertions(response, case.assertions, assertion_mode)
+        # 更新用例断言结果
+        case_execution.assertions_result = assertion_result
+
+        # 更新用例状态
+        case_execution.status = 'passed' if all_passed else 'failed'
+
+    except Exception as e:
+        # 记录用例级异常
+        case_execution.status = 'failed'
+        case_execution.response_data = {'error': str(e)}
+        case_execution.duration = round(time.time() - start_time, 3)
+
+    if sink.add(case_execution):
+        await sync_to_async(sink.flush)()
+    return case_execution.status == 'passed'
+
+
+async def _execute_cases_parallel(cases, concurrency, run_case):
+    """
+    并行执行用例：按变量依赖关系调度，无数据依赖的用例并发执行，
+    存在依赖的用例仍按 order 先后执行。
+    """
+    graph = DependencyGraph.from_cases(cases)
+    log.info(f"并行模式执行套件，并发数: {concurrency}, "
+             f"存在依赖的用例数: {sum(1 for deps in graph.dependencies.values() if deps)}")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_limited(case):
+        async with semaphore:
+            return await run_case(case)
+
+    running = {}
+    while not graph.finished:
+        for idx in graph.ready():
+            running[asyncio.create_task(run_limited(cases[idx]))] = idx
+        done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            idx = running.pop(task)
+            task.result()
+            graph.mark_done(idx)
+
+
+async def _execute_cases(cases, vp, sink, env_url, parallel, concurrency, assertion_mode='fail_fast'):
+    """
+    执行套件下的所有用例，所有用例共享同一个 AsyncRequestExecutor 连接池，结果写入 sink；
+    执行期间按刷新间隔定时落库，较慢的用例不会让已完成的结果一直留在缓冲区中
+    """
+    flusher = asyncio.create_task(sink.flush_periodically(sync_to_async(sink.flush)))
+    try:
+        async with AsyncRequestExecutor(vp) as executor:
+            async def run_case(case):
+                return await _execute_suite_case(executor, sink, case, env_url, assertion_mode)
+
+            if parallel:
+                await _execute_cases_parallel(cases, concurrency, run_case)
+            else:
+                # 遍历执行每个用例
+                for case in cases:
+                    await run_case(case)
+    finally:
+        flusher.cancel()
+        # 剩余未落库的结果（包括任务异常中断时已完成的用例）
+        await sync_to_async(sink.flush)()
+
+
 @shared_task(bind=True, max_retries=3)
-def async_execute_suite(self, execution_id, executed_by, env_url):
-    """异步执行测试套件任务"""
+def async_execute_suite(self, execution_id, executed_by, env_url, parallel=False, concurrency=None,
+                        assertion_mode=None):
+    """
+    异步执行测试套件任务
+    parallel: 是否开启并行模式（按变量依赖关系调度用例）
+    concurrency: 并行模式下的最大并发数，默认取 settings.API_SUITE_CONCURRENCY
+    assertion_mode: 断言执行模式 fail_fast | all，默认取 settings.API_ASSERTION_MODE
+    """
     # 获取任务记录器
     user = get_user_model().objects.get(id=executed_by)
-    log.info(f"🚀 开始执行测试套件任务: execution_id={execution_id}, executed_by={user.username}, env_url={env_url}")
+    log.info(f"🚀 开始执行测试套件任务: execution_id={execution_id}, executed_by={user.username}, "
+             f"env_url={env_url}, parallel={parallel}")
 
     # 获取执行记录
     vp = VariablePool()
-    # 更新全局变量到内存
-    global_vars = GlobalVariable.objects.values_list('name', 'value')
-    vp.update_global({name: value for name, value in global_vars})
-
-    # 更新Python代码
-    python_codes = PythonCode.objects.all()
-    if python_codes:
-        vp.set_function_code(python_codes[0].python_code)
+    # 执行前一次性加载全局变量和Python代码（只读），执行过程中不再查询
+    environment = load_run_environment()
+    vp.update_global(dict(environment.global_vars))
+    if environment.python_code:
+        vp.set_function_code(environment.python_code)
 
 
     execution = TestExecution.objects.get(id=execution_id)
@@ -49,112 +180,22 @@ def async_execute_suite(self, execution_id, executed_by, env_url):
         relations = SuiteCaseRelation.objects.filter(
             suite=execution.suite,
             case__enabled=True
-        ).order_by('order').select_related('case')
-
-        total = relations.count()
-        # 用例通过数量，用于判断套件执行是否通过，和 total 对比
-        passed = 0
-
-        # 遍历执行每个用例
-        for relation in relations:
-            case = relation.case
-            log.info(f"正在执行用例: {case.name} (ID: {case.id})")
-            case_execution = CaseExecution.objects.create(
-                execution=execution,
-                case=case,
-                status='pending',
-                executed_by=user
-            )
-
-            try:
-                # 发送请求并记录结果
-                start_time = time.time()
-                # 自定义请求接口需要的数据格式
-                case_data = {
-                    'method': case.interface.method,
-                    'url': env_url + case.interface.path,
-                    'headers': case.headers or {},
-                    'body': case.body,
-                    'params': case.params,
-                    'data': case.data,
-                    'body_type': case.body_type
-                }
-
-                executor = RequestExecutor(vp)
-                response, actual_reqeust_data = executor.execute(case_data)
-
-                # 记录请求数据（变量替换后）
-                case_execution.request_data = actual_reqeust_data
-
-                # 变量提取
-                extracted = extract_variables(
-                    case.variable_extract,
-                    response
-                )
-                vp.suite_vars.update(extracted)
-                case_execution.extracted_vars = extracted
-
-                # 记录执行时间
-                duration = round(time.time() - start_time, 3)
-                case_execution.duration = duration
-
-                # 记录响应数据
-                case_execution.response_data = {
-                    'status_code': response.status_code,
-                    'headers': dict(response.headers),
-                    'body': response.text
-                }
-
-                # 执行断言
-                assertion_result = []
-                all_passed = True
-                for assertion in case.assertions:
-                    if not assertion:
-                        continue
-                    # assert_type参数接收：
-                    # [{"type": "status_code", "value": 200}, {'type': 'jsonpath_value', 'path': '$.status', 'expected': 200}]
-                    assert_type = assertion['type']
-                    assert_value = assertion['expected']
-                    try:
-                        assert_func = ASSERTION_MAPPING[assert_type]
-                        assert_func(response, assertion)
-                        assertion_result.append({
-                            'type': assert_type,
-                            'status': 'success',
-                            'expected': assert_value,
-                            'actual': assert_value
-                        })
-                    except Exception as e:
-                        assertion_result.append({
-                            'type': assert_type,
-                            'status': 'failed',
-                            'expected': assert_value,
-                            'actual': str(e)
-                        })
-                        all_passed = False
-                        break
-                # 更新用例断言结果
-                case_execution.assertions_result = assertion_result
-
-                # 更新用例状态
-                if all_passed:
-                    case_execution.status = 'passed'
-                    passed += 1
-                else:
-                    case_execution.status = 'failed'
-                case_execution.save()
-
-            except Exception as e:
-                # 记录用例级异常
-                case_execution.status = 'failed'
-                case_execution.response_data = {'error': str(e)}
-                case_execution.duration = round(time.time() - start_time, 3)
-                case_execution.save()
-
-        # 更新整体执行状态
+        ).order_by('order').select_related('case', 'case__interface')
+        cases = [relation.case for relation in relations]
+
+        # 用例结果缓冲区，按批次落库并把执行进度写入执行记录（progress 字段）
+        sink = CaseResultSink(execution, user, total=len(cases))
+        asyncio.run(_execute_cases(
+            cases, vp, sink, env_url,
+            parallel, max(1, int(concurrency or settings.API_SUITE_CONCURRENCY)),
+            assertion_mode or settings.API_ASSERTION_MODE
+        ))
+
+        # 更新整体执行状态（通过数量直接取自 sink，无需再次查询）
         execution.ended_at = timezone.now()
         execution.duration = (execution.ended_at - execution.started_at).total_seconds()
-        execution.status = 'passed' if passed == total else 'failed'
+        execution.status = 'passed' if sink.all_passed else 'failed'
+        execution.progress = sink.summary()
         execution.save()
         log.info('Task End Success!!! ')
 
@@ -165,7 +206,8 @@ def async_execute_suite(self, execution_id, executed_by, env_url):
         log.error(f'Tasks Error => {str(e)}')
         execution.status = 'failed'
         execution.ended_at = timezone.now()
-        execution.save()
+        # 不覆盖已落库的执行进度
+        execution.save(update_fields=['status', 'ended_at'])
         log.info('Task End Exception!!! ')
         self.retry(exc=e, countdown=60, max_retries=3)
 
@@ -0,0 +1,261 @@
+import ast
+import json
+import re
+import threading
+import logging
+from collections import OrderedDict
+from functools import lru_cache
+
+log = logging.getLogger('django')
+
+# 函数调用占位符：${__func(1, 'a')}
+FUNC_PATTERN = re.compile(r'\$\{__(\w+)\((.*?)\)\}')
+# 变量占位符：${token} / ${suite.token}
+VAR_PATTERN = re.compile(r'\$\{([\w\.]+)\}')
+
+# token 类型
+LITERAL = 0
+VARIABLE = 1
+FUNCTION = 2
+
+# 每个 worker 进程缓存的用例请求模板数量
+REQUEST_TEMPLATE_CACHE_SIZE = 1024
+
+
+def parse_arguments(arg_str: str) -> list:
+    """解析参数字符串为Python对象列表"""
+    if not arg_str:
+        return []
+
+    try:
+        # 安全解析参数列表
+        return ast.literal_eval(f'[{arg_str}]')
+    except (SyntaxError, ValueError):
+        # 处理无引号的字符串参数
+        return [arg.strip() for arg in arg_str.split(',')]
+
+
+@lru_cache(maxsize=4096)
+def _compile_vars(text: str) -> tuple:
+    """把字符串拆分为 字面量/变量 token"""
+    tokens = []
+    pos = 0
+    for match in VAR_PATTERN.finditer(text):
+        if match.start() > pos:
+            tokens.append((LITERAL, text[pos:match.start()]))
+        tokens.append((VARIABLE, match.group(1), match.group(0)))
+        pos = match.end()
+    if pos < len(text):
+        tokens.append((LITERAL, text[pos:]))
+    return tuple(tokens)
+
+
+@lru_cache(maxsize=4096)
+def compile_template(raw_str: str) -> tuple:
+    """
+    把字符串编译为 token 列表：
+      (LITERAL, text) / (VARIABLE, name, raw) / (FUNCTION, name, args, raw)
+    与原 parse_placeholder 的语义一致：先解析函数调用，其余部分再解析变量
+    """
+    tokens = []
+    pos = 0
+    for match in FUNC_PATTERN.finditer(raw_str):
+        tokens.extend(_compile_vars(raw_str[pos:match.start()]))
+        arg_str = match.group(2).strip()
+        args = tuple(parse_arguments(arg_str)) if arg_str else ()
+        tokens.append((FUNCTION, match.group(1), args, match.group(0)))
+        pos = match.end()
+    tokens.extend(_compile_vars(raw_str[pos:]))
+    return tuple(tokens)
+
+
+def _render_vars(text: str, variable_pool) -> str:
+    """只替换变量（用于函数返回值、函数执行失败时保留的原始占位符）"""
+    if '${' not in text:
+        return text
+    return render_template(_compile_vars(text), variable_pool)
+
+
+def render_template(tokens: tuple, variable_pool) -> str:
+    """使用变量池渲染已编译的 token 列表"""
+    parts = []
+    append = parts.append
+    get_value = variable_pool.get_value
+    functions = {}
+    for token in tokens:
+        kind = token[0]
+        if kind == LITERAL:
+            append(token[1])
+        elif kind == VARIABLE:
+            value = get_value(token[1])
+            # 未找到变量值时返回原始占位符
+            append(str(value) if value is not None else token[2])
+        else:
+            _, func_name, args, raw = token
+            try:
+                func = functions.get(func_name)
+                if func is None:
+                    func = functions[func_name] = variable_pool.get_function(func_name)
+                result = str(func(*args))
+            except Exception as e:
+                log.error('执行函数 %s 失败: %s', func_name, str(e))
+                # 执行失败时返回原始占位符
+                result = raw
+            append(_render_vars(result, variable_pool) if '${' in result else result)
+    return ''.join(parts)
+
+
+class Template:
+    """预编译的字符串模板"""
+    __slots__ = ('source', 'tokens')
+
+    def __init__(self, source: str):
+        self.source = source
+        self.tokens = compile_template(source)
+
+    def render(self, variable_pool) -> str:
+        return render_template(self.tokens, variable_pool)
+
+
+def compile_value(value, compile_keys=False):
+    """递归编译 str/dict/list，字符串替换为 Template，其它值原样保留"""
+    if isinstance(value, str):
+        return Template(value) if '${' in value else value
+    if isinstance(value, dict):
+        return {
+            (compile_value(k) if compile_keys else k): compile_value(v, compile_keys)
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [compile_value(v, compile_keys) for v in value]
+    return value
+
+
+def render_value(compiled, variable_pool):
+    """渲染 compile_value 的结果"""
+    if isinstance(compiled, Template):
+        return compiled.render(variable_pool)
+    if isinstance(compiled, dict):
+        return {render_value(k, variable_pool): render_value(v, variable_pool) for k, v in compiled.items()}
+    if isinstance(compiled, list):
+        return [render_value(v, variable_pool) for v in compiled]
+    return compiled
+
+
+class RequestTemplate:
+    """
+    用例请求模板：url/headers/params/data/body 只编译一次，每次执行只做渲染，
+    不再需要正则替换和 headers 的 json.dumps/json.loads 往返
+    """
+
+    def __init__(self, case_data: dict):
+        self.method = case_data['method']
+        self.body_type = case_data.get('body_type')
+        self.url = compile_value(case_data['url'])
+        self.headers = compile_value(case_data.get('headers') or {}, compile_keys=True)
+        self.params = compile_value(case_data.get('params') or {})
+        self.data = compile_value(case_data.get('data') or {})
+        body = case_data.get('body')
+        self.body = Template(body) if isinstance(body, str) else body
+
+    def render(self, variable_pool) -> dict:
+        """渲染为 requests/httpx 的请求参数"""
+        processed_data = {
+            'method': self.method,
+            'url': render_value(self.url, variable_pool),
+            'headers': render_value(self.headers, variable_pool),
+        }
+        if self.method == 'GET':
+            processed_data['params'] = render_value(self.params, variable_pool)
+        elif self.body_type == 'form':
+            processed_data['data'] = render_value(self.data, variable_pool)
+        else:
+            body = self.body.render(variable_pool) if isinstance(self.body, Template) else self.body
+            processed_data['json'] = json.loads(body)
+        return processed_data
+
+
+_request_template_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_request_template(case_data: dict, cache_key=None) -> RequestTemplate:
+    """
+    获取用例请求模板，cache_key 为空时不缓存
+    cache_key 建议包含用例 id 和 updated_at，例如：(case.id, case.updated_at, env_url)
+    """
+    if cache_key is None:
+        return RequestTemplate(case_data)
+    with _cache_lock:
+        template = _request_template_cache.get(cache_key)
+        if template is not None:
+            _request_template_cache.move_to_end(cache_key)
+            return template
+    template = RequestTemplate(case_data)
+    with _cache_lock:
+        _request_template_cache[cache_key] = template
+        while len(_request_template_cache) > REQUEST_TEMPLATE_CACHE_SIZE:
+            _request_template_cache.popitem(last=False)
+    return template
+
+
+if __name__ == '__main__':
+    # 微基准：对比原 parse_placeholder（两次 re.sub + headers json 往返）与预编译模板
+    # 运行：python -m common.handle_test.template
+    import sys
+    import timeit
+    from common.handle_test.variable_pool import VariablePool
+
+    vp = VariablePool()
+    vp.set_function_code('def now():\n    return 1700000000\n')
+    vp.update_global({f'var{i}': f'value{i}' for i in range(50)})
+
+    def legacy_parse(raw_str):
+        def func_replacement(match):
+            arg_str = match.group(2).strip()
+            args = parse_arguments(arg_str) if arg_str else []
+            return str(vp.execute_function(match.group(1), *args))
+
+        def var_replacement(match):
+            value = vp.get_value(match.group(1))
+            return str(value) if value is not None else match.group(0)
+
+        result = re.sub(r'\${__(\w+)\((.*?)\)}', func_replacement, raw_str)
+        return re.sub(r'\${([\w\.]+)}', var_replacement, result)
+
+    def legacy_prepare(case):
+        return {
+            'method': case['method'],
+            'url': legacy_parse(case['url']),
+            'headers': json.loads(legacy_parse(json.dumps(case['headers']))),
+            'json': json.loads(legacy_parse(case['body'])),
+        }
+
+    def build_case(items, dense):
+        # dense: 每个元素都带变量和函数占位符；sparse: 大体积静态报文中少量占位符
+        return {
+            'method': 'POST',
+            'url': 'http://127.0.0.1:8000/api/${var1}/items',
+            'headers': {f'X-Header-{i}': f'${{var{i % 50}}}' for i in range(20)},
+            'body': json.dumps([
+                {'id': i, 'desc': 'x' * 64,
+                 'name': f'${{var{i % 50}}}' if dense or i % 100 == 0 else f'name{i}',
+                 'ts': '${__now()}' if dense or i % 100 == 0 else 1700000000}
+                for i in range(items)
+            ]),
+            'body_type': 'raw',
+        }
+
+    for dense in (False, True):
+        for items in (10, 1000, 10000):
+            case_data = build_case(items, dense)
+            key = ('bench', dense, items)
+            template = get_request_template(case_data, cache_key=key)
+            assert template.render(vp) == legacy_prepare(case_data)
+            number = max(3, 3000 // items)
+            legacy = timeit.timeit(lambda: legacy_prepare(case_data), number=number) / number
+            compiled = timeit.timeit(lambda: get_request_template(case_data, key).render(vp),
+                                     number=number) / number
+            sys.stdout.write(f'{"dense " if dense else "sparse"} body items={items:>6} size={len(case_data["body"]):>8}B  '
+                             f'legacy={legacy * 1000:8.3f}ms  compiled={compiled * 1000:8.3f}ms  '
+                             f'speedup={legacy / compiled:5.2f}x\n')
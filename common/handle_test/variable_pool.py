@@ -1,6 +1,6 @@
-import re
 import logging
-import ast
+from common.handle_test.function_cache import get_function_namespace
+from common.handle_test.template import compile_template, render_template, parse_arguments
 
 log = logging.getLogger('django')
 
@@ -11,10 +11,12 @@ class VariablePool:
         self.suite_vars = {}
         self.case_vars = {}
         self.function_code = ""  # 存储函数代码字符串
+        self._function_namespace = None  # 函数代码执行后的命名空间（首次调用时获取）
 
     def set_function_code(self, code_str: str):
         """设置包含可执行函数的代码字符串"""
         self.function_code = code_str
+        self._function_namespace = None
 
     def update_global(self, data: dict):
         self.global_vars.update(data)
@@ -44,66 +46,29 @@ class VariablePool:
 
     def parse_arguments(self, arg_str: str):
         """解析参数字符串为Python对象列表"""
-        if not arg_str:
-            return []
+        return parse_arguments(arg_str)
 
-        try:
-            # 安全解析参数列表
-            return ast.literal_eval(f'[{arg_str}]')
-        except (SyntaxError, ValueError):
-            # 处理无引号的字符串参数
-            return [arg.strip() for arg in arg_str.split(',')]
-
-    def execute_function(self, func_name: str, *args):
-        """执行指定函数并返回结果"""
+    def get_function(self, func_name: str):
+        """获取函数代码中定义的函数"""
         if not self.function_code:
             raise ValueError("未设置函数代码")
+        if self._function_namespace is None:
+            self._function_namespace = get_function_namespace(self.function_code)
+        func = self._function_namespace.get(func_name)
+        if not func:
+            raise ValueError(f"函数 {func_name} 未找到")
+        return func
 
-        namespace = {}
+    def execute_function(self, func_name: str, *args):
+        """执行指定函数并返回结果"""
         try:
-            exec(self.function_code, namespace)
-            func = namespace.get(func_name)
-            if not func:
-                raise ValueError(f"函数 {func_name} 未找到")
-            return func(*args)
+            return self.get_function(func_name)(*args)
         except Exception as e:
             log.error(f"执行函数 {func_name} 失败: {str(e)}")
             raise
 
     def parse_placeholder(self, raw_str: str):
-        """解析所有类型的占位符，包括变量和函数调用"""
-        # 先处理函数调用占位符
-        func_pattern = r'\${__(\w+)\((.*?)\)}'
-
-        def func_replacement(match):
-            func_name = match.group(1)
-            arg_str = match.group(2).strip()
-
-            # 解析参数
-            args = self.parse_arguments(arg_str) if arg_str else []
-
-            try:
-                # 执行函数
-                func_result = self.execute_function(func_name, *args)
-                return str(func_result)
-            except Exception as e:
-                log.error('执行函数失败: %s', str(e))
-                # 执行失败时返回原始占位符
-                return match.group(0)
-
-        # 替换函数调用
-        result = re.sub(func_pattern, func_replacement, raw_str)
-
-        # 再处理变量占位符
-        var_pattern = r'\${([\w\.]+)}'
-
-        def var_replacement(match):
-            var_name = match.group(1)
-            value = self.get_value(var_name)
-            # 未找到变量值时返回原始占位符
-            return str(value) if value is not None else match.group(0)
-
-        result = re.sub(var_pattern, var_replacement, result)
-
-        log.info(f'解析占位符: {raw_str} -> {result}')
+        """解析所有类型的占位符，包括变量和函数调用（模板按字符串编译缓存）"""
+        result = render_template(compile_template(raw_str), self)
+        log.debug('解析占位符: %s -> %s', raw_str, result)
         return result
@@ -0,0 +1,214 @@
+import os
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from django.conf import settings
+from celery.signals import worker_process_shutdown
+from celery.utils.log import get_task_logger
+from playwright.async_api import async_playwright
+
+log = get_task_logger('worker')
+
+
+def browser_launch_args(browser_type: str, is_headless: bool) -> list:
+    """不同浏览器类型的启动参数"""
+    if browser_type == 'chromium':
+        browser_args = [
+            "--height=1080",
+            "--width=1920",
+            "--no-sandbox",
+            "--disable-setuid-sandbox",
+            "--disable-dev-shm-usage",
+            "--disable-gpu",
+        ]
+        if is_headless:
+            browser_args.append("--headless=new")
+        return browser_args
+    if browser_type == 'firefox':
+        return [
+            "--height=1080",
+            "--width=1920",
+            "--no-sandbox",
+            "--disable-dev-shm-usage",
+        ]
+    if browser_type == 'webkit':
+        # WebKit专用参数，解决Docker环境中的兼容性问题
+        return ["--no-startup-window"]
+    return []
+
+
+class PooledBrowser:
+    """池中的浏览器实例，记录已分配的上下文数量"""
+
+    def __init__(self, key, browser):
+        self.key = key
+        self.browser = browser
+        self.served = 0
+        self.active = 0
+        self.retired = False
+
+    @property
+    def healthy(self) -> bool:
+        return not self.retired and self.browser.is_connected()
+
+
+class BrowserPool:
+    """
+    浏览器池（每个 Celery worker 进程一个）
+    按 (浏览器类型, 是否无头) 保持常驻浏览器进程，每个用例只新建独立的 BrowserContext：
+      - 分配上下文前检查浏览器是否仍然连接，崩溃/断开后自动重新启动；
+      - 单个浏览器分配的上下文达到 UI_BROWSER_MAX_CONTEXTS 后退役，
+        等正在使用的上下文全部关闭后再关闭浏览器，新的用例使用新启动的浏览器。
+    Playwright 对象绑定创建它的事件循环，所有协程都需通过 run() 在池的常驻事件循环中执行
+    """
+
+    def __init__(self, max_contexts=None):
+        self.max_contexts = max_contexts or settings.UI_BROWSER_MAX_CONTEXTS
+        self._playwright = None
+        self._browsers = {}
+        self._launch_lock = None
+        self._loop = None
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    # ---------- 常驻事件循环 ----------
+    def _ensure_loop(self):
+        with self._thread_lock:
+            if self._loop is not None:
+                return self._loop
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run_loop():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            self._thread = threading.Thread(target=run_loop, name='browser-pool-loop', daemon=True)
+            self._thread.start()
+            ready.wait()
+            self._loop = loop
+            log.info(f"浏览器池事件循环已启动, pid={os.getpid()}")
+            return loop
+
+    def run(self, coro, timeout=None):
+        """在浏览器池的事件循环中执行协程并等待结果（同步调用，供 Celery 任务使用）"""
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        return future.result(timeout)
+
+    # ---------- 浏览器管理 ----------
+    async def _launch(self, key):
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        browser_type, is_headless = key
+        browser = await getattr(self._playwright, browser_type).launch(
+            headless=is_headless,
+            args=browser_launch_args(browser_type, is_headless)
+        )
+        log.info(f"浏览器池启动浏览器: {browser_type}, headless={is_headless}")
+        return PooledBrowser(key, browser)
+
+    async def _acquire(self, browser_type, is_headless) -> PooledBrowser:
+        key = (browser_type, bool(is_headless))
+        if self._launch_lock is None:
+            self._launch_lock = asyncio.Lock()
+        async with self._launch_lock:
+            pooled = self._browsers.get(key)
+            if pooled is not None and not pooled.healthy:
+                log.warning(f"浏览器已断开或已退役，重新启动: {browser_type}")
+                await self._retire(pooled)
+                pooled = None
+            if pooled is None:
+                pooled = self._browsers[key] = await self._launch(key)
+            pooled.served += 1
+            pooled.active += 1
+            if pooled.served >= self.max_contexts:
+                # 达到上限后不再分配新的上下文，当前上下文关闭后浏览器随之关闭
+                pooled.retired = True
+                self._browsers.pop(key, None)
+            return pooled
+
+    async def _release(self, pooled: PooledBrowser):
+        pooled.active -= 1
+        if pooled.retired and pooled.active <= 0:
+            await self._close_browser(pooled)
+
+    async def _retire(self, pooled: PooledBrowser):
+        pooled.retired = True
+        if self._browsers.get(pooled.key) is pooled:
+            self._browsers.pop(pooled.key)
+        if pooled.active <= 0:
+            await self._close_browser(pooled)
+
+    @staticmethod
+    async def _close_browser(pooled: PooledBrowser):
+        try:
+            await pooled.browser.close()
+            log.info(f"浏览器池关闭浏览器: {pooled.key[0]}, 累计分配上下文: {pooled.served}")
+        except Exception as e:
+            log.warning(f"关闭浏览器失败: {e}")
+
+    @asynccontextmanager
+    async def new_context(self, browser_type, is_headless, **context_options):
+        """从常驻浏览器中分配一个独立的 BrowserContext，退出时关闭上下文"""
+        pooled = await self._acquire(browser_type, is_headless)
+        context = None
+        try:
+            context = await pooled.browser.new_context(**context_options)
+            yield context
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception as e:
+                    log.warning(f"关闭浏览器上下文失败: {e}")
+            await self._release(pooled)
+
+    async def close(self):
+        """关闭所有浏览器和 Playwright"""
+        for pooled in list(self._browsers.values()):
+            await self._close_browser(pooled)
+        self._browsers.clear()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def shutdown(self, timeout=30):
+        """关闭浏览器池并停止事件循环（worker 进程退出时调用）"""
+        with self._thread_lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self.close(), loop).result(timeout)
+        except Exception as e:
+            log.warning(f"关闭浏览器池失败: {e}")
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join(timeout)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """获取当前进程的浏览器池（fork 出的子进程各自创建）"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = BrowserPool()
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def run_in_browser_pool(coro, timeout=None):
+    """在当前进程浏览器池的事件循环中执行协程（替代 asyncio.run）"""
+    return get_browser_pool().run(coro, timeout)
+
+
+@worker_process_shutdown.connect
+def shutdown_browser_pool(**kwargs):
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.shutdown()
@@ -0,0 +1,103 @@
+import threading
+from collections import OrderedDict
+import redis
+from django.conf import settings
+from celery.utils.log import get_task_logger
+from common.redis_client import get_redis
+from ui_case.models import UiElement
+
+log = get_task_logger('worker')
+
+# 元素变更版本号：元素保存/删除时递增，各 worker 进程发现版本变化后清空本地缓存
+ELEMENT_VERSION_KEY = 'ui:elements:version'
+
+
+def element_selector(locator_type: str, locator_value: str) -> str:
+    return f"{locator_type}={locator_value}"
+
+
+def referenced_element_ids(*step_lists) -> set:
+    """步骤中引用的元素 id（element_id 为整数的步骤）"""
+    return {
+        step['element_id']
+        for steps in step_lists for step in (steps or [])
+        if isinstance(step, dict) and type(step.get('element_id')) == int
+    }
+
+
+class ElementCache:
+    """
+    UI 元素定位器缓存（每个 worker 进程一个，LRU）
+    用例开始前通过 preload() 一次查询出所有引用的元素，步骤执行时直接取缓存；
+    元素保存/删除时通过 Redis 中的版本号通知所有进程清空缓存，
+    Redis 不可用时每次 preload 都重新查询（退化为每个用例一次查询）
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size or settings.UI_ELEMENT_CACHE_SIZE
+        self._entries = OrderedDict()  # id -> selector
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _check_version(self):
+        try:
+            version = get_redis().get(ELEMENT_VERSION_KEY) or b'0'
+        except redis.RedisError as e:
+            log.warning(f"读取元素版本号失败，清空元素缓存: {e}")
+            version = None
+        with self._lock:
+            if version is None or version != self._version:
+                self._entries.clear()
+            self._version = version
+
+    def _put(self, element_id, selector):
+        self._entries[element_id] = selector
+        self._entries.move_to_end(element_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def preload(self, element_ids) -> int:
+        """批量加载未缓存的元素（同步方法，异步上下文中需 sync_to_async 调用），返回本次查询的元素数量"""
+        self._check_version()
+        with self._lock:
+            missing = {element_id for element_id in element_ids if element_id not in self._entries}
+        if not missing:
+            return 0
+        rows = UiElement.objects.filter(id__in=missing).values('id', 'locator_type', 'locator_value')
+        with self._lock:
+            for row in rows:
+                self._put(row['id'], element_selector(row['locator_type'], row['locator_value']))
+        return len(missing)
+
+    def get(self, element_id):
+        """返回缓存的定位器，未缓存时返回 None"""
+        with self._lock:
+            selector = self._entries.get(element_id)
+            if selector is None:
+                return None
+            self._entries.move_to_end(element_id)
+            return selector
+
+    def load(self, element_id):
+        """查询单个元素并缓存（同步方法），元素不存在时抛出 UiElement.DoesNotExist"""
+        row = UiElement.objects.values('locator_type', 'locator_value').get(id=element_id)
+        selector = element_selector(row['locator_type'], row['locator_value'])
+        with self._lock:
+            self._put(element_id, selector)
+        return selector
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+element_cache = ElementCache()
+
+
+def invalidate_element_cache():
+    """元素变更后递增版本号（所有进程的缓存在下次 preload 时失效），并清空当前进程的缓存"""
+    element_cache.clear()
+    try:
+        get_redis().incr(ELEMENT_VERSION_KEY)
+    except redis.RedisError as e:
+        log.warning(f"更新元素版本号失败: {e}")
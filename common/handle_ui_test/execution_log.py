@@ -0,0 +1,104 @@
+import json
+import time
+import logging
+from collections import deque
+from datetime import datetime
+from django.conf import settings
+from common.handle_test.payload_storage import store_compressed, load_compressed
+
+log = logging.getLogger('django')
+
+LOG_LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+# 执行日志在对象存储中的路径前缀
+EXECUTION_LOG_DIR = 'ui_execution_logs'
+
+
+class LogRecord:
+    """一条执行日志"""
+    __slots__ = ('ts', 'level', 'message')
+
+    def __init__(self, level: str, message: str, ts=None):
+        self.ts = time.time() if ts is None else ts
+        self.level = level
+        self.message = message
+
+    def to_dict(self) -> dict:
+        return {
+            'ts': datetime.fromtimestamp(self.ts).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],
+            'level': self.level,
+            'msg': self.message,
+        }
+
+
+class ExecutionLogBuffer:
+    """
+    UI 用例执行日志缓冲区
+    - 低于 UI_EXECUTION_LOG_LEVEL 的日志不记录（变量替换等明细为 DEBUG 级别）；
+    - 最多保留最近 UI_EXECUTION_LOG_MAX_RECORDS 条，超出时丢弃最早的日志并计数；
+    - 执行结束时调用 to_jsonl() 序列化一次为 JSON Lines（每行一条 {"ts", "level", "msg"}）
+    """
+
+    def __init__(self, level=None, max_records=None):
+        self.level = LOG_LEVELS.get((level or settings.UI_EXECUTION_LOG_LEVEL).upper(), LOG_LEVELS['INFO'])
+        self.records = deque(maxlen=max_records or settings.UI_EXECUTION_LOG_MAX_RECORDS)
+        self.dropped = 0
+
+    def enabled(self, level: str) -> bool:
+        return LOG_LEVELS.get(level, LOG_LEVELS['INFO']) >= self.level
+
+    def add(self, level: str, message: str):
+        if not self.enabled(level):
+            return
+        if len(self.records) == self.records.maxlen:
+            self.dropped += 1
+        self.records.append(LogRecord(level, message))
+
+    def __len__(self):
+        return len(self.records)
+
+    def to_jsonl(self) -> str:
+        records = [record.to_dict() for record in self.records]
+        if self.dropped and records:
+            records.insert(0, {
+                'ts': records[0]['ts'],
+                'level': 'WARNING',
+                'msg': f'日志超过 {self.records.maxlen} 条，已省略最早的 {self.dropped} 条',
+            })
+        return '\n'.join(json.dumps(record, ensure_ascii=False, separators=(',', ':')) for record in records)
+
+
+def offload_execution_log(text: str, prefix=''):
+    """
+    执行日志存储策略（与接口响应体一致）：
+      - 不超过 UI_EXECUTION_LOG_INLINE_LIMIT 字节时原样保存在 steps_log 中；
+      - 超过阈值时压缩后写入默认存储（MinIO），steps_log 中只保留引用和最后 N 个字符的预览：
+        {'log_ref': {'name': ..., 'encoding': ..., 'size': ..., 'stored_size': ...}, 'log_preview': '...'}
+    写入存储失败时保留原始日志
+    """
+    if not isinstance(text, str):
+        return text
+    raw = text.encode('utf-8')
+    if len(raw) <= settings.UI_EXECUTION_LOG_INLINE_LIMIT:
+        return text
+    try:
+        ref = store_compressed(raw, EXECUTION_LOG_DIR, prefix)
+    except Exception as e:
+        log.warning(f"执行日志写入对象存储失败，保留在数据库中: {e}")
+        return text
+    # 失败原因通常在日志末尾，预览取最后的若干完整行
+    preview = text[-settings.UI_EXECUTION_LOG_PREVIEW_CHARS:]
+    if '\n' in preview:
+        preview = preview[preview.index('\n') + 1:]
+    return {'log_ref': ref, 'log_preview': preview}
+
+
+def load_execution_log(steps_log):
+    """按 log_ref 读取完整执行日志（仅详情接口使用），未外置存储时原样返回"""
+    ref = steps_log.get('log_ref') if isinstance(steps_log, dict) else None
+    if not ref:
+        return steps_log
+    try:
+        return load_compressed(ref).decode('utf-8')
+    except Exception as e:
+        log.error(f"读取执行日志失败: {ref.get('name')} - {e}")
+        return steps_log.get('log_preview', '')
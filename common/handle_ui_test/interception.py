@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import asyncio
+import uuid
+import hashlib
+import tempfile
+from fnmatch import fnmatch
+from django.conf import settings
+from celery.utils.log import get_task_logger
+from ui_case.models import UiInterceptionProfile
+
+log = get_task_logger('worker')
+
+# 可以缓存到本地磁盘的静态资源类型
+STATIC_RESOURCE_TYPES = ('script', 'stylesheet', 'font', 'image')
+# 缓存文件中不保留的响应头（响应体已由 Playwright 解压，长度以实际文件为准）
+_SKIP_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding', 'set-cookie')
+
+
+class StaticAssetCache:
+    """
+    静态资源本地磁盘缓存（同一台机器的 worker 进程共用）
+    按 URL 哈希保存响应体和响应头，超过 UI_STATIC_CACHE_TTL 秒后重新从服务端获取；
+    响应头带 no-store 或状态码不是 200 的响应不缓存
+    """
+
+    def __init__(self, directory=None, ttl=None):
+        self.directory = directory or settings.UI_STATIC_CACHE_DIR or os.path.join(tempfile.gettempdir(), 'qy_ui_static_cache')
+        self.ttl = settings.UI_STATIC_CACHE_TTL if ttl is None else ttl
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, key[:2], key)
+        return base + '.body', base + '.json'
+
+    def get(self, url: str):
+        """返回 (响应头, 响应体文件路径)，未缓存或已过期时返回 None"""
+        body_path, meta_path = self._paths(url)
+        try:
+            if time.time() - os.path.getmtime(meta_path) > self.ttl:
+                return None
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                headers = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return (headers, body_path) if os.path.exists(body_path) else None
+
+    def put(self, url: str, status: int, headers: dict, body: bytes) -> bool:
+        if status != 200 or 'no-store' in headers.get('cache-control', ''):
+            return False
+        body_path, meta_path = self._paths(url)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        kept = {k: v for k, v in headers.items() if k.lower() not in _SKIP_HEADERS}
+        # 先写临时文件再替换，避免其它进程读到写了一半的文件
+        for path, data in ((body_path, body), (meta_path, json.dumps(kept).encode('utf-8'))):
+            tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return True
+
+
+def get_interception_rules(project_id):
+    """项目启用的拦截规则，未配置或未启用时返回 None"""
+    profile = UiInterceptionProfile.objects.filter(project_id=project_id, enabled=True).first()
+    return profile.to_rules() if profile else None
+
+
+_static_cache = None
+
+
+def get_static_cache() -> StaticAssetCache:
+    global _static_cache
+    if _static_cache is None:
+        _static_cache = StaticAssetCache()
+    return _static_cache
+
+
+class RequestInterceptor:
+    """
+    按项目的拦截配置（UiInterceptionProfile.to_rules()）处理浏览器上下文中的请求，优先级：
+    屏蔽的资源类型 / URL -> 固定返回的接口 -> 本地缓存的静态资源 -> 正常请求
+    """
+
+    def __init__(self, rules: dict):
+        self.blocked_types = set(rules.get('blocked_resource_types') or [])
+        self.blocked_patterns = list(rules.get('blocked_url_patterns') or [])
+        self.stubs = list(rules.get('stubs') or [])
+        self.cache = get_static_cache() if rules.get('cache_static') else None
+        self.stats = {'blocked': 0, 'stubbed': 0, 'cache_hit': 0, 'cache_miss': 0}
+
+    @property
+    def active(self) -> bool:
+        return bool(self.blocked_types or self.blocked_patterns or self.stubs or self.cache)
+
+    async def apply(self, browser_context):
+        if self.active:
+            await browser_context.route('**/*', self.handle)
+
+    def _match_stub(self, request):
+        for stub in self.stubs:
+            method = (stub.get('method') or '').upper()
+            if method and method != request.method:
+                continue
+            if fnmatch(request.url, stub['url']):
+                return stub
+        return None
+
+    async def handle(self, route):
+        request = route.request
+        try:
+            if request.resource_type in self.blocked_types or any(
+                    fnmatch(request.url, pattern) for pattern in self.blocked_patterns):
+                self.stats['blocked'] += 1
+                await route.abort('blockedbyclient')
+                return
+
+            stub = self._match_stub(request)
+            if stub is not None:
+                self.stats['stubbed'] += 1
+                body = stub.get('body', '')
+                await route.fulfill(
+                    status=int(stub.get('status', 200)),
+                    headers=stub.get('headers') or {},
+                    body=body if isinstance(body, str) else json.dumps(body, ensure_ascii=False),
+                )
+                return
+
+            if self.cache is not None and request.method == 'GET' and request.resource_type in STATIC_RESOURCE_TYPES:
+                await self._serve_static(route, request)
+                return
+
+            await route.continue_()
+        except Exception as e:
+            # 页面关闭后路由可能已失效，拦截失败时按正常请求处理，不影响用例
+            log.debug(f"请求拦截处理失败: {request.url} - {e}")
+            try:
+                await route.continue_()
+            except Exception:
+                pass
+
+    async def _serve_static(self, route, request):
+        cached = self.cache.get(request.url)
+        if cached is not None:
+            self.stats['cache_hit'] += 1
+            headers, body_path = cached
+            await route.fulfill(status=200, headers=headers, path=body_path)
+            return
+        self.stats['cache_miss'] += 1
+        response = await route.fetch()
+        body = await response.body()
+        await asyncio.to_thread(self.cache.put, request.url, response.status, response.headers, body)
+        await route.fulfill(response=response)
@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import asyncio
+import tempfile
+import redis
+from urllib.parse import urlsplit
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from celery.utils.log import get_task_logger
+from common.redis_client import get_redis
+from common.handle_ui_test.ui_runner import run_ui_case_tool
+
+log = get_task_logger('worker')
+
+LOGIN_STATE_KEY_PREFIX = 'ui:login_state'
+# 前置API返回这些状态码时视为登录状态失效
+AUTH_FAILURE_STATUS = (401, 403)
+
+
+class LoginCaseFailed(Exception):
+    """依赖的登录用例执行失败"""
+
+    def __init__(self, login_case, status):
+        self.login_case = login_case
+        self.status = status
+        super().__init__(f"依赖的登录用例执行失败: {status}")
+
+
+def _cache_key(login_case) -> str:
+    # 登录用例修改后 updated_at 变化，旧缓存自然失效
+    return f"{LOGIN_STATE_KEY_PREFIX}:{login_case.id}:{int(login_case.updated_at.timestamp())}"
+
+
+def _cookie_ttl(storage_state: dict):
+    """返回 cookie 最早过期前的剩余秒数（已扣除安全余量），没有带过期时间的 cookie 时返回 None"""
+    expires = [cookie['expires'] for cookie in storage_state.get('cookies', []) if cookie.get('expires', -1) > 0]
+    if not expires:
+        return None
+    return min(expires) - time.time() - settings.UI_LOGIN_STATE_EXPIRY_MARGIN
+
+
+class LoginStateCache:
+    """
+    登录用例存储状态缓存（Redis）
+    key 为 登录用例 id + updated_at，缓存时间取 UI_LOGIN_STATE_TTL 与 cookie 最早过期时间中较小的一个；
+    读取时再次校验 cookie 是否即将过期，过期的缓存直接删除
+    """
+
+    def get(self, login_case):
+        """返回 {'state': storage_state, 'saved_at': ...}，无可用缓存时返回 None"""
+        key = _cache_key(login_case)
+        try:
+            raw = get_redis().get(key)
+        except redis.RedisError as e:
+            # 缓存不可用时退化为每次执行登录用例
+            log.warning(f"读取登录状态缓存失败: {e}")
+            return None
+        if not raw:
+            return None
+        try:
+            entry = json.loads(raw)
+        except ValueError:
+            self._delete(key)
+            return None
+        ttl = _cookie_ttl(entry['state'])
+        if ttl is not None and ttl <= 0:
+            log.info(f"登录状态缓存中的 cookie 即将过期，重新登录: {login_case.name}")
+            self._delete(key)
+            return None
+        return entry
+
+    @staticmethod
+    def _delete(key) -> bool:
+        """删除缓存，Redis 不可用时只记录日志（不影响重新登录）"""
+        try:
+            get_redis().delete(key)
+        except redis.RedisError as e:
+            log.warning(f"删除登录状态缓存失败: {e}")
+            return False
+        return True
+
+    def set(self, login_case, storage_state: dict):
+        ttl = settings.UI_LOGIN_STATE_TTL
+        cookie_ttl = _cookie_ttl(storage_state)
+        if cookie_ttl is not None:
+            ttl = min(ttl, int(cookie_ttl))
+        if ttl <= 0:
+            log.warning(f"登录状态的 cookie 即将过期，不写入缓存: {login_case.name}")
+            return None
+        entry = {'state': storage_state, 'saved_at': time.time()}
+        try:
+            get_redis().set(_cache_key(login_case), json.dumps(entry), ex=ttl)
+        except redis.RedisError as e:
+            log.warning(f"写入登录状态缓存失败: {e}")
+            return None
+        log.info(f"登录状态已缓存: {login_case.name}, ttl={ttl}s")
+        return entry
+
+    def invalidate(self, login_case, saved_at=None):
+        """
+        删除缓存；指定 saved_at 时只删除同一份缓存
+        （其它用例已经重新登录并刷新了缓存时不再删除）
+        """
+        key = _cache_key(login_case)
+        if saved_at is not None:
+            entry = self.get(login_case)
+            if entry is None or entry['saved_at'] != saved_at:
+                return False
+        return self._delete(key)
+
+
+login_state_cache = LoginStateCache()
+
+# 同一进程内正在执行的登录任务，多个用例同时缺少缓存时只执行一次登录
+_inflight_logins = {}
+
+
+def _write_state_file(storage_state=None, temp_dir=None) -> str:
+    """写入临时存储状态文件（storage_state 为空时创建空文件，供登录用例保存状态）"""
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.json', dir=temp_dir, delete=False,
+                                     encoding='utf-8') as f:
+        if storage_state is not None:
+            json.dump(storage_state, f)
+        return f.name
+
+
+async def _login(login_case, run_id=None, is_headless=True, browser_type=None, plan=None):
+    """执行登录用例，成功后把存储状态写入缓存并返回缓存条目"""
+    log.info(f"执行登录用例获取存储状态: {login_case.name}")
+    login_case_json = {
+        'pre_apis': login_case.pre_apis,
+        'steps': login_case.steps,
+        'post_steps': login_case.post_steps
+    }
+    path = _write_state_file()
+    try:
+        status, logs, screenshot, execution_log = await run_ui_case_tool(
+            case_json=login_case_json,
+            is_headless=is_headless,
+            browser_type=browser_type or settings.UI_TEST_BROWSER_TYPE,
+            storage_state_path=path,
+            save_storage_state=True,
+            run_id=run_id,
+            plan=plan
+        )
+        if status != 'passed':
+            log.error(f"登录用例执行失败，状态: {status}")
+            raise LoginCaseFailed(login_case, status)
+        with open(path, 'r', encoding='utf-8') as f:
+            storage_state = json.load(f)
+    finally:
+        os.unlink(path)
+    entry = await sync_to_async(login_state_cache.set, thread_sensitive=False)(login_case, storage_state)
+    return entry or {'state': storage_state, 'saved_at': time.time()}
+
+
+async def get_login_state(login_case, force_login=False, **login_kwargs):
+    """获取登录用例的存储状态：优先使用缓存，缓存不可用或 force_login 时执行登录用例"""
+    if not force_login:
+        entry = await sync_to_async(login_state_cache.get, thread_sensitive=False)(login_case)
+        if entry is not None:
+            log.info(f"使用缓存的登录状态: {login_case.name}")
+            entry['from_cache'] = True
+            return entry
+
+    key = _cache_key(login_case)
+    task = _inflight_logins.get(key)
+    if task is None:
+        task = _inflight_logins[key] = asyncio.ensure_future(_login(login_case, **login_kwargs))
+        task.add_done_callback(lambda _: _inflight_logins.pop(key, None))
+    return await asyncio.shield(task)
+
+
+def _login_page_path(login_case):
+    """登录用例第一个 goto 步骤的页面路径（包含变量或为根路径时无法判断，返回 None）"""
+    for step in login_case.steps or []:
+        if isinstance(step, dict) and step.get('action') == 'goto':
+            url = step.get('url') or ''
+            path = urlsplit(url).path.rstrip('/')
+            return path if path and '${' not in url else None
+    return None
+
+
+def login_state_expired(login_case, result) -> bool:
+    """
+    根据用例执行结果判断登录状态是否失效（只有存在认证相关的失败信号时才判定为失效）：
+      - 前置API返回 401/403；
+      - 第一个步骤就失败（页面未按登录状态打开）；
+      - 失败时页面停留在登录页（被重定向到登录用例打开的页面）
+    """
+    logs = result[1] or {}
+    if any(isinstance(item, dict) and item.get('status_code') in AUTH_FAILURE_STATUS
+           for item in logs.get('pre_apis_result') or []):
+        return True
+    failure = logs.get('failure')
+    if not failure:
+        return False
+    if failure.get('step') == 1:
+        return True
+    login_path = _login_page_path(login_case)
+    return bool(login_path) and urlsplit(failure.get('url') or '').path.rstrip('/') == login_path
+
+
+async def run_with_login_state(login_case, run_case, temp_dir=None, **login_kwargs):
+    """
+    使用登录用例的存储状态执行用例
+    run_case(storage_state_path) 返回 run_ui_case_tool 的结果；
+    使用缓存的登录状态执行失败、且失败原因表明登录状态已失效时（见 login_state_expired），
+    清除缓存、重新登录后再执行一次；其它失败（断言失败等）直接返回，不重复执行前置/后置步骤
+    登录用例执行失败时抛出 LoginCaseFailed
+    """
+    entry = await get_login_state(login_case, **login_kwargs)
+    path = _write_state_file(entry['state'], temp_dir)
+    try:
+        result = await run_case(path)
+    finally:
+        os.unlink(path)
+    if result[0] == 'passed' or not entry.get('from_cache') or not login_state_expired(login_case, result):
+        return result
+
+    # 缓存的登录状态已失效（服务端会话过期等），重新登录后重试一次；
+    # 其它用例已经刷新过缓存时直接使用新的登录状态
+    log.warning(f"缓存的登录状态已失效，重新登录后重试: {login_case.name}")
+    await sync_to_async(login_state_cache.invalidate, thread_sensitive=False)(login_case, entry['saved_at'])
+    entry = await get_login_state(login_case, **login_kwargs)
+    path = _write_state_file(entry['state'], temp_dir)
+    try:
+        return await run_case(path)
+    finally:
+        os.unlink(path)
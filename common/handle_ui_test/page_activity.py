@@ -0,0 +1,122 @@
+import re
+import time
+import asyncio
+from collections import deque
+
+# 每个页面保留的最近响应数量（wait_response 可以匹配到等待开始前已经返回的响应）
+RECENT_RESPONSES = 200
+
+
+class PageActivity:
+    """
+    记录页面的网络/导航活动，供条件等待和固定等待分析使用：
+      - last_activity: 最近一次请求、响应、导航发生的时间（time.monotonic()）；
+      - inflight: 尚未结束的请求数；
+      - responses: 最近的响应 (时间, url, status)
+    """
+
+    def __init__(self, page):
+        self.page = page
+        self.last_activity = time.monotonic()
+        self.inflight = 0
+        self.responses = deque(maxlen=RECENT_RESPONSES)
+        page.on('request', self._on_request)
+        page.on('requestfinished', self._on_request_done)
+        page.on('requestfailed', self._on_request_done)
+        page.on('response', self._on_response)
+        page.on('framenavigated', self._touch)
+
+    def _touch(self, *args):
+        self.last_activity = time.monotonic()
+
+    def _on_request(self, request):
+        self.inflight += 1
+        self._touch()
+
+    def _on_request_done(self, request):
+        self.inflight = max(0, self.inflight - 1)
+        self._touch()
+
+    def _on_response(self, response):
+        self.responses.append((time.monotonic(), response.url, response.status))
+        self._touch()
+
+    def idle_time(self, since: float, until: float) -> float:
+        """[since, until] 区间内页面无网络/导航活动的时长（区间结束时仍有请求未完成时视为 0）"""
+        if self.inflight > 0:
+            return 0.0
+        return max(0.0, until - max(since, self.last_activity))
+
+    def find_response(self, matcher, since: float):
+        """在 since 之后收到的响应中查找第一个匹配的响应，返回 (url, status) 或 None"""
+        for received_at, url, status in self.responses:
+            if received_at >= since and matcher(url, status):
+                return url, status
+        return None
+
+
+def response_matcher(url_pattern: str = None, status=None, regex=False):
+    """响应匹配条件：url 包含（或正则匹配）url_pattern，status 相等；未指定的条件不检查"""
+    compiled = re.compile(url_pattern) if url_pattern and regex else None
+
+    def match(url, response_status):
+        if url_pattern:
+            if compiled is not None and not compiled.search(url):
+                return False
+            if compiled is None and url_pattern not in url:
+                return False
+        return status is None or int(status) == response_status
+
+    return match
+
+
+async def wait_for_response(page, activity: PageActivity, matcher, since: float, timeout: float):
+    """
+    等待匹配的响应：先检查 since（上一个步骤开始）之后已经收到的响应，
+    没有时再等待新的响应，最多 timeout 秒；返回 (url, status)
+    """
+    found = activity.find_response(matcher, since)
+    if found:
+        return found
+    response = await page.wait_for_event(
+        'response', predicate=lambda r: matcher(r.url, r.status), timeout=timeout * 1000
+    )
+    return response.url, response.status
+
+
+async def wait_element_stable(element, timeout: float, interval=0.1, stable_checks=2):
+    """等待元素可见且位置、尺寸连续 stable_checks 次不变（动画、布局抖动结束），最多 timeout 秒"""
+    deadline = time.monotonic() + timeout
+    await element.wait_for(state='visible', timeout=timeout * 1000)
+    last_box, stable = None, 0
+    while True:
+        box = await element.bounding_box()
+        if box is not None and box == last_box:
+            stable += 1
+            if stable >= stable_checks:
+                return box
+        else:
+            stable = 0
+        last_box = box
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"元素在 {timeout} 秒内未稳定")
+        await asyncio.sleep(interval)
+
+
+async def wait_url(page, timeout: float, url_pattern: str = None, previous_url: str = None, regex=False):
+    """
+    等待页面 URL：指定 url_pattern 时等待 URL 包含（或正则匹配）该值，
+    否则等待 URL 与 previous_url 不同；最多 timeout 秒，返回当前 URL
+    """
+    if url_pattern:
+        compiled = re.compile(url_pattern) if regex else None
+
+        def predicate(url):
+            return bool(compiled.search(url)) if compiled is not None else url_pattern in url
+    else:
+        def predicate(url):
+            return url != previous_url
+
+    if not predicate(page.url):
+        await page.wait_for_url(predicate, timeout=timeout * 1000)
+    return page.url
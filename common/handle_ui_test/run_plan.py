@@ -0,0 +1,99 @@
+import copy
+from types import MappingProxyType
+from ui_case.models import UiTestCase, UiElement
+from common.handle_test.run_plan import RunEnvironment, load_run_environment, referenced_db_env_ids
+from common.handle_ui_test.element_cache import element_selector, referenced_element_ids
+from common.handle_ui_test.interception import get_interception_rules
+
+
+class PlannedCase:
+    """
+    执行计划中的UI用例（只读），与 UiTestCase 的字段同名，
+    登录状态缓存（login_state）等按 id / name / updated_at 使用用例的代码可以直接传入
+    """
+    __slots__ = ('id', 'name', 'updated_at', 'created_by_id', 'project_id',
+                 'pre_apis', 'steps', 'post_steps', 'login_case')
+
+    def __init__(self, test_case: UiTestCase, login_case=None):
+        values = {
+            'id': test_case.id,
+            'name': test_case.name,
+            'updated_at': test_case.updated_at,
+            'created_by_id': test_case.created_by_id,
+            'project_id': test_case.module.project_id,
+            # 步骤定义在计划中只保存一份，执行时通过 case_json() 取副本
+            'pre_apis': tuple(test_case.pre_apis or []),
+            'steps': tuple(test_case.steps or []),
+            'post_steps': tuple(test_case.post_steps or []),
+            'login_case': login_case,
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} 为只读对象")
+
+    @property
+    def login_case_id(self):
+        return self.login_case.id if self.login_case is not None else None
+
+    def case_json(self) -> dict:
+        return {
+            'pre_apis': copy.deepcopy(list(self.pre_apis)),
+            'steps': copy.deepcopy(list(self.steps)),
+            'post_steps': copy.deepcopy(list(self.post_steps)),
+        }
+
+
+class UiRunPlan:
+    """
+    UI 用例执行计划（只读）：执行开始前一次性加载的用例、登录用例、元素定位器、
+    全局变量、Python 函数代码、数据库配置和请求拦截规则，执行引擎只从计划中读取这些数据
+    """
+    __slots__ = ('cases', 'elements', 'environment', 'interception')
+
+    def __init__(self, cases, elements: dict, environment: RunEnvironment, interception=None):
+        object.__setattr__(self, 'cases', tuple(cases))
+        # 元素 id -> 定位器
+        object.__setattr__(self, 'elements', MappingProxyType(dict(elements)))
+        object.__setattr__(self, 'environment', environment)
+        object.__setattr__(self, 'interception', interception)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} 为只读对象")
+
+
+def build_ui_run_plan(case_ids, project_id=None) -> UiRunPlan:
+    """
+    按用例 id 构建执行计划，查询次数固定，与用例和步骤数量无关：
+    用例及登录用例（1 次）、元素（1 次）、全局变量和 Python 代码（各 1 次）、
+    数据库配置（1 次，步骤中未指定数据库环境时省略）、请求拦截配置（1 次）
+    project_id 默认取第一个用例所属项目（定时任务分块内的用例属于同一项目）
+    """
+    test_cases = list(
+        UiTestCase.objects.filter(id__in=case_ids)
+        .select_related('module', 'login_case', 'login_case__module')
+        .order_by('created_at')
+    )
+    login_cases = {}
+    for test_case in test_cases:
+        if test_case.login_case_id and test_case.login_case_id not in login_cases:
+            login_cases[test_case.login_case_id] = PlannedCase(test_case.login_case)
+    cases = [PlannedCase(test_case, login_cases.get(test_case.login_case_id)) for test_case in test_cases]
+
+    all_cases = cases + list(login_cases.values())
+    element_ids = referenced_element_ids(*(case.steps for case in all_cases))
+    elements = {
+        row['id']: element_selector(row['locator_type'], row['locator_value'])
+        for row in UiElement.objects.filter(id__in=element_ids).values('id', 'locator_type', 'locator_value')
+    } if element_ids else {}
+
+    db_env_ids = referenced_db_env_ids(*(
+        steps for case in all_cases for steps in (case.pre_apis, case.steps, case.post_steps)
+    ))
+    environment = load_run_environment(db_env_ids)
+
+    if project_id is None and cases:
+        project_id = cases[0].project_id
+    interception = get_interception_rules(project_id) if project_id is not None else None
+    return UiRunPlan(cases, elements, environment, interception)
@@ -0,0 +1,169 @@
+import io
+import os
+import queue
+import uuid
+import threading
+from datetime import datetime
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from celery.signals import worker_process_shutdown
+from celery.utils.log import get_task_logger
+
+try:
+    # 可选依赖：安装 Pillow 后可生成缩略图（列表页展示），否则只上传原图
+    from PIL import Image
+except ImportError:
+    Image = None
+
+log = get_task_logger('worker')
+
+# 截图、失败现场（trace/HAR）在默认存储（MinIO）中的路径前缀
+SCREENSHOT_DIR = 'screenshots'
+ARTIFACT_DIR = 'ui_artifacts'
+THUMBNAIL_SUFFIX = '_thumb.jpg'
+
+_STOP = object()
+
+
+def thumbnail_name(name: str) -> str:
+    """原图对应的缩略图路径：screenshots/xxx.png -> screenshots/xxx_thumb.jpg"""
+    return os.path.splitext(name)[0] + THUMBNAIL_SUFFIX
+
+
+def make_thumbnail(image: bytes, max_width=None):
+    """按最大宽度等比缩放生成 JPEG 缩略图，未安装 Pillow 时返回 None"""
+    if Image is None:
+        return None
+    max_width = max_width or settings.UI_SCREENSHOT_THUMBNAIL_WIDTH
+    with Image.open(io.BytesIO(image)) as img:
+        img = img.convert('RGB')
+        if img.width > max_width:
+            img = img.resize((max_width, max(1, img.height * max_width // img.width)))
+        buf = io.BytesIO()
+        img.save(buf, format='JPEG', quality=75)
+        return buf.getvalue()
+
+
+class ScreenshotUploader:
+    """
+    失败截图、失败现场文件后台上传（每个 worker 进程一个）
+    截图只在内存中生成，submit()/submit_file() 立即返回存储路径，由后台线程写入默认存储，
+    用例的清理和结果落库不再等待上传；大文件由 S3 存储后端按分片上传。
+    队列有长度上限（UI_SCREENSHOT_QUEUE_SIZE），存储不可用导致积压时丢弃新截图，避免占满内存
+    """
+
+    def __init__(self, maxsize=None):
+        self._queue = queue.Queue(maxsize=maxsize or settings.UI_SCREENSHOT_QUEUE_SIZE)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='screenshot-uploader', daemon=True)
+                self._thread.start()
+
+    def _put(self, item) -> bool:
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            return False
+        return True
+
+    def submit(self, image: bytes, label='') -> str:
+        """提交截图，返回存储路径；队列已满时丢弃并返回空字符串"""
+        name = f"{SCREENSHOT_DIR}/{datetime.now():%Y%m%d}/{uuid.uuid4().hex}{'_' + label if label else ''}.png"
+        if not self._put((self._upload, name, image)):
+            log.warning(f"截图上传队列已满，丢弃截图: {name}")
+            return ''
+        return name
+
+    def submit_file(self, path: str, label='') -> str:
+        """提交本地文件（trace/HAR 压缩包），上传后删除本地文件；返回存储路径，队列已满时丢弃并返回空字符串"""
+        name = f"{ARTIFACT_DIR}/{datetime.now():%Y%m%d}/{uuid.uuid4().hex}{'_' + label if label else ''}{os.path.splitext(path)[1]}"
+        if not self._put((self._upload_file, name, path)):
+            log.warning(f"上传队列已满，丢弃文件: {path}")
+            os.unlink(path)
+            return ''
+        return name
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                upload, name, data = item
+                upload(name, data)
+            finally:
+                self._queue.task_done()
+
+    @staticmethod
+    def _upload_file(name, path):
+        try:
+            with open(path, 'rb') as f:
+                default_storage.save(name, File(f))
+        except Exception as e:
+            log.error(f"文件上传失败: {name} - {e}")
+        finally:
+            os.unlink(path)
+
+    @staticmethod
+    def _upload(name, image):
+        try:
+            # 存储后端设置了不覆盖同名文件，路径包含 uuid，保存后的路径与 submit 返回的一致
+            default_storage.save(name, ContentFile(image))
+        except Exception as e:
+            log.error(f"截图上传失败: {name} - {e}")
+            return
+        if not settings.UI_SCREENSHOT_THUMBNAIL:
+            return
+        try:
+            thumbnail = make_thumbnail(image)
+            if thumbnail is not None:
+                default_storage.save(thumbnail_name(name), ContentFile(thumbnail))
+        except Exception as e:
+            log.warning(f"截图缩略图生成失败: {name} - {e}")
+
+    def shutdown(self, timeout=30):
+        """等待队列中的截图上传完成后停止后台线程（worker 进程退出时调用）"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            log.warning("截图上传队列未能在退出前清空")
+            return
+        self._thread.join(timeout)
+
+
+_uploader = None
+_uploader_pid = None
+_uploader_lock = threading.Lock()
+
+
+def get_screenshot_uploader() -> ScreenshotUploader:
+    """获取当前进程的截图上传器（fork 出的子进程各自创建）"""
+    global _uploader, _uploader_pid
+    with _uploader_lock:
+        if _uploader is None or _uploader_pid != os.getpid():
+            _uploader = ScreenshotUploader()
+            _uploader_pid = os.getpid()
+        return _uploader
+
+
+def submit_screenshot(image: bytes, label='') -> str:
+    return get_screenshot_uploader().submit(image, label)
+
+
+def submit_artifact(path: str, label='') -> str:
+    return get_screenshot_uploader().submit_file(path, label)
+
+
+@worker_process_shutdown.connect
+def shutdown_screenshot_uploader(**kwargs):
+    if _uploader is not None and _uploader_pid == os.getpid():
+        _uploader.shutdown()
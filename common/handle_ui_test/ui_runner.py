@@ -5,7 +5,7 @@ django.setup()
 
 from projects.models import ProjectEnvs, GlobalVariable, PythonCode
 from ui_case.models import UiElement
-from playwright.async_api import async_playwright, expect
+from playwright.async_api import expect, TimeoutError as PlaywrightTimeoutError, Error as PlaywrightError
 import time
 import re
 import json
@@ -13,23 +13,51 @@ import asyncio
 import httpx
 from django.conf import settings
 from common.handle_test import execute_sql
+from common.handle_test.function_cache import get_function_namespace
+from common.handle_ui_test.browser_pool import get_browser_pool
+from common.handle_ui_test.screenshot_uploader import submit_screenshot, submit_artifact
+from common.handle_ui_test.element_cache import element_cache, referenced_element_ids
+from common.handle_ui_test.execution_log import ExecutionLogBuffer
+from common.handle_ui_test.interception import RequestInterceptor
+from common.handle_ui_test.page_activity import (PageActivity, response_matcher, wait_for_response,
+                                                  wait_element_stable, wait_url)
 from asgiref.sync import sync_to_async
-import jsonpath
+from common.handle_test.response_wrapper import compile_jsonpath
+from common.handle_test.request_executor import create_async_client
+from common.handle_test.suite_scheduler import DependencyGraph, collect_placeholders
 from typing import Dict, List, Any, Tuple
-from datetime import datetime
 from celery.utils.log import get_task_logger
 import re
-from ui_case.live import aemit_run_event
+from ui_case.live import aemit_run_frame, arun_watcher_count
 import base64
+import hashlib
 import random
+import tempfile
+import uuid
+import copy
 
 log = get_task_logger('worker')
 
+# 环境类错误（Playwright 错误信息中的关键字）：页面加载/导航失败、浏览器或页面被关闭，可以从检查点恢复重试
+ENVIRONMENT_ERROR_MARKERS = ('net::', 'navigation', 'navigating', 'target closed', 'has been closed',
+                             'frame was detached', 'crashed')
+
+
+def is_environment_error(error: Exception) -> bool:
+    """是否为超时、网络、导航、浏览器关闭等环境类错误（断言失败、配置错误等重试后结果不变的错误返回 False）"""
+    if isinstance(error, (PlaywrightTimeoutError, asyncio.TimeoutError, httpx.TransportError)):
+        return True
+    if isinstance(error, PlaywrightError):
+        message = str(error).lower()
+        return any(marker in message for marker in ENVIRONMENT_ERROR_MARKERS)
+    return False
+
 
 class UIExecutionEngine:
     """UI测试执行引擎"""
 
-    def __init__(self, run_id, is_headless=True, browser_type='chromium', storage_state_path=None):
+    def __init__(self, run_id, is_headless=True, browser_type='chromium', storage_state_path=None, capture=None,
+                 interception=None, checkpoint_every=None, plan=None):
         self.is_headless = is_headless
         self.browser_type = browser_type
         self.storage_state_path = storage_state_path  # 存储状态文件路径
@@ -43,11 +71,37 @@ class UIExecutionEngine:
         self.pre_results = []
         self.main_results = []
         self.post_results = []
-        self.execution_log = ""  # 执行日志
+        self.log_buffer = ExecutionLogBuffer()  # 执行日志
         self.timeout = 60000  # 等待元素超时时间（毫秒）
         self.run_id = run_id
+        # 失败现场采集：记录 Playwright trace 和 HAR，只在用例失败时上传
+        self.capture = settings.UI_CAPTURE_ON_FAILURE if capture is None else bool(capture)
+        self.artifacts = {}
+        self._capture_paths = {}
+        # 执行计划（run_plan.UiRunPlan）：定时任务执行前一次性加载的全局变量、Python 代码、元素定位器、数据库配置，
+        # 传入时执行过程中不再查询这些数据
+        self.plan = plan
+        if interception is None and plan is not None:
+            interception = plan.interception
+        # 项目的请求拦截规则（UiInterceptionProfile.to_rules()），为空时不拦截
+        self.interceptor = RequestInterceptor(interception) if interception else None
+        # 条件等待：页面网络活动记录、上一个步骤开始的时间和 URL；固定等待（sleep）的浪费时间统计
+        self.page_activity = None
+        self._last_step_started_at = time.monotonic()
+        self._last_step_url = ''
+        self.sleep_report = []
+        # 失败步骤信息（步骤序号、失败时的页面地址、错误类型），供登录状态失效判断使用
+        self.failure = None
+        # 检查点：每执行 checkpoint_every 个步骤（或步骤配置 checkpoint: true）保存一次浏览器存储状态、URL 和变量，
+        # 步骤失败时从最近的检查点恢复重试（最多 UI_CHECKPOINT_RETRIES 次），segments 记录每段的执行情况
+        self.checkpoint_every = settings.UI_CHECKPOINT_EVERY if checkpoint_every is None else int(checkpoint_every)
+        self.last_checkpoint = None
+        self.segments = []
         self._stream_task = None
         self._stream_stop = None
+        self._watchers = 0
+        self._watchers_checked_at = float('-inf')
+        self._last_frame = None
         # 推送间隔，默认 0.5 秒；可通过环境变量调整
         self.stream_interval = float(settings.UI_TEST_STREAM_INTERVAL)
         # 是否开启固定间隔推送（1/true 开启，0/false 关闭）
@@ -55,9 +109,7 @@ class UIExecutionEngine:
 
     def _add_log(self, message: str, level: str = "INFO"):
         """添加带时间戳的日志到执行日志"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"[{timestamp}] {message}\n"
-        self.execution_log += log_entry
+        self.log_buffer.add(level, message)
 
         # 同时输出到标准日志
         if level == "INFO":
@@ -69,28 +121,107 @@ class UIExecutionEngine:
         elif level == "DEBUG":
             log.debug(message)
 
-    async def _stream_loop(self, page):
-        """固定间隔推送截图（base64）。失败时记录日志但不打断主流程。"""
-        # 避免并发调用（守护任务）
+    async def _watching(self) -> bool:
+        """是否有人订阅本次执行的画面（结果缓存 1 秒，避免每帧都查询 Redis）"""
+        now = time.monotonic()
+        if now - self._watchers_checked_at >= 1:
+            count = await arun_watcher_count(self.run_id)
+            # 有新的订阅者加入时补发最后一帧，画面静止时新订阅者也能看到当前页面
+            if count > self._watchers and self._last_frame:
+                await self._emit_frame(self._last_frame)
+            self._watchers = count
+            self._watchers_checked_at = now
+        return self._watchers > 0
+
+    async def _emit_frame(self, image: bytes):
+        self._last_frame = image
+        # 画面帧以二进制发布到独立的 pub/sub 频道，由 RunConsumer 转发
+        await aemit_run_frame(self.run_id, image)
+
+    async def _sleep_interval(self):
+        """等待一个推送间隔，停止推送时立即返回"""
+        try:
+            await asyncio.wait_for(self._stream_stop.wait(), timeout=max(0.05, self.stream_interval))
+        except asyncio.TimeoutError:
+            pass
+
+    async def _screencast_loop(self, page):
+        """
+        Chromium：通过 CDP 屏幕录制推送画面，浏览器只在页面内容变化时产生新帧，
+        且按 UI_STREAM_MAX_WIDTH/HEIGHT 缩小分辨率；没有订阅者时停止录制
+        """
+        cdp = await page.context.new_cdp_session(page)
+        latest = {}
+
+        async def on_frame(params):
+            latest['data'] = params['data']
+            try:
+                await cdp.send('Page.screencastFrameAck', {'sessionId': params['sessionId']})
+            except Exception:
+                pass
+
+        cdp.on('Page.screencastFrame', lambda params: asyncio.ensure_future(on_frame(params)))
+        casting = False
         try:
             while self._stream_stop and not self._stream_stop.is_set():
                 try:
+                    watching = await self._watching()
+                    if watching and not casting:
+                        await cdp.send('Page.startScreencast', {
+                            'format': 'jpeg',
+                            'quality': settings.UI_STREAM_QUALITY,
+                            'maxWidth': settings.UI_STREAM_MAX_WIDTH,
+                            'maxHeight': settings.UI_STREAM_MAX_HEIGHT,
+                        })
+                        casting = True
+                    elif not watching and casting:
+                        await cdp.send('Page.stopScreencast')
+                        casting = False
+                    # 每个间隔最多推送一帧（只推送最新的一帧）
+                    frame = latest.pop('data', None)
+                    if frame and watching:
+                        await self._emit_frame(base64.b64decode(frame))
+                except Exception as e:
+                    # Redis 发布失败、页面跳转期间的瞬时错误等，不中断推送，下一个间隔继续
+                    self._add_log(f"屏幕录制画面推送失败: {e}", "DEBUG")
+                await self._sleep_interval()
+        finally:
+            try:
+                if casting:
+                    await cdp.send('Page.stopScreencast')
+                await cdp.detach()
+            except Exception:
+                pass
+
+    async def _poll_loop(self, page):
+        """其它浏览器：固定间隔截图，与上一帧内容相同时不推送；没有订阅者时不截图"""
+        last_digest = None
+        while self._stream_stop and not self._stream_stop.is_set():
+            try:
+                if await self._watching():
                     # 截一张小图：JPEG、降低质量，减少 WS 负载
                     buf = await page.screenshot(
-                        type="jpeg", quality=60, full_page=False
+                        type="jpeg", quality=settings.UI_STREAM_QUALITY, full_page=False, scale="css"
                     )
-                    b64 = base64.b64encode(buf).decode()
-                    # 前端已兼容 frame/img_b64
-                    await aemit_run_event(self.run_id, {
-                        "type": "frame",
-                        "ts": int(time.time() * 1000),
-                        "img_b64": "data:image/jpeg;base64," + b64
-                    })
+                    digest = hashlib.blake2b(buf, digest_size=16).digest()
+                    if digest != last_digest:
+                        last_digest = digest
+                        await self._emit_frame(buf)
+            except Exception as e:
+                # 大概率是页面跳转/关闭期间的瞬时错误；降到 DEBUG 即可
+                self._add_log(f"固定间隔截图推送失败: {e}", "DEBUG")
+            await self._sleep_interval()
+
+    async def _stream_loop(self, page):
+        """推送页面画面。失败时记录日志但不打断主流程。"""
+        try:
+            if self.browser_type == 'chromium' and settings.UI_STREAM_MODE == 'auto':
+                try:
+                    await self._screencast_loop(page)
+                    return
                 except Exception as e:
-                    # 大概率是页面跳转/关闭期间的瞬时错误；降到 DEBUG 即可
-                    self._add_log(f"固定间隔截图推送失败: {e}", "DEBUG")
-                # 间隔
-                await asyncio.sleep(max(0.05, self.stream_interval))
+                    self._add_log(f"屏幕录制推流不可用，改为定时截图: {e}", "DEBUG")
+            await self._poll_loop(page)
         finally:
             self._add_log("固定间隔截图推送任务已结束", "DEBUG")
 
@@ -125,6 +256,10 @@ class UIExecutionEngine:
 
     async def get_global_variables(self):
         """获取所有全局变量"""
+        if self.plan is not None:
+            self.context.update(self.plan.environment.global_vars)
+            self._add_log(f"已加载全局变量: {list(self.context.keys())}", "INFO")
+            return
         try:
             # 使用sync_to_async装饰一个同步函数来获取变量
             @sync_to_async
@@ -140,6 +275,9 @@ class UIExecutionEngine:
 
     async def get_python_functions(self):
         """获取 Python 函数代码"""
+        if self.plan is not None:
+            self._add_log("已加载 Python 函数代码", "INFO")
+            return self.plan.environment.python_code
         try:
             @sync_to_async
             def get_code():
@@ -178,14 +316,13 @@ class UIExecutionEngine:
                     args = [arg.strip() for arg in args_str.split(',') if arg.strip()]
                     try:
                         # 执行函数
-                        namespace = {}
-                        exec(self.python_code, namespace)
+                        namespace = get_function_namespace(self.python_code)
                         func = namespace.get(func_name)
                         if not func:
                             self._add_log(f"函数 {func_name} 未找到", "ERROR")
                             return match.group(0)
                         result = str(func(*args))
-                        self._add_log(f"函数替换: ${{{func_name}({','.join(args)})}} -> {result}", "INFO")
+                        self._add_log(f"函数替换: ${{{func_name}({','.join(args)})}} -> {result}", "DEBUG")
                         return result
                     except Exception as e:
                         self._add_log(f"执行函数 {func_name} 失败: {str(e)}", "ERROR")
@@ -194,12 +331,12 @@ class UIExecutionEngine:
                     var_name = match.group(3)
                     result = str(context.get(var_name, match.group(0)))
                     if result != match.group(0):  # 只记录成功的变量替换
-                        self._add_log(f"变量替换: ${{{var_name}}} -> {result}", "INFO")
+                        self._add_log(f"变量替换: ${{{var_name}}} -> {result}", "DEBUG")
                     return result
 
             result = pattern.sub(replacement, obj)
             if result != original_value:
-                self._add_log(f"完整替换: {original_value} -> {result}", "INFO")
+                self._add_log(f"完整替换: {original_value} -> {result}", "DEBUG")
             return result
         elif isinstance(obj, dict):
             return {k: await self.fill_vars(v, context) for k, v in obj.items()}
@@ -209,13 +346,13 @@ class UIExecutionEngine:
 
     async def extract_json_value(self, resp_json: Dict, jsonpath_value: str) -> Any:
         """使用jsonpath从JSON响应中提取值"""
-        value = jsonpath.jsonpath(resp_json, jsonpath_value)
+        value = compile_jsonpath(jsonpath_value).find(resp_json)
         if value:
             return value[0]
         return ''
 
-    async def retry_operation(self, func, retries=3, delay=2, *args, **kwargs):
-        """重试操作函数"""
+    async def retry_operation(self, func, retries=3, delay=0.5, *args, **kwargs):
+        """重试操作函数：指数退避（delay、2*delay、4*delay...，最多 UI_RETRY_MAX_DELAY 秒）并加随机抖动"""
         for attempt in range(retries):
             try:
                 self._add_log(f"准备开始第[{attempt + 1}]次执行操作", "INFO")
@@ -223,43 +360,103 @@ class UIExecutionEngine:
             except Exception as e:
                 self._add_log(f"第[{attempt + 1}]次执行操作失败，失败原因: {str(e)}", "WARNING")
                 if attempt < retries - 1:
-                    await asyncio.sleep(delay)
+                    backoff = min(delay * (2 ** attempt), settings.UI_RETRY_MAX_DELAY)
+                    await asyncio.sleep(backoff * random.uniform(0.5, 1.0))
                 else:
                     self._add_log(f"操作重试{retries}次后仍失败: {str(e)}", "ERROR")
                     raise e
 
+    @staticmethod
+    def _is_sql_pre_api(pre_api: Dict) -> bool:
+        return (pre_api.get('type') or pre_api.get('name') or '').lower() == 'sql'
+
+    def build_pre_api_graph(self, pre_apis: List[Dict]) -> DependencyGraph:
+        """
+        根据变量读写关系构建前置步骤的依赖图：
+        读取 ${var} 的步骤依赖提取该变量的步骤，互不依赖的步骤可以并发执行；
+        未配置 extracts 的 SQL 步骤会把第一行所有列写入上下文，视为写入所有变量（与前后步骤都保持顺序）
+        """
+        reads = [
+            collect_placeholders(pre_api.get('sql') if self._is_sql_pre_api(pre_api) else pre_api.get('request'))
+            for pre_api in pre_apis
+        ]
+        all_reads = set().union(*reads)
+        nodes = []
+        for pre_api, names in zip(pre_apis, reads):
+            extracts = pre_api.get('extracts') or []
+            if self._is_sql_pre_api(pre_api) and not extracts:
+                writes = all_reads
+            else:
+                writes = {
+                    extract if isinstance(extract, str) else extract.get('varName')
+                    for extract in extracts
+                } - {None}
+            nodes.append((names, writes))
+        return DependencyGraph(nodes)
+
+    async def execute_pre_api(self, pre_api: Dict, client: httpx.AsyncClient = None) -> Dict:
+        """执行单个前置API/SQL，失败时记录日志并返回失败结果（不中断其它前置步骤）"""
+        try:
+            if self._is_sql_pre_api(pre_api):
+                sql = pre_api.get('sql') or ''
+                db_env_id = pre_api.get('dbEnv') or pre_api.get('db_env') or pre_api.get('db') or pre_api.get('dbEnvId')
+                extracts = pre_api.get('extracts')
+                assigned, sql_result = await self.execute_sql_and_extract(sql, db_env_id, extracts)
+                result = {"request": f"SQL", "response": sql_result, "variables": self.context.copy()}
+                self._add_log("前置SQL执行成功", "INFO")
+            else:
+                result = await self.call_pre_api(pre_api, self.context, client)
+            self._add_log(f"前置API '{pre_api.get('name', '未命名')}' 执行成功", "INFO")
+            return result
+        except Exception as e:
+            self._add_log(f"前置API '{pre_api.get('name', '未命名')}' 执行失败: {str(e)}", "ERROR")
+            result = {
+                "request": f"API: {pre_api.get('name', '未命名')}",
+                "response": f"执行失败: {str(e)}",
+                "variables": self.context
+            }
+            if isinstance(e, httpx.HTTPStatusError):
+                # 401/403 用于判断登录状态是否失效
+                result["status_code"] = e.response.status_code
+            return result
+
     async def execute_pre_apis(self, pre_apis: List[Dict]) -> List[Dict]:
-        """执行前置API/SQL"""
+        """
+        执行前置API/SQL
+        按变量依赖分阶段执行：同一阶段的步骤互不依赖，并发执行（最多 UI_PRE_API_CONCURRENCY 个），
+        所有 API 请求共用一个带连接池的 AsyncClient；结果按原有顺序返回
+        """
         self._add_log("开始执行前置条件", "INFO")
-        results = []
-
-        for pre_api in pre_apis:
-            try:
-                kind = (pre_api.get('type') or pre_api.get('name') or '').lower()
-                if kind == 'sql':
-                    sql = pre_api.get('sql') or ''
-                    db_env_id = pre_api.get('dbEnv') or pre_api.get('db_env') or pre_api.get('db') or pre_api.get('dbEnvId')
-                    extracts = pre_api.get('extracts')
-                    assigned, sql_result = await self.execute_sql_and_extract(sql, db_env_id, extracts)
-                    results.append({"request": f"SQL", "response": sql_result, "variables": self.context.copy()})
-                    self._add_log("前置SQL执行成功", "INFO")
-                else:
-                    result = await self.call_pre_api(pre_api, self.context)
-                    results.append(result)
-                self._add_log(f"前置API '{pre_api.get('name', '未命名')}' 执行成功", "INFO")
-            except Exception as e:
-                self._add_log(f"前置API '{pre_api.get('name', '未命名')}' 执行失败: {str(e)}", "ERROR")
-                results.append({
-                    "request": f"API: {pre_api.get('name', '未命名')}",
-                    "response": f"执行失败: {str(e)}",
-                    "variables": self.context
-                })
+        if not pre_apis:
+            return []
+        results = [None] * len(pre_apis)
+        graph = self.build_pre_api_graph(pre_apis)
+        semaphore = asyncio.Semaphore(max(1, settings.UI_PRE_API_CONCURRENCY))
+
+        async def run_one(idx, client):
+            async with semaphore:
+                results[idx] = await self.execute_pre_api(pre_apis[idx], client)
+
+        async with create_async_client() as client:
+            stage = 0
+            while not graph.finished:
+                ready = graph.ready()
+                stage += 1
+                if len(ready) > 1:
+                    self._add_log(f"前置条件第 {stage} 阶段并发执行 {len(ready)} 个步骤", "INFO")
+                await asyncio.gather(*(run_one(idx, client) for idx in ready))
+                for idx in ready:
+                    graph.mark_done(idx)
 
         self._add_log("前置条件执行完成", "INFO")
         return results
 
-    async def call_pre_api(self, api_cfg: Dict, context: Dict) -> Dict:
-        """调用单个前置API"""
+    async def call_pre_api(self, api_cfg: Dict, context: Dict, client: httpx.AsyncClient = None) -> Dict:
+        """调用单个前置API（client 为空时单独创建连接）"""
+        if client is None:
+            async with create_async_client() as client:
+                return await self.call_pre_api(api_cfg, context, client)
+
         # 填充变量到API配置
         req_cfg = await self.fill_vars(api_cfg['request'], context)
         method = req_cfg.get('method', 'GET').upper()
@@ -272,80 +469,46 @@ class UIExecutionEngine:
         # 记录请求信息
         self._add_log(f"执行API请求: {method} {url}", "INFO")
 
-        async with httpx.AsyncClient(timeout=httpx.Timeout(60.0)) as client:
-            try:
-                # 重试请求
-                resp = await self.retry_operation(
-                    client.request, retries=3, delay=2,
-                    method=method, url=url, headers=headers, data=data, json=json_data
-                )
-                resp.raise_for_status()
-
-                # 处理响应
-                api_response = resp.text
+        try:
+            # 重试请求
+            resp = await self.retry_operation(
+                client.request, retries=3, delay=0.5,
+                method=method, url=url, headers=headers, data=data, json=json_data,
+                # 共享连接池的 client 默认跟随重定向，前置API保持原有行为
+                follow_redirects=False
+            )
+            resp.raise_for_status()
+
+            # 处理响应
+            api_response = resp.text
+            self._add_log(
+                f"API响应: {resp.status_code} - {api_response[:100]}{'...' if len(api_response) > 100 else ''}",
+                "INFO")
+
+            # 提取变量
+            resp_json = resp.json()
+            for extract in api_cfg.get('extracts', []):
+                value = await self.extract_json_value(resp_json, extract['jsonpath'])
+                context[extract['varName']] = value
                 self._add_log(
-                    f"API响应: {resp.status_code} - {api_response[:100]}{'...' if len(api_response) > 100 else ''}",
+                    f"提取变量: {extract['varName']} = {str(value)[:50]}{'...' if len(str(value)) > 50 else ''}",
                     "INFO")
 
-                # 提取变量
-                resp_json = resp.json()
-                for extract in api_cfg.get('extracts', []):
-                    value = await self.extract_json_value(resp_json, extract['jsonpath'])
-                    context[extract['varName']] = value
-                    self._add_log(
-                        f"提取变量: {extract['varName']} = {str(value)[:50]}{'...' if len(str(value)) > 50 else ''}",
-                        "INFO")
-
-                return {
-                    "request": f"{method} {url}",
-                    "response": api_response,
-                    "variables": context.copy()
-                }
-
-            except httpx.ReadTimeout as e:
-                self._add_log(f"API请求超时: {str(e)}", "ERROR")
-                raise
-            except Exception as e:
-                self._add_log(f"API请求异常: {str(e)}", "ERROR")
-                raise
-
-    async def setup_browser_context(self, playwright):
-        """设置浏览器上下文"""
-        self._add_log("启动浏览器", "INFO")
-
-        # 为不同浏览器类型设置专门的启动参数
-        if self.browser_type == 'chromium':
-            browser_args = [
-                "--height=1080",
-                "--width=1920",
-                "--no-sandbox",
-                "--disable-setuid-sandbox",
-                "--disable-dev-shm-usage",
-                "--disable-gpu",
-            ]
-            if self.is_headless:
-                browser_args.append("--headless=new")
-        elif self.browser_type == 'firefox':
-            browser_args = [
-                "--height=1080",
-                "--width=1920",
-                "--no-sandbox",
-                "--disable-dev-shm-usage",
-            ]
-        elif self.browser_type == 'webkit':
-            # WebKit专用参数，解决Docker环境中的兼容性问题
-            browser_args = [
-                "--no-startup-window"
-            ]
-        else:
-            browser_args = []
-            self._add_log(f"未知浏览器类型: {self.browser_type}", "WARNING")
+            return {
+                "request": f"{method} {url}",
+                "response": api_response,
+                "variables": context.copy()
+            }
 
-        browser = await getattr(playwright, self.browser_type).launch(
-            headless=self.is_headless,
-            args=browser_args
-        )
+        except httpx.ReadTimeout as e:
+            self._add_log(f"API请求超时: {str(e)}", "ERROR")
+            raise
+        except Exception as e:
+            self._add_log(f"API请求异常: {str(e)}", "ERROR")
+            raise
 
+    def get_context_options(self) -> Dict:
+        """浏览器上下文参数（浏览器由浏览器池提供，每个用例只创建独立的上下文）"""
         context_options = {
             "viewport": {"width": 1920, "height": 1080}
         }
@@ -369,9 +532,62 @@ class UIExecutionEngine:
         else:
             self._add_log("创建新的浏览器上下文（无存储状态）", "INFO")
 
-        browser_context = await browser.new_context(**context_options)
-        self._add_log("浏览器环境初始化完成", "INFO")
-        return browser, browser_context
+        if self.capture:
+            # HAR 在上下文关闭时写入，.zip 格式会把响应内容一并压缩打包
+            self._capture_paths['har'] = os.path.join(tempfile.gettempdir(), f"ui_har_{uuid.uuid4().hex}.zip")
+            context_options["record_har_path"] = self._capture_paths['har']
+        return context_options
+
+    async def start_tracing(self, browser_context):
+        """开启失败现场采集时记录 Playwright trace"""
+        if not self.capture:
+            return
+        try:
+            await browser_context.tracing.start(screenshots=True, snapshots=True)
+        except Exception as e:
+            self._add_log(f"开启 trace 记录失败: {e}", "WARNING")
+
+    async def stop_tracing(self, browser_context):
+        """停止 trace 记录：用例失败时导出到临时文件，成功时直接丢弃"""
+        if not self.capture:
+            return
+        try:
+            if self.case_status == 'passed':
+                await browser_context.tracing.stop()
+            else:
+                self._capture_paths['trace'] = os.path.join(tempfile.gettempdir(), f"ui_trace_{uuid.uuid4().hex}.zip")
+                await browser_context.tracing.stop(path=self._capture_paths['trace'])
+        except Exception as e:
+            self._add_log(f"停止 trace 记录失败: {e}", "WARNING")
+
+    async def apply_interception(self, browser_context):
+        """按项目的拦截配置屏蔽无关资源、固定返回接口、使用本地缓存的静态资源"""
+        if self.interceptor is None or not self.interceptor.active:
+            return
+        await self.interceptor.apply(browser_context)
+        self._add_log("已启用请求拦截配置", "INFO")
+
+    def log_interception_stats(self):
+        if self.interceptor is not None and self.interceptor.active:
+            stats = self.interceptor.stats
+            self._add_log(
+                f"请求拦截统计: 屏蔽 {stats['blocked']}，固定返回 {stats['stubbed']}，"
+                f"静态资源缓存命中 {stats['cache_hit']} / 未命中 {stats['cache_miss']}", "INFO")
+
+    def collect_artifacts(self):
+        """浏览器上下文关闭后处理采集文件：失败时提交后台上传并记录存储路径，成功时删除"""
+        paths, self._capture_paths = self._capture_paths, {}
+        for kind, path in paths.items():
+            if not os.path.exists(path):
+                continue
+            if self.case_status == 'passed':
+                os.unlink(path)
+                continue
+            name = submit_artifact(path, kind)
+            if name:
+                self.artifacts[kind] = name
+                self._add_log(f"已保存失败现场 {kind}: {name}", "INFO")
+        return self.artifacts
 
     async def save_storage_state(self, browser_context, path):
         """保存浏览器状态到文件"""
@@ -412,10 +628,14 @@ class UIExecutionEngine:
             return False
 
     async def get_element_selector(self, element_id: int) -> str:
-        """Get element selector string from database"""
+        """Get element selector string (run plan / preloaded element cache first, then database)"""
+        if self.plan is not None and element_id in self.plan.elements:
+            return self.plan.elements[element_id]
+        selector = element_cache.get(element_id)
+        if selector is not None:
+            return selector
         try:
-            element = await sync_to_async(UiElement.objects.values('locator_type', 'locator_value').get)(id=element_id)
-            return f"{element['locator_type']}={element['locator_value']}"
+            return await sync_to_async(element_cache.load)(element_id)
         except UiElement.DoesNotExist:
             self._add_log(f"Element ID {element_id} not found in database", "ERROR")
             raise ValueError(f"Element ID {element_id} not found")
@@ -430,9 +650,23 @@ class UIExecutionEngine:
         else:
             return page.locator(selector)
 
+    async def capture_failure_screenshot(self, page, label: str):
+        """失败截图：在内存中截图后交给后台线程上传，不等待上传完成"""
+        try:
+            image = await page.screenshot(type='png', timeout=60000)
+        except Exception as e:
+            self._add_log(f"失败截图获取失败: {e}", "WARNING")
+            return
+        self.screenshot_path = submit_screenshot(image, label)
+        if self.screenshot_path:
+            self._add_log(f"已保存失败截图: {self.screenshot_path}", "INFO")
+
     async def execute_step(self, page, step: Dict, step_index: int) -> Dict:
         """执行单个测试步骤"""
         self._add_log(f"执行步骤 {step_index + 1}: {step.get('description', step.get('action', '未知操作'))}", "INFO")
+        # 条件等待检查的是上一个步骤（触发操作）开始之后的响应和 URL 变化
+        since, previous_url = self._last_step_started_at, self._last_step_url
+        self._last_step_started_at, self._last_step_url = time.monotonic(), page.url
 
         try:
             # 填充变量到步骤配置
@@ -449,12 +683,45 @@ class UIExecutionEngine:
             # Get element handle if selector exists
             element = await self.get_element_handle(page, selector) if selector else None
 
+            # 条件等待的超时时间（秒），默认与元素等待超时一致
+            wait_timeout = float(step_filled.get("timeout") or self.timeout / 1000)
+
             if action == "sleep":
                 seconds = float(step_filled["seconds"])
                 self._add_log(f"等待 {seconds} 秒", "INFO")
+                started = time.monotonic()
                 await asyncio.sleep(seconds)
+                self.record_sleep(step_index, step_filled, seconds, started)
                 return {"step": step_filled, "status": "pass", "log": f"Slept for {seconds} seconds"}
 
+            elif action == "wait_network_idle":
+                self._add_log(f"等待网络空闲，最多 {wait_timeout} 秒", "INFO")
+                await page.wait_for_load_state("networkidle", timeout=wait_timeout * 1000)
+                return {"step": step_filled, "status": "pass", "log": "Network is idle"}
+
+            elif action == "wait_response":
+                url_pattern, expect_status = step_filled.get("url"), step_filled.get("status")
+                self._add_log(f"等待响应: url={url_pattern}, status={expect_status}，最多 {wait_timeout} 秒", "INFO")
+                url, status = await wait_for_response(
+                    page, self.page_activity,
+                    response_matcher(url_pattern, expect_status, regex=bool(step_filled.get("regex"))),
+                    since, wait_timeout
+                )
+                return {"step": step_filled, "status": "pass", "log": f"Received response: {status} {url}"}
+
+            elif action == "wait_element_stable":
+                if element is None:
+                    raise ValueError("wait_element_stable 步骤需要指定元素（element_id）")
+                self._add_log(f"等待元素稳定: {selector}，最多 {wait_timeout} 秒", "INFO")
+                await wait_element_stable(element, wait_timeout)
+                return {"step": step_filled, "status": "pass", "log": f"Element '{selector}' is stable"}
+
+            elif action == "wait_url":
+                url_pattern = step_filled.get("url")
+                self._add_log(f"等待页面地址{'匹配: ' + url_pattern if url_pattern else '变化'}，最多 {wait_timeout} 秒", "INFO")
+                url = await wait_url(page, wait_timeout, url_pattern, previous_url, regex=bool(step_filled.get("regex")))
+                return {"step": step_filled, "status": "pass", "log": f"Page URL: {url}"}
+
             elif action == "wait_element":
                 # 显示等待
                 self._add_log(f"等待元素可见: {selector}", "INFO")
@@ -508,7 +775,10 @@ class UIExecutionEngine:
                 return {"step": step_filled, "status": "pass", "log": f"Clicked on element: {selector}"}
 
             elif action == "assert":
-                return await self.execute_assertion(page, step_filled)
+                result = await self.execute_assertion(page, step_filled)
+                if result['status'] == 'fail':
+                    self.record_failure(page, step_index, 'assertion', result.get('error'))
+                return result
 
             elif action == "sql":
                 sql = step_filled.get("sql") or ""
@@ -525,9 +795,8 @@ class UIExecutionEngine:
             self._add_log(f"步骤 {step_index + 1} 执行失败: {str(e)}", "ERROR")
 
             self.case_status = 'failed'
-            self.screenshot_path = f"screenshots/step_{step_index + 1}_fail_{step.get('action', 'unknown')}_{int(time.time())}.png"
-            await page.screenshot(path=os.path.join(settings.MEDIA_ROOT, self.screenshot_path), timeout=60000)
-            self._add_log(f"已保存失败截图: {self.screenshot_path}", "INFO")
+            self.record_failure(page, step_index, type(e).__name__, e, retryable=is_environment_error(e))
+            await self.capture_failure_screenshot(page, f"step_{step_index + 1}_fail_{step.get('action', 'unknown')}")
 
             return {
                 'step': step,
@@ -613,9 +882,7 @@ class UIExecutionEngine:
             self._add_log(f"Assertion failed: {str(e)}", "ERROR")
 
             self.case_status = 'failed'
-            self.screenshot_path = f"screenshots/assert_fail_{assert_type}_{int(time.time())}.png"
-            await page.screenshot(path=os.path.join(settings.MEDIA_ROOT, self.screenshot_path), timeout=60000)
-            self._add_log(f"Saved assertion failure screenshot: {self.screenshot_path}", "INFO")
+            await self.capture_failure_screenshot(page, f"assert_fail_{assert_type}")
 
             return {
                 "step": step_filled,
@@ -624,12 +891,82 @@ class UIExecutionEngine:
                 "screenshot": self.screenshot_path,
             }
 
-    async def execute_test_steps(self, page, steps: List[Dict]) -> List[Dict]:
-        """执行所有测试步骤"""
+    def record_failure(self, page, step_index: int, error_type: str, message, retryable=False):
+        """记录失败步骤的序号、失败时的页面地址和错误类型，retryable 表示环境类错误（可以从检查点恢复重试）"""
+        self.failure = {
+            'step': step_index + 1,
+            'url': page.url,
+            'error_type': error_type,
+            'message': str(message)[:500],
+            'retryable': retryable,
+        }
+
+    def record_sleep(self, step_index: int, step: Dict, seconds: float, started: float):
+        """记录固定等待中页面无活动（浪费）的时长，用于把 sleep 改为条件等待"""
+        ended = time.monotonic()
+        wasted = self.page_activity.idle_time(started, ended) if self.page_activity else seconds
+        last_response = self.page_activity.responses[-1] if self.page_activity and self.page_activity.responses else None
+        if last_response and last_response[0] >= started:
+            suggestion = f"改为 wait_response（url 包含 {last_response[1]}）或 wait_network_idle"
+        else:
+            suggestion = "等待期间页面无网络活动，可删除或改为 wait_element / wait_element_stable"
+        self.sleep_report.append({
+            'step': step_index + 1,
+            'description': step.get('description', ''),
+            'seconds': seconds,
+            'wasted': round(wasted, 3),
+            'suggestion': suggestion,
+        })
+
+    def log_sleep_report(self):
+        """输出固定等待分析：每个 sleep 步骤的等待时长和其中页面无活动的时长"""
+        if not self.sleep_report:
+            return
+        total = sum(item['seconds'] for item in self.sleep_report)
+        wasted = sum(item['wasted'] for item in self.sleep_report)
+        self._add_log(f"固定等待分析: {len(self.sleep_report)} 个 sleep 步骤共 {total:.1f} 秒，其中页面无活动约 {wasted:.1f} 秒", "WARNING")
+        for item in self.sleep_report:
+            self._add_log(
+                f"  步骤 {item['step']}: sleep {item['seconds']} 秒，浪费约 {item['wasted']} 秒，建议{item['suggestion']}",
+                "WARNING")
+
+    def _is_checkpoint(self, step: Dict, step_number: int) -> bool:
+        if step.get('checkpoint'):
+            return True
+        return self.checkpoint_every > 0 and step_number % self.checkpoint_every == 0
+
+    async def make_checkpoint(self, browser_context, page, step_index: int) -> Dict:
+        """保存检查点：之后从 steps[step_index] 继续执行"""
+        try:
+            variables = copy.deepcopy(self.context)
+        except Exception:
+            variables = dict(self.context)
+        checkpoint = {
+            'step_index': step_index,
+            'url': page.url,
+            'storage_state': await browser_context.storage_state(),
+            'context': variables,
+        }
+        self._add_log(f"已保存检查点: 步骤 {step_index} 之后, url={page.url}", "INFO")
+        return checkpoint
+
+    async def restore_checkpoint(self, page, checkpoint: Dict):
+        """恢复检查点：变量还原为检查点时的值并打开检查点时的页面（存储状态在创建上下文时恢复）"""
+        self.context = copy.deepcopy(checkpoint['context'])
+        if checkpoint['url'] and checkpoint['url'] != 'about:blank':
+            await page.goto(checkpoint['url'])
+            await page.wait_for_load_state("domcontentloaded")
+        self._add_log(f"已从检查点恢复: 步骤 {checkpoint['step_index']} 之后, url={checkpoint['url']}", "INFO")
+
+    async def execute_test_steps(self, page, steps: List[Dict], start: int = 0, browser_context=None) -> List[Dict]:
+        """执行测试步骤 steps[start:]，传入 browser_context 时在检查点步骤之后保存检查点"""
         self._add_log("开始执行测试步骤", "INFO")
         results = []
+        self.page_activity = PageActivity(page)
+        self._last_step_started_at, self._last_step_url = time.monotonic(), page.url
 
-        for idx, step in enumerate(steps):
+        for idx in range(start, len(steps)):
+            step = steps[idx]
             result = await self.execute_step(page, step, idx)
             results.append(result)
 
@@ -638,11 +975,120 @@ class UIExecutionEngine:
                 self._add_log(f"步骤 {idx + 1} 执行失败，停止后续步骤执行", "ERROR")
                 break
 
+            if browser_context is not None and idx + 1 < len(steps) and self._is_checkpoint(step, idx + 1):
+                try:
+                    self.last_checkpoint = await self.make_checkpoint(browser_context, page, idx + 1)
+                except Exception as e:
+                    self._add_log(f"保存检查点失败: {e}", "WARNING")
+
         self._add_log("测试步骤执行完成", "INFO")
         return results
 
+    async def run_steps(self, steps: List[Dict], save_storage_state: bool, start: int = 0, checkpoint: Dict = None):
+        """从浏览器池分配独立的浏览器上下文执行 steps[start:]，checkpoint 不为空时先恢复检查点"""
+        context_options = self.get_context_options()
+        if checkpoint is not None:
+            context_options['storage_state'] = checkpoint['storage_state']
+        self._add_log(f"获取浏览器上下文: {self.browser_type}", "INFO")
+        async with get_browser_pool().new_context(
+                self.browser_type, self.is_headless, **context_options
+        ) as browser_context:
+            self._add_log("浏览器环境初始化完成", "INFO")
+            await self.start_tracing(browser_context)
+            await self.apply_interception(browser_context)
+            try:
+                page = await browser_context.new_page()
+                if checkpoint is not None:
+                    await self.restore_checkpoint(page, checkpoint)
+
+                # ★ 开始固定间隔推送
+                await self.start_stream(page)
+
+                results = await self.execute_test_steps(page, steps, start, browser_context)
+
+                # 如果需要保存浏览器状态
+                if save_storage_state and self.storage_state_path:
+                    await self.save_storage_state(browser_context, self.storage_state_path)
+
+                # 上下文关闭前停止推送
+                await self.stop_stream()
+            except Exception:
+                self.case_status = 'error'
+                raise
+            finally:
+                await self.stop_tracing(browser_context)
+        self.collect_artifacts()
+        return results
+
+    def resume_skip_reason(self, steps: List[Dict]):
+        """
+        判断失败后能否从最近的检查点恢复重试，可以时返回 None，否则返回原因：
+        只有超时、导航失败、页面关闭等环境类错误才重试；断言失败、配置错误重试后结果不变，
+        检查点之后已经执行过的 SQL 步骤重复执行可能产生副作用，也不重试
+        """
+        if self.last_checkpoint is None:
+            return "没有可用的检查点"
+        if not self.failure or not self.failure.get('retryable'):
+            error_type = self.failure.get('error_type') if self.failure else None
+            return f"失败原因不是环境类错误（{error_type or '未知'}）"
+        replayed = steps[self.last_checkpoint['step_index']:self.failure['step'] - 1]
+        if any(isinstance(step, dict) and step.get('action') == 'sql' for step in replayed):
+            return "检查点之后已执行过 SQL 步骤，重复执行可能产生副作用"
+        return None
+
+    async def run_steps_with_checkpoints(self, steps: List[Dict], save_storage_state: bool) -> List[Dict]:
+        """
+        执行测试步骤，步骤因环境类错误（超时、导航失败、页面关闭等）失败且已有检查点时，
+        在新的浏览器上下文中从最近的检查点恢复并重试，不再重新执行检查点之前的步骤和登录用例；
+        每一段执行及重试原因记录到 self.segments
+        """
+        results = []
+        start, checkpoint = 0, None
+        for attempt in range(1, settings.UI_CHECKPOINT_RETRIES + 2):
+            segment_results = await self.run_steps(steps, save_storage_state, start, checkpoint)
+            results = results[:start] + segment_results
+            segment = {
+                'attempt': attempt,
+                'resumed_from': checkpoint['step_index'] if checkpoint else None,
+                'start_step': start + 1,
+                'end_step': start + len(segment_results),
+                'status': self.case_status,
+            }
+            self.segments.append(segment)
+            if self.case_status == 'passed':
+                break
+            segment['failure'] = self.failure
+            skip_reason = self.resume_skip_reason(steps)
+            if skip_reason is None and attempt > settings.UI_CHECKPOINT_RETRIES:
+                skip_reason = f"已达到最大重试次数 {settings.UI_CHECKPOINT_RETRIES}"
+            if skip_reason is not None:
+                if self.last_checkpoint is not None:
+                    segment['resume_skipped'] = skip_reason
+                    self._add_log(f"不从检查点恢复重试: {skip_reason}", "INFO")
+                break
+
+            # 失败段的截图和现场文件保留在段记录中，重试成功时用例结果不再带失败截图
+            segment['screenshot'] = self.screenshot_path
+            segment['artifacts'] = self.artifacts
+            checkpoint = self.last_checkpoint
+            start = checkpoint['step_index']
+            segment['retry_reason'] = (f"步骤 {self.failure['step']} 发生环境类错误 "
+                                       f"{self.failure['error_type']}: {self.failure['message'][:200]}")
+            self._add_log(f"{segment['retry_reason']}，从检查点（步骤 {start} 之后）恢复重试，第 {attempt} 次重试",
+                          "WARNING")
+            self.case_status = 'passed'
+            self.screenshot_path = ''
+            self.artifacts = {}
+            self.failure = None
+
+        self.log_sleep_report()
+        return results
+
     async def get_db_info(self, db_env_id: int) -> Dict:
         """获取数据库配置信息"""
+        if self.plan is not None and str(db_env_id).isdigit() and int(db_env_id) in self.plan.environment.db_configs:
+            return self.plan.environment.db_configs[int(db_env_id)]
+        # 环境 id 由变量指定（执行时才能确定）或未使用执行计划时查询数据库
         return await sync_to_async(
             ProjectEnvs.objects.select_related('db_config')
             .filter(id=db_env_id)
@@ -679,7 +1125,8 @@ class UIExecutionEngine:
         self._add_log(f"数据库配置: {db_config['name']}@{db_config['host']}:{db_config['port']}", "INFO")
         self._add_log(f"执行SQL: {sql}", "INFO")
 
-        sql_result = execute_sql.execute_sql_dynamic(db_config, sql)
+        # 在线程池中执行，避免数据库 I/O 阻塞事件循环（截图推流等协程）
+        sql_result = await execute_sql.execute_sql_async(db_config, sql)
         # 失败场景：工具返回 {'status':'error', 'message':...}
         if isinstance(sql_result, dict) and sql_result.get('status') == 'error':
             raise RuntimeError(f"SQL执行失败: {sql_result.get('message')}")
@@ -778,22 +1225,17 @@ class UIExecutionEngine:
 
             self._add_log("初始化全局变量完成。", "INFO")
 
+            # 一次查询预加载步骤引用的所有元素定位器（执行计划中已包含时跳过）
+            if self.plan is None:
+                loaded = await sync_to_async(element_cache.preload)(referenced_element_ids(case_json.get('steps', [])))
+                self._add_log(f"预加载元素定位器完成，查询元素数: {loaded}", "INFO")
+
             # 1. 执行前置API
             self.pre_results = await self.execute_pre_apis(case_json.get('pre_apis', []))
 
-            # 2. 初始化浏览器并执行测试步骤
-            async with async_playwright() as p:
-                browser, browser_context = await self.setup_browser_context(p)
-                page = await browser_context.new_page()
-
-                # ★ 开始固定间隔推送
-                await self.start_stream(page)
-
-                self.main_results = await self.execute_test_steps(page, case_json.get('steps', []))
-
-                # 如果需要保存浏览器状态
-                if save_storage_state and self.storage_state_path:
-                    await self.save_storage_state(browser_context, self.storage_state_path)
+            # 2. 从浏览器池分配独立的浏览器上下文并执行测试步骤（失败时从检查点恢复重试）
+            self.main_results = await self.run_steps_with_checkpoints(case_json.get('steps', []), save_storage_state)
+            self.log_interception_stats()
 
             # 3. 执行后置步骤
             self.post_results = await self.execute_post_steps(case_json.get('post_steps', []))
@@ -802,44 +1244,58 @@ class UIExecutionEngine:
             all_result = {
                 'pre_apis_result': self.pre_results,
                 'steps_result': self.main_results,
-                'post_steps_result': self.post_results
+                'post_steps_result': self.post_results,
+                'artifacts': self.artifacts,
+                'sleep_report': self.sleep_report,
+                'segments': self.segments,
+                'failure': self.failure,
             }
 
             test_end_time = time.time()
             duration = test_end_time - self.test_start_time
             self._add_log(f"测试用例执行完成，状态: {self.case_status}, 耗时: {duration:.2f}秒", "INFO")
 
-            return self.case_status, all_result, self.screenshot_path, self.execution_log
+            return self.case_status, all_result, self.screenshot_path, self.log_buffer.to_jsonl()
 
         except Exception as e:
             self._add_log(f"测试用例执行异常: {str(e)}", "ERROR")
             self.case_status = 'error'
+            self.collect_artifacts()
 
             # 返回错误结果
             error_result = {
                 'pre_apis_result': self.pre_results,
                 'steps_result': self.main_results,
                 'post_steps_result': self.post_results,
+                'artifacts': self.artifacts,
+                'segments': self.segments,
+                'failure': self.failure,
                 'error': str(e),
             }
 
-            return self.case_status, error_result, self.screenshot_path, self.execution_log
+            return self.case_status, error_result, self.screenshot_path, self.log_buffer.to_jsonl()
         finally:
             # ★ 停止固定间隔推送
             await self.stop_stream()
             self._add_log("测试用例执行结束，资源已清理", "INFO")
-            await browser.close()
-            self._add_log("浏览器已关闭", "INFO")
 
 
-async def run_ui_case_tool(case_json, run_id=None, is_headless=True, browser_type='chromium', storage_state_path=None, save_storage_state=False):
-    """执行UI测试用例的工具函数"""
+async def run_ui_case_tool(case_json, run_id=None, is_headless=True, browser_type='chromium', storage_state_path=None, save_storage_state=False, capture=None,
+                           interception=None, plan=None):
+    """
+    执行UI测试用例的工具函数
+    浏览器来自进程内的浏览器池，需在浏览器池的事件循环中执行：
+        run_in_browser_pool(run_ui_case_tool(...))
+    """
     # 创建执行引擎实例
     engine = UIExecutionEngine(
         run_id=run_id,
         is_headless=is_headless,
         browser_type=browser_type,
         storage_state_path=storage_state_path,
+        capture=capture,
+        interception=interception,
+        plan=plan,
     )
 
     # 执行测试用例
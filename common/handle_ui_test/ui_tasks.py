@@ -8,20 +8,23 @@ import django
 django.setup()
 
 from common.handle_ui_test.ui_runner import run_ui_case_tool
-import asyncio
+from common.handle_ui_test.browser_pool import run_in_browser_pool
+from common.handle_ui_test.login_state import run_with_login_state, LoginCaseFailed
+from common.handle_ui_test.execution_log import offload_execution_log
+from common.handle_ui_test.interception import get_interception_rules
 from ui_case.models import UiExecution, UiTestCase
 import logging
 import time
-import tempfile
 from celery.utils.log import get_task_logger
 
 log = get_task_logger('worker')
 
 
 @shared_task
-def run_ui_test_case(execution_id: int, browser_type: str, is_headless, run_id: str = None):
+def run_ui_test_case(execution_id: int, browser_type: str, is_headless, run_id: str = None, capture=None):
     """
     执行UI测试用例的Celery任务
+    capture: 是否在失败时采集 trace/HAR，默认取 settings.UI_CAPTURE_ON_FAILURE
     """
     start_time = time.time()
     execution = UiExecution.objects.get(id=execution_id)
@@ -36,76 +39,54 @@ def run_ui_test_case(execution_id: int, browser_type: str, is_headless, run_id:
         }
 
         execution.save()
+        # 项目的请求拦截配置
+        interception = get_interception_rules(testcase.module.project_id)
         log.info('开始执行.............')
 
-        # 确定是否使用存储状态
-        storage_state_path = None
+        def run_case(storage_state_path=None):
+            return run_ui_case_tool(
+                case_json=case_json,
+                is_headless=is_headless,
+                browser_type=browser_type,
+                storage_state_path=storage_state_path,
+                run_id=run_id,
+                capture=capture,
+                interception=interception
+            )
 
-        # 检查是否有关联的登录用例
+        # 检查是否有关联的登录用例：登录状态优先取自缓存，缓存失效时才执行登录用例
         if testcase.login_case:
             log.info(f"用例关联了登录用例: {testcase.login_case.name}")
-
-            # 创建临时文件用于存储登录状态
-            temp_file = tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False)
-            storage_state_path = temp_file.name
-            temp_file.close()
-
-            # 执行登录用例
-            login_case_json = {
-                'pre_apis': testcase.login_case.pre_apis,
-                'steps': testcase.login_case.steps,
-                'post_steps': testcase.login_case.post_steps
-            }
-
-            login_status, login_logs, login_screenshot, login_execution_log = asyncio.run(
-                run_ui_case_tool(
-                    case_json=login_case_json,
-                    is_headless=is_headless,
-                    browser_type=browser_type,
-                    storage_state_path=storage_state_path,
-                    save_storage_state=True,
-                    run_id=run_id
+            try:
+                case_status, logs, screenshot, execution_log = run_in_browser_pool(
+                    run_with_login_state(
+                        testcase.login_case, run_case,
+                        is_headless=is_headless, browser_type=browser_type, run_id=run_id
+                    )
                 )
-            )
-            log.info(f"登录用例执行状态: {login_status}")
-            log.info(f"登录用例执行日志: {login_execution_log}")
-
-            if login_status != 'passed':
-                log.error(f"登录用例执行失败，状态: {login_status}")
+            except LoginCaseFailed as e:
+                log.error(f"登录用例执行失败，状态: {e.status}")
                 execution.status = 'failed'
-                execution.steps_log = f"依赖的登录用例执行失败: {login_status}"
+                execution.steps_log = str(e)
                 execution.duration = round(time.time() - start_time, 3)
                 execution.save()
                 return
-
-        # 执行当前用例
-        case_status, logs, screenshot, execution_log = asyncio.run(
-            run_ui_case_tool(
-                case_json=case_json,
-                is_headless=is_headless,
-                browser_type=browser_type,
-                storage_state_path=storage_state_path,
-                run_id=run_id
-            )
-        )
+        else:
+            # 执行当前用例
+            case_status, logs, screenshot, execution_log = run_in_browser_pool(run_case())
         log.info('执行完成，准备收集结果.............')
 
         execution.duration = round(time.time() - start_time, 3)
         execution.status = case_status
-        execution.steps_log = execution_log
+        # 日志较大时写入对象存储，steps_log 只保留引用和预览
+        execution.steps_log = offload_execution_log(execution_log, prefix=f'{execution.id}/')
         execution.screenshot = screenshot
+        execution.artifacts = logs.get('artifacts') or {}
+        execution.segments = logs.get('segments') or []
         log.info('收集结果完成，准备提交数据库save.............')
         execution.save()
         log.info('🚀 数据库save成功.............')
 
-        # 清理临时文件
-        if storage_state_path and os.path.exists(storage_state_path):
-            try:
-                os.unlink(storage_state_path)
-                log.info(f"已清理临时文件: {storage_state_path}")
-            except Exception as e:
-                log.error(f"清理临时文件失败: {str(e)}")
-
     except Exception as e:
         log.error(f'Ui Test Case Tasks Execute Error => {str(e)}')
         execution.status = 'failed'
@@ -114,11 +95,3 @@ def run_ui_test_case(execution_id: int, browser_type: str, is_headless, run_id:
         execution.save()
         log.error(
             f'保存执行结果为failed，准备结束任务............. status= {execution.status} execution id ={execution.id}')
-
-        # 清理临时文件（如果存在）
-        if 'storage_state_path' in locals() and storage_state_path and os.path.exists(storage_state_path):
-            try:
-                os.unlink(storage_state_path)
-                log.info(f"已清理临时文件: {storage_state_path}")
-            except Exception as e:
-                log.error(f"清理临时文件失败: {str(e)}")
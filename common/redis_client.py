@@ -0,0 +1,33 @@
+import asyncio
+import threading
+import weakref
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+
+_client = None
+_client_lock = threading.Lock()
+# 异步客户端的连接绑定创建它的事件循环，每个事件循环一个
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_redis() -> redis.Redis:
+    """
+    UI 执行相关的 Redis 客户端（登录状态缓存、推流订阅计数等），每个进程一个连接池
+    redis-py 的连接池会在 fork 后的子进程中自动重建
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = redis.Redis.from_url(settings.UI_REDIS_URL)
+    return _client
+
+
+def get_async_redis() -> aioredis.Redis:
+    """当前事件循环的异步 Redis 客户端（推流帧发布/订阅）"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = aioredis.Redis.from_url(settings.UI_REDIS_URL)
+    return client
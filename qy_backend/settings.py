@@ -328,6 +328,79 @@ logging.config.dictConfig(LOGGING)
 # chrome | firefox
 UI_TEST_BROWSER_TYPE = os.getenv('UI_TEST_BROWSER_TYPE', 'webkit')
 UI_TEST_STREAM_INTERVAL = os.getenv('UI_TEST_STREAM_INTERVAL', 1)
+# 执行画面推流：auto（Chromium 使用 CDP 屏幕录制，页面变化时才产生新帧）| poll（定时截图，画面无变化时不推送）
+UI_STREAM_MODE = os.getenv('UI_STREAM_MODE', 'auto')
+UI_STREAM_QUALITY = int(os.getenv('UI_STREAM_QUALITY', 60))
+UI_STREAM_MAX_WIDTH = int(os.getenv('UI_STREAM_MAX_WIDTH', 1280))
+UI_STREAM_MAX_HEIGHT = int(os.getenv('UI_STREAM_MAX_HEIGHT', 720))
+# 浏览器池：每个 worker 进程常驻浏览器，单个浏览器分配的上下文达到上限后重启（回收内存）
+UI_BROWSER_MAX_CONTEXTS = int(os.getenv('UI_BROWSER_MAX_CONTEXTS', 50))
+# 定时任务批量执行UI用例时，单个 worker 进程内同时执行的最大用例数
+UI_BATCH_CONCURRENCY = int(os.getenv('UI_BATCH_CONCURRENCY', 4))
+# 定时任务UI用例分块大小：项目用例按登录用例分块后分发到多个 worker 执行
+UI_BATCH_CHUNK_SIZE = int(os.getenv('UI_BATCH_CHUNK_SIZE', 10))
+# UI 用例前置API/SQL 同一依赖阶段内的最大并发数（设为 1 时按原有顺序逐个执行）
+UI_PRE_API_CONCURRENCY = int(os.getenv('UI_PRE_API_CONCURRENCY', 5))
+# UI 用例重试（前置API请求等）指数退避的最大等待时间（秒）
+UI_RETRY_MAX_DELAY = float(os.getenv('UI_RETRY_MAX_DELAY', 5))
+# UI 用例检查点：每执行 N 个步骤保存一次检查点（0 为只在步骤配置 checkpoint: true 时保存），
+# 步骤失败时从最近的检查点恢复重试的最大次数
+UI_CHECKPOINT_EVERY = int(os.getenv('UI_CHECKPOINT_EVERY', 0))
+UI_CHECKPOINT_RETRIES = int(os.getenv('UI_CHECKPOINT_RETRIES', 1))
+# 请求拦截配置中静态资源本地缓存的目录（默认系统临时目录下）和有效期（秒）
+UI_STATIC_CACHE_DIR = os.getenv('UI_STATIC_CACHE_DIR', '')
+UI_STATIC_CACHE_TTL = int(os.getenv('UI_STATIC_CACHE_TTL', 24 * 3600))
+# UI 执行使用的 Redis（登录状态缓存等），默认与 WebSocket 通道层共用
+UI_REDIS_URL = os.getenv('UI_REDIS_URL', os.getenv('UI_TEST_CHANNEL_REDIS_URL') or CELERY_BROKER_URL)
+# 登录用例存储状态缓存时间（秒）；cookie 距离过期不足 UI_LOGIN_STATE_EXPIRY_MARGIN 秒时视为失效，重新登录
+UI_LOGIN_STATE_TTL = int(os.getenv('UI_LOGIN_STATE_TTL', 3600))
+UI_LOGIN_STATE_EXPIRY_MARGIN = int(os.getenv('UI_LOGIN_STATE_EXPIRY_MARGIN', 60))
+# 失败截图后台上传队列长度（每个 worker 进程），积压超过上限时丢弃新截图
+UI_SCREENSHOT_QUEUE_SIZE = int(os.getenv('UI_SCREENSHOT_QUEUE_SIZE', 100))
+# 是否同时上传缩略图（列表页展示，需要安装 Pillow）及缩略图宽度
+UI_SCREENSHOT_THUMBNAIL = os.getenv('UI_SCREENSHOT_THUMBNAIL', 'false').lower() == 'true'
+UI_SCREENSHOT_THUMBNAIL_WIDTH = int(os.getenv('UI_SCREENSHOT_THUMBNAIL_WIDTH', 320))
+# 失败现场采集默认开关：记录 Playwright trace 和 HAR，只在用例失败时上传（执行接口可通过 capture 参数单独开启）
+UI_CAPTURE_ON_FAILURE = os.getenv('UI_CAPTURE_ON_FAILURE', 'false').lower() == 'true'
+# 每个 worker 进程缓存的 UI 元素定位器数量（用例开始前批量预加载）
+UI_ELEMENT_CACHE_SIZE = int(os.getenv('UI_ELEMENT_CACHE_SIZE', 5000))
+# UI 用例执行日志：记录级别（DEBUG 时包含变量替换明细）、最多保留的条数；
+# 序列化后超过 UI_EXECUTION_LOG_INLINE_LIMIT 字节时压缩写入对象存储，数据库中只保留最后 N 个字符的预览
+UI_EXECUTION_LOG_LEVEL = os.getenv('UI_EXECUTION_LOG_LEVEL', 'INFO')
+UI_EXECUTION_LOG_MAX_RECORDS = int(os.getenv('UI_EXECUTION_LOG_MAX_RECORDS', 5000))
+UI_EXECUTION_LOG_INLINE_LIMIT = int(os.getenv('UI_EXECUTION_LOG_INLINE_LIMIT', 64 * 1024))
+UI_EXECUTION_LOG_PREVIEW_CHARS = int(os.getenv('UI_EXECUTION_LOG_PREVIEW_CHARS', 2000))
+
+# 接口测试套件并行模式下的最大并发数
+API_SUITE_CONCURRENCY = int(os.getenv('API_SUITE_CONCURRENCY', 5))
+# 接口请求连接池配置（同一次套件执行的所有用例共享连接池）
+API_HTTP_TIMEOUT = float(os.getenv('API_HTTP_TIMEOUT', 60))
+API_HTTP_MAX_CONNECTIONS = int(os.getenv('API_HTTP_MAX_CONNECTIONS', 100))
+API_HTTP_MAX_KEEPALIVE = int(os.getenv('API_HTTP_MAX_KEEPALIVE', 20))
+API_HTTP_KEEPALIVE_EXPIRY = float(os.getenv('API_HTTP_KEEPALIVE_EXPIRY', 30))
+API_HTTP_PER_HOST_LIMIT = int(os.getenv('API_HTTP_PER_HOST_LIMIT', 10))
+# 套件用例执行结果批量落库：批次大小 / 最长刷新间隔（秒）
+API_RESULT_BATCH_SIZE = int(os.getenv('API_RESULT_BATCH_SIZE', 50))
+API_RESULT_FLUSH_INTERVAL = float(os.getenv('API_RESULT_FLUSH_INTERVAL', 5))
+# 用例响应体存储策略：超过阈值（字节）的响应体压缩（zstd | gzip）后写入对象存储，数据库只保留引用和预览
+CASE_RESPONSE_INLINE_LIMIT = int(os.getenv('CASE_RESPONSE_INLINE_LIMIT', 64 * 1024))
+CASE_RESPONSE_COMPRESSION = os.getenv('CASE_RESPONSE_COMPRESSION', 'zstd')
+CASE_RESPONSE_PREVIEW_CHARS = int(os.getenv('CASE_RESPONSE_PREVIEW_CHARS', 2000))
+# 断言执行模式：fail_fast 遇到第一个失败即停止；all 执行用例的全部断言并逐条记录结果
+API_ASSERTION_MODE = os.getenv('API_ASSERTION_MODE', 'fail_fast')
+# SQL 步骤数据库连接池：每个 worker 进程按连接配置复用 Engine，最多保留的 Engine 数 / 空闲释放时间（秒）
+SQL_ENGINE_MAX_COUNT = int(os.getenv('SQL_ENGINE_MAX_COUNT', 16))
+SQL_ENGINE_IDLE_TIMEOUT = float(os.getenv('SQL_ENGINE_IDLE_TIMEOUT', 600))
+# 连接池统计信息日志输出间隔（秒），0 为不输出
+SQL_ENGINE_STATS_INTERVAL = float(os.getenv('SQL_ENGINE_STATS_INTERVAL', 300))
+SQL_POOL_SIZE = int(os.getenv('SQL_POOL_SIZE', 5))
+SQL_POOL_MAX_OVERFLOW = int(os.getenv('SQL_POOL_MAX_OVERFLOW', 10))
+SQL_POOL_TIMEOUT = float(os.getenv('SQL_POOL_TIMEOUT', 30))
+SQL_POOL_RECYCLE = int(os.getenv('SQL_POOL_RECYCLE', 3600))
+# UI 用例 SQL 步骤异步执行：线程池大小 / 单条 SQL 超时（秒）/ SELECT 最大返回行数
+SQL_ASYNC_WORKERS = int(os.getenv('SQL_ASYNC_WORKERS', 4))
+SQL_QUERY_TIMEOUT = int(os.getenv('SQL_QUERY_TIMEOUT', 30))
+SQL_MAX_ROWS = int(os.getenv('SQL_MAX_ROWS', 1000))
 
 # 使用：
 # from celery.utils.log import get_task_logger  # 使用Celery专用日志器 ｜ 获取带任务上下文的日志器
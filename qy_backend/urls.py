@@ -58,6 +58,7 @@ router.register('ui-modules', ui_case_views.UiTestModuleViewSet, basename='ui-mo
 router.register('ui-testcases', ui_case_views.UiTestCaseViewSet, basename='ui-testcase')
 router.register('ui-executions', ui_case_views.UiExecutionViewSet, basename='ui-execution')
 router.register('ui-test-files', ui_case_views.UiTestFileViewSet, basename='ui-test-file')
+router.register('ui-interception-profiles', ui_case_views.UiInterceptionProfileViewSet, basename='ui-interception-profile')
 # 定时任务
 router.register('scheduled-tasks', ScheduledTaskViewSet, basename='scheduled-tasks')
 router.register('scheduled-task-results', ScheduledTaskResultViewSet, basename='scheduled-task-results')